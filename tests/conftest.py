@@ -100,4 +100,93 @@ def api_patient(django_user_model):
     client.force_login(user)
     client.credentials(HTTP_AUTHORIZATION=f'Token {user_token.key}')
 
-    return client
\ No newline at end of file
+    return client
+
+
+@pytest.fixture
+def make_doctor():
+    """ Factory of doctors with schedule: 30 minutes sessions from 9:00 to 11:00 on weekdays """
+    from datetime import time
+
+    from ybooking_app.models import DayInterval, Schedule
+
+    def _make_doctor(last_name='doctor_last_name', planning_days=7, session_duration=30):
+        serializer = UserSerializer(data={
+            'first_name': 'doctor_first_name',
+            'last_name': last_name,
+            'patronymic': 'doctor_patronymic',
+            'sex': Profile.Sex.MAN,
+            'is_doctor': True,
+            'birthday': '1970-01-01',
+        })
+        serializer.is_valid(raise_exception=True)
+        doctor = serializer.save().profile
+
+        Schedule.objects.create(doctor=doctor, planning_days=planning_days, session_duration=session_duration)
+        for weekday in [
+            DayInterval.Weekdays.MON,
+            DayInterval.Weekdays.TUE,
+            DayInterval.Weekdays.WED,
+            DayInterval.Weekdays.THU,
+            DayInterval.Weekdays.FRI,
+        ]:
+            DayInterval.objects.create(doctor=doctor, weekday=weekday, start_time=time(9), stop_time=time(11))
+
+        return doctor
+
+    return _make_doctor
+
+
+@pytest.fixture
+def celery_eager():
+    """ Run celery tasks and canvases locally without broker """
+    from ybooking.celery import app
+
+    app.conf.task_always_eager = True
+    yield app
+    app.conf.task_always_eager = False
+
+
+@pytest.fixture(autouse=True)
+def slot_holds(settings):
+    """ In-memory slot holds instead of Redis """
+    from ybooking_app import holds
+
+    settings.SLOT_HOLDS_BACKEND = 'ybooking_app.holds.LocMemHoldBackend'
+    holds._load_backend.cache_clear()
+    yield holds.get_hold_backend()
+    holds._load_backend.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def slot_events(settings):
+    """ In-process slot events instead of Redis """
+    from ybooking_app import slot_events
+
+    settings.SLOT_EVENTS_BACKEND = 'ybooking_app.slot_events.LocMemSlotEventBroker'
+    slot_events._load_broker.cache_clear()
+    yield slot_events.get_event_broker()
+    slot_events._load_broker.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def occupancy_index():
+    """ Occupancy index is process-wide, every test starts with an empty one """
+    from ybooking_app.occupancy import occupancy_index
+
+    occupancy_index.invalidate()
+    yield occupancy_index
+    occupancy_index.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def free_slots_cache():
+    """ Cached free slots don't leak between tests """
+    from django.core.cache import cache
+
+    from ybooking_app import slot_cache
+
+    cache.clear()
+    slot_cache.reset_stats()
+    yield slot_cache
+    cache.clear()
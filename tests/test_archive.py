@@ -0,0 +1,86 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from ybooking_app.archive import archive_sessions, get_archive_cutoff, get_partition_months, get_partition_name
+from ybooking_app.daily_statistics import rebuild
+from ybooking_app.models import ArchivedTimetable, DailyStatistics, Profile, Timetable
+from ybooking_app.tasks import archive_sessions as archive_sessions_task
+
+
+def _statistics():
+    return set(DailyStatistics.objects.values_list('day', 'doctor_id', 'booked', 'free'))
+
+
+@pytest.fixture
+def old_sessions(settings, make_doctor, api_patient):
+    settings.TIMETABLE_ARCHIVE_AFTER_DAYS = 30
+    doctor = make_doctor()
+    patient = Profile.objects.get(user__username='user1')
+    start = get_archive_cutoff() - timedelta(days=2)
+
+    sessions = []
+    for i in range(5):
+        sessions.append(Timetable.objects.create(
+            doctor=doctor,
+            patient=patient if i % 2 else None,
+            start=start + timedelta(hours=i),
+            stop=start + timedelta(hours=i, minutes=30),
+            conflict=i == 1,
+        ))
+    recent = timezone.now() - timedelta(days=1)
+    sessions.append(Timetable.objects.create(doctor=doctor, start=recent, stop=recent + timedelta(minutes=30)))
+    rebuild()
+    return sessions
+
+
+@pytest.mark.django_db
+def test_archive_sessions(old_sessions, celery_eager, django_assert_max_num_queries):
+    statistics = _statistics()
+
+    with django_assert_max_num_queries(30):
+        assert archive_sessions(batch_size=2, max_batches=2) == 4
+    assert ArchivedTimetable.objects.count() == 4
+    assert Timetable.objects.count() == 2
+
+    assert archive_sessions_task.delay().get() == 1
+    assert set(ArchivedTimetable.objects.values_list('id', flat=True)) == {session.id for session in old_sessions[:5]}
+    assert list(Timetable.objects.values_list('id', flat=True)) == [old_sessions[5].id]
+    archived = ArchivedTimetable.objects.get(pk=old_sessions[1].id)
+    assert (archived.patient_id, archived.start, archived.conflict) == (
+        old_sessions[1].patient_id, old_sessions[1].start, True,
+    )
+
+    # archived history is kept in statistics and recounted from the archive
+    assert _statistics() == statistics
+    rebuild()
+    assert _statistics() == statistics
+
+
+@pytest.mark.django_db
+def test_export_archived_sessions(old_sessions, api_admin):
+    archive_sessions()
+
+    resp = api_admin.get(reverse('export-timetable'), {'output': 'ndjson'})
+    lines = [json.loads(line) for line in b''.join(resp.streaming_content).decode().splitlines()]
+    assert [line['id'] for line in lines] == [session.id for session in old_sessions]
+
+
+def test_partition_months():
+    moments = [
+        timezone.make_aware(datetime(2030, 1, 31, 23, 30), timezone.utc),
+        timezone.make_aware(datetime(2030, 2, 1, 0, 30), timezone.utc),
+        timezone.make_aware(datetime(2030, 2, 15), timezone.utc),
+    ]
+    assert get_partition_months(moments) == [date(2030, 1, 1), date(2030, 2, 1)]
+    assert get_partition_name(date(2030, 2, 1)) == 'timetable_archive_y2030m02'
+
+
+@pytest.mark.django_db
+def test_partition_command_requires_postgresql():
+    with pytest.raises(CommandError):
+        call_command('partition_timetable_archive')
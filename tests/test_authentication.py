@@ -0,0 +1,65 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED
+
+from ybooking_app.authentication import CachedTokenAuthentication, _get_cache_key
+from ybooking_app.slots import generate_timeslots_for
+
+
+@pytest.mark.django_db
+def test_cached_authentication(api_patient, make_doctor, django_assert_num_queries):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    patient = User.objects.get(username='user1').profile
+    doctor_url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    patient_url = reverse('schedule-list', kwargs={'person_pk': patient.id})
+
+    # token, user and profile are loaded with one query
+    with django_assert_num_queries(2):
+        assert api_patient.get(patient_url).status_code == HTTP_200_OK
+
+    # only the schedule itself is queried
+    with django_assert_num_queries(1):
+        assert api_patient.get(patient_url, {'page_size': 1}).status_code == HTTP_200_OK
+
+    # free slots are cached too
+    assert api_patient.get(doctor_url).status_code == HTTP_200_OK
+    with django_assert_num_queries(0):
+        assert api_patient.get(doctor_url).status_code == HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_cached_authentication_invalidated(api_admin, api_patient):
+    url = reverse('persons-list')
+    assert api_patient.get(url).status_code == HTTP_200_OK
+
+    user = User.objects.get(username='user1')
+    api_admin.delete(reverse('persons-detail', args=(user.id,)))
+    assert api_patient.get(url).status_code == HTTP_401_UNAUTHORIZED
+
+    api_admin.delete(reverse('blocked-persons-detail', args=(user.id,)))
+    assert api_patient.get(url).status_code == HTTP_200_OK
+
+    Token.objects.filter(user=user).delete()
+    assert api_patient.get(url).status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_cached_credentials(api_patient, django_assert_num_queries):
+    assert api_patient.get(reverse('persons-list')).status_code == HTTP_200_OK
+
+    token = Token.objects.select_related('user__profile').get(user__username='user1')
+    credentials = caches[settings.AUTH_CACHE].get(_get_cache_key(token.key))
+    assert 'password' not in repr(credentials)
+
+    with django_assert_num_queries(0):
+        user, auth = CachedTokenAuthentication().authenticate_credentials(token.key)
+        assert (user.id, user.profile.id, user.profile.is_patient) == (token.user_id, token.user.profile.id, True)
+        assert auth.user is user
+
+    # other fields are loaded on access
+    assert user.username == 'user1'
@@ -0,0 +1,82 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
+
+from ybooking_app.availability import get_virtual_slot_id
+from ybooking_app.models import Timetable
+
+
+def _free_slots_ahead(days):
+    now = timezone.now()
+    today = timezone.localdate()
+    starts = []
+    for day in (today + timedelta(days=i) for i in range(days)):
+        if day.weekday() >= 5:
+            continue
+        for minutes in range(0, 120, 30):
+            start = timezone.make_aware(datetime.combine(day, time(9))) + timedelta(minutes=minutes)
+            if start > now:
+                starts.append(start)
+    return starts
+
+
+@pytest.fixture
+def virtual_slots(settings):
+    settings.TIMESLOTS_VIRTUAL = True
+
+
+@pytest.mark.django_db
+def test_virtual_schedule_list(virtual_slots, api_patient, make_doctor):
+    doctor = make_doctor()
+    starts = _free_slots_ahead(7)
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    resp = api_patient.get(url, {'page_size': 100})
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.data['results']) == len(starts)
+    assert resp.data['results'][0]['id'] == get_virtual_slot_id(starts[0])
+    assert set(resp.data['results'][0]) == {'id', 'start', 'stop'}
+    assert not Timetable.objects.exists()
+
+
+@pytest.mark.django_db
+def test_virtual_slot_booking(virtual_slots, api_patient, make_doctor):
+    doctor = make_doctor()
+    starts = _free_slots_ahead(7)
+    slot_id = get_virtual_slot_id(starts[0])
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot_id})
+
+    resp = api_patient.patch(detail_url, {})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.data['id'] > 0
+
+    # only the booked session is materialized
+    session = Timetable.objects.get()
+    assert session.start == starts[0]
+    assert session.patient_id is not None
+
+    resp = api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id}), {'page_size': 100})
+    assert len(resp.data['results']) == len(starts) - 1
+
+    resp = api_patient.patch(detail_url, {})
+    assert resp.status_code == HTTP_409_CONFLICT
+
+    # there is no session at this time in the schedule
+    missing_url = reverse('schedule-detail', kwargs={
+        'person_pk': doctor.id,
+        'pk': get_virtual_slot_id(starts[0] + timedelta(minutes=5)),
+    })
+    assert api_patient.patch(missing_url, {}).status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_virtual_slot_id_out_of_range(virtual_slots, api_patient, make_doctor):
+    doctor = make_doctor()
+    kwargs = {'person_pk': doctor.id, 'pk': -99999999999999999}
+
+    assert api_patient.get(reverse('schedule-detail', kwargs=kwargs)).status_code == HTTP_404_NOT_FOUND
+    assert api_patient.patch(reverse('schedule-detail', kwargs=kwargs), {}).status_code == HTTP_404_NOT_FOUND
+    assert api_patient.post(reverse('schedule-hold', kwargs=kwargs)).status_code == HTTP_404_NOT_FOUND
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from ybooking_app.benchmarks import BENCHMARKS
+from ybooking_app.models import DayInterval, Profile, Schedule, Timetable
+
+
+@pytest.mark.django_db
+def test_seed_clinic():
+    call_command('seed_clinic', doctors=3, patients=5, planning_days=7, history_days=3, booking_density=0.5, seed=1)
+
+    assert Profile.objects.filter(is_doctor=True).count() == 3
+    assert Profile.objects.filter(is_doctor=False).count() == 5
+    assert Schedule.objects.count() == 3
+    assert DayInterval.objects.filter(doctor__is_doctor=True).count() >= 15
+    assert Timetable.objects.exists()
+    assert Timetable.objects.filter(patient__isnull=False).exists()
+
+
+@pytest.mark.django_db
+def test_run_benchmarks(tmp_path):
+    call_command('seed_clinic', doctors=2, patients=2, planning_days=7, history_days=2, seed=1)
+    sessions = Timetable.objects.count()
+
+    call_command('run_benchmarks', repeat=2, seed=1, output_dir=str(tmp_path))
+    call_command('run_benchmarks', repeat=1, seed=1, output_dir=str(tmp_path))
+
+    # runs of the same second don't overwrite each other
+    reports = sorted(tmp_path.glob('*.json'))
+    assert len(reports) == 2
+    report = json.loads(reports[-1].read_text())
+    assert set(report['results']) == set(BENCHMARKS)
+    assert report['results']['schedule_list']['queries']['median'] > 0
+    # runs are rolled back
+    assert Timetable.objects.count() == sessions
@@ -0,0 +1,117 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
+
+from ybooking_app.booking import BOOKED, CONFLICT, book_slot
+from ybooking_app.models import Timetable
+from ybooking_app.serializers import TimetableSerializer
+
+
+def _free_slot(doctor, hours=1):
+    start = timezone.now() + timedelta(hours=hours)
+    return Timetable.objects.create(doctor=doctor, start=start, stop=start + timedelta(minutes=30))
+
+
+@pytest.mark.django_db
+def test_booking_conflict(api_patient, make_doctor):
+    doctor = make_doctor()
+    slot = _free_slot(doctor)
+    url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot.id})
+
+    with CaptureQueriesContext(connection) as captured:
+        resp = api_patient.patch(url, {})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.data == TimetableSerializer(slot).data
+    # the booked session is read once for the response and events
+    assert len([query for query in captured if query['sql'].startswith('SELECT') and '"timetable"' in query['sql']]) == 1
+
+    resp = api_patient.patch(url, {})
+    assert resp.status_code == HTTP_409_CONFLICT
+
+    past_slot = _free_slot(doctor, hours=-1)
+    url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': past_slot.id})
+    assert api_patient.patch(url, {}).status_code == HTTP_404_NOT_FOUND
+
+    # a patient's schedule is not the place to book sessions
+    patient = Timetable.objects.get(pk=slot.id).patient
+    url = reverse('schedule-detail', kwargs={'person_pk': patient.id, 'pk': slot.id})
+    assert api_patient.patch(url, {}).status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+def test_booking_race(make_doctor):
+    doctor = make_doctor()
+    patients = [make_doctor(last_name=f'patient_{i}') for i in range(10)]
+    slot = _free_slot(doctor)
+
+    barrier = threading.Barrier(len(patients))
+    results = {}
+
+    def book(patient):
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    results[patient.id] = book_slot(doctor.id, slot.id, patient.id)[0]
+                    return
+                except OperationalError:
+                    # SQLite allows a single writer, retry like a client would do
+                    continue
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [patient_id for patient_id, result in results.items() if result == BOOKED]
+    assert len(winners) == 1
+    assert sorted(results.values()) == sorted([BOOKED] + [CONFLICT] * (len(patients) - 1))
+    slot.refresh_from_db()
+    assert slot.patient_id == winners[0]
+
+
+@pytest.mark.django_db
+def test_bulk_booking(api_patient, make_doctor, django_assert_max_num_queries):
+    doctor = make_doctor()
+    other_doctor = make_doctor(last_name='other_doctor')
+    slots = [_free_slot(doctor, hours=i + 1) for i in range(3)]
+    taken = _free_slot(doctor, hours=10)
+    taken.patient = other_doctor
+    taken.save()
+    other_slot = _free_slot(other_doctor)
+
+    url = reverse('schedule-bulk', kwargs={'person_pk': doctor.id})
+    ids = [slot.id for slot in slots] + [taken.id, other_slot.id]
+
+    with django_assert_max_num_queries(10):
+        resp = api_patient.post(url, {'action': 'book', 'ids': ids}, format='json')
+    assert resp.status_code == HTTP_200_OK
+    assert resp.data['results'] == [
+        {'id': slots[0].id, 'status': 'booked'},
+        {'id': slots[1].id, 'status': 'booked'},
+        {'id': slots[2].id, 'status': 'booked'},
+        {'id': taken.id, 'status': 'conflict'},
+        {'id': other_slot.id, 'status': 'not_found'},
+    ]
+    patient_id = Timetable.objects.get(id=slots[0].id).patient_id
+    assert Timetable.objects.filter(patient_id=patient_id).count() == 3
+
+    patient_url = reverse('schedule-bulk', kwargs={'person_pk': patient_id})
+    resp = api_patient.post(patient_url, {'action': 'cancel', 'ids': [slots[0].id, taken.id]}, format='json')
+    assert resp.data['results'] == [
+        {'id': slots[0].id, 'status': 'canceled'},
+        {'id': taken.id, 'status': 'not_found'},
+    ]
+    assert Timetable.objects.filter(patient_id=patient_id).count() == 2
+
+    resp = api_patient.post(url, {'action': 'book', 'ids': []}, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
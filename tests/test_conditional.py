@@ -0,0 +1,86 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+from ybooking_app.slots import generate_timeslots_for
+from ybooking_app.versions import STATISTICS_SCOPE, bump_versions
+
+
+@pytest.mark.django_db
+def test_schedule_not_modified(api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    resp = api_patient.get(url)
+    assert resp.status_code == HTTP_200_OK
+    etag = resp['ETag']
+
+    with CaptureQueriesContext(connection) as captured:
+        resp = api_patient.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+    assert not [query for query in captured.captured_queries if '"timetable"' in query['sql']]
+
+    # another page has another tag
+    assert api_patient.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code == HTTP_200_OK
+
+    resp = api_patient.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_schedule_modified_by_booking(api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    doctor_url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    patient = User.objects.get(username='user1').profile
+    patient_url = reverse('schedule-list', kwargs={'person_pk': patient.id})
+
+    resp = api_patient.get(doctor_url)
+    doctor_etag = resp['ETag']
+    patient_etag = api_patient.get(patient_url)['ETag']
+
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': resp.data['results'][0]['id']})
+    assert api_patient.patch(detail_url, {}).status_code == HTTP_200_OK
+
+    assert api_patient.get(doctor_url, HTTP_IF_NONE_MATCH=doctor_etag).status_code == HTTP_200_OK
+    resp = api_patient.get(patient_url, HTTP_IF_NONE_MATCH=patient_etag)
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.data['results']) == 1
+
+
+@pytest.mark.django_db
+def test_schedule_modified_by_hold(api_patient, make_doctor, slot_holds):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    resp = api_patient.get(url)
+    slot_holds.acquire(doctor.id, resp.data['results'][0]['id'], holder_id=-1, ttl=60)
+    assert api_patient.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code == HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_statistics_not_modified(api_patient, make_doctor):
+    url = reverse('statistics-list')
+    etag = api_patient.get(url)['ETag']
+    assert api_patient.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTP_304_NOT_MODIFIED
+
+    make_doctor()
+    generate_timeslots_for()
+    resp = api_patient.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_200_OK
+    assert resp.data['results']
+
+
+@pytest.mark.django_db
+def test_last_modified_rounded_up(api_patient, monkeypatch):
+    monkeypatch.setattr('ybooking_app.versions.time.time', lambda: 1000000000.5)
+    bump_versions([STATISTICS_SCOPE])
+
+    resp = api_patient.get(reverse('statistics-list'))
+    assert resp['Last-Modified'] == http_date(1000000001)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+from ybooking_app.booking import cancel_slot
+from ybooking_app.daily_statistics import rebuild
+from ybooking_app.models import DailyStatistics, Timetable
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _aggregate():
+    return set(DailyStatistics.objects.exclude(booked=0, free=0).values_list('day', 'doctor_id', 'booked', 'free'))
+
+
+def _recount():
+    rebuild()
+    return _aggregate()
+
+
+@pytest.mark.django_db
+def test_statistics_follow_changes(api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    assert _aggregate()
+    assert _aggregate() == _recount()
+
+    slots = api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id})).data['results']
+    api_patient.patch(reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slots[0]['id']}), {})
+    bulk_url = reverse('schedule-bulk', kwargs={'person_pk': doctor.id})
+    api_patient.post(bulk_url, {'action': 'book', 'ids': [slots[1]['id'], slots[2]['id']]}, format='json')
+    aggregate = _aggregate()
+    assert sum(booked for _, _, booked, _ in aggregate) == 3
+    assert aggregate == _recount()
+
+    api_patient.post(bulk_url, {'action': 'cancel', 'ids': [slots[1]['id']]}, format='json')
+    aggregate = _aggregate()
+    assert sum(booked for _, _, booked, _ in aggregate) == 2
+    assert aggregate == _recount()
+
+
+@pytest.mark.django_db
+def test_statistics_repeated_cancel(api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    slot = api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id})).data['results'][0]
+    api_patient.patch(reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot['id']}), {})
+
+    # both cancellations loaded the booked session before either of them saved
+    first, second = Timetable.objects.get(pk=slot['id']), Timetable.objects.get(pk=slot['id'])
+    assert cancel_slot(first)
+    assert not cancel_slot(second)
+
+    aggregate = _aggregate()
+    assert sum(booked for _, _, booked, _ in aggregate) == 0
+    assert aggregate == _recount()
+
+
+@pytest.mark.django_db
+def test_statistics_virtual_booking(settings, api_patient, make_doctor):
+    settings.TIMESLOTS_VIRTUAL = True
+    doctor = make_doctor()
+
+    slot = api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id})).data['results'][0]
+    api_patient.patch(reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot['id']}), {})
+    assert DailyStatistics.objects.get().booked == 1
+    assert _aggregate() == _recount()
+
+
+@pytest.mark.django_db
+def test_rebuild_statistics_command(make_doctor):
+    make_doctor()
+    generate_timeslots_for()
+    expected = _aggregate()
+
+    DailyStatistics.objects.all().delete()
+    call_command('rebuild_statistics')
+    assert _aggregate() == expected
+
+
+@pytest.mark.django_db
+def test_statistics_endpoint(api_patient, make_doctor):
+    first = make_doctor(last_name='first')
+    make_doctor(last_name='second')
+    generate_timeslots_for()
+    url = reverse('statistics-list')
+
+    resp = api_patient.get(url)
+    assert resp.status_code == HTTP_200_OK
+    day = resp.data['results'][0]
+    assert day['count'] == Timetable.objects.filter(start__date=day['day']).count()
+    assert day['count'] == day['booked'] + day['free']
+
+    resp = api_patient.get(url, {'doctor': first.id, 'start': day['day'], 'stop': day['day']})
+    assert [dict(row) for row in resp.data['results']] == [{
+        'day': day['day'],
+        'count': day['count'] // 2,
+        'booked': 0,
+        'free': day['count'] // 2,
+    }]
+
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    assert all(row['day'] >= str(tomorrow) for row in api_patient.get(url, {'start': tomorrow}).data['results'])
+    assert api_patient.get(url, {'start': 'yesterday'}).status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+from ybooking_app.models import DailyStatistics, Timetable
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _content(resp):
+    assert resp.status_code == HTTP_200_OK
+    assert resp.streaming
+    return b''.join(resp.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_export_statistics(api_patient, make_doctor):
+    first = make_doctor(last_name='first')
+    make_doctor(last_name='second')
+    generate_timeslots_for()
+    url = reverse('export-statistics')
+
+    resp = api_patient.get(url)
+    assert resp['Content-Type'] == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(_content(resp))))
+    assert len(rows) == DailyStatistics.objects.count()
+    assert set(rows[0]) == {'day', 'doctor_id', 'count', 'booked', 'free'}
+
+    day = rows[0]['day']
+    resp = api_patient.get(url, {'output': 'ndjson', 'doctor': first.id, 'start': day, 'stop': day})
+    assert resp['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in _content(resp).splitlines()]
+    assert lines == [{
+        'day': day,
+        'doctor_id': first.id,
+        'count': Timetable.objects.filter(doctor=first, start__date=day).count(),
+        'booked': 0,
+        'free': Timetable.objects.filter(doctor=first, start__date=day).count(),
+    }]
+
+    assert api_patient.get(url, {'output': 'xml'}).status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_export_timetable(api_admin, api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('export-timetable')
+
+    assert api_patient.get(url).status_code == HTTP_403_FORBIDDEN
+
+    rows = list(csv.DictReader(io.StringIO(_content(api_admin.get(url, {'doctor': doctor.id})))))
+    sessions = list(Timetable.objects.order_by('start', 'id'))
+    assert [int(row['id']) for row in rows] == [session.id for session in sessions]
+    assert rows[0]['patient_id'] == ''
+
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    lines = _content(api_admin.get(url, {'output': 'ndjson', 'start': tomorrow})).splitlines()
+    assert len(lines) == Timetable.objects.filter(start__date__gte=tomorrow).count()
+    assert set(json.loads(lines[0])) == {'id', 'doctor_id', 'patient_id', 'start', 'stop'}
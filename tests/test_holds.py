@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
+    HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+from rest_framework.test import APIClient
+
+from ybooking_app.holds import HoldsUnavailable, LocMemHoldBackend, RedisHoldBackend
+from ybooking_app.models import Timetable
+
+
+@pytest.fixture
+def other_patient(make_doctor):
+    profile = make_doctor(last_name='other_patient')
+    profile.is_doctor = False
+    profile.save()
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=profile.user).key}')
+    return client
+
+
+def _free_slots(doctor, count):
+    now = timezone.now()
+    return [
+        Timetable.objects.create(doctor=doctor, start=now + timedelta(hours=i + 1), stop=now + timedelta(hours=i + 2))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_slot_hold(api_patient, other_patient, make_doctor):
+    doctor = make_doctor()
+    slots = _free_slots(doctor, 2)
+    list_url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    hold_url = reverse('schedule-hold', kwargs={'person_pk': doctor.id, 'pk': slots[0].id})
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slots[0].id})
+
+    resp = api_patient.post(hold_url)
+    assert resp.status_code == HTTP_201_CREATED
+    # holding again extends the hold
+    assert api_patient.post(hold_url).status_code == HTTP_201_CREATED
+
+    # the slot is unavailable for others
+    assert len(api_patient.get(list_url).data['results']) == 2
+    assert len(other_patient.get(list_url).data['results']) == 1
+    assert other_patient.post(hold_url).status_code == HTTP_409_CONFLICT
+    assert other_patient.patch(detail_url, {}).status_code == HTTP_409_CONFLICT
+    assert other_patient.delete(hold_url).status_code == HTTP_404_NOT_FOUND
+
+    # booking confirms the hold
+    assert api_patient.patch(detail_url, {}).status_code == HTTP_200_OK
+    assert api_patient.delete(hold_url).status_code == HTTP_404_NOT_FOUND
+    assert len(other_patient.get(list_url).data['results']) == 1
+
+    # booked and missing slots can't be held
+    assert other_patient.post(hold_url).status_code == HTTP_404_NOT_FOUND
+
+    hold_url = reverse('schedule-hold', kwargs={'person_pk': doctor.id, 'pk': slots[1].id})
+    assert other_patient.post(hold_url).status_code == HTTP_201_CREATED
+    assert other_patient.delete(hold_url).status_code == HTTP_204_NO_CONTENT
+    assert len(api_patient.get(list_url).data['results']) == 1
+
+
+def test_locmem_hold_expiration(monkeypatch):
+    backend = LocMemHoldBackend()
+    now = 1000.0
+    monkeypatch.setattr('ybooking_app.holds.time.time', lambda: now)
+
+    assert backend.acquire(1, 10, 100, ttl=60)
+    assert not backend.acquire(1, 10, 200, ttl=60)
+    assert backend.get_held_slots(1) == {10}
+    assert backend.get_held_slots(1, exclude_holder=100) == set()
+
+    now += 61
+    assert backend.get_holder(1, 10) is None
+    assert backend.acquire(1, 10, 200, ttl=60)
+
+
+def test_redis_hold_backend():
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = RedisHoldBackend(client=fakeredis.FakeStrictRedis())
+
+    assert backend.acquire(1, 10, 100, ttl=60)
+    assert backend.acquire(1, 10, 100, ttl=60)
+    assert not backend.acquire(1, 10, 200, ttl=60)
+    assert backend.acquire(1, 11, 200, ttl=60)
+
+    assert backend.get_holder(1, 10) == 100
+    assert backend.get_held_slots(1) == {10, 11}
+    assert backend.get_held_slots(1, exclude_holder=200) == {10}
+    assert backend.get_held_slots(2) == set()
+
+    assert not backend.release(1, 10, 200)
+    assert backend.release(1, 10, 100)
+    assert backend.get_holder(1, 10) is None
+    assert backend.get_held_slots(1) == {11}
+
+
+def test_redis_hold_backend_down():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    backend = RedisHoldBackend(client=fakeredis.FakeStrictRedis(server=server))
+    assert backend.acquire(1, 10, 100, ttl=60)
+
+    server.connected = False
+    assert backend.get_holder(1, 10) is None
+    assert backend.get_held_slots(1) == set()
+    assert not backend.release(1, 10, 100)
+    with pytest.raises(HoldsUnavailable):
+        backend.acquire(1, 11, 100, ttl=60)
+
+
+@pytest.mark.django_db
+def test_slot_hold_redis_down(api_patient, make_doctor, monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    server.connected = False
+    monkeypatch.setattr(
+        'ybooking_app.views.get_hold_backend', lambda: RedisHoldBackend(client=fakeredis.FakeStrictRedis(server=server)),
+    )
+    doctor = make_doctor()
+    slot, other_slot = _free_slots(doctor, 2)
+
+    url = reverse('schedule-hold', kwargs={'person_pk': doctor.id, 'pk': slot.id})
+    assert api_patient.post(url).status_code == HTTP_503_SERVICE_UNAVAILABLE
+
+    # booking goes on without holds
+    url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': other_slot.id})
+    assert api_patient.patch(url, {}).status_code == HTTP_200_OK
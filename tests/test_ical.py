@@ -0,0 +1,95 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from ybooking_app.ical import make_feed_token
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _feed(client, url, **headers):
+    resp = client.get(url, **headers)
+    content = b''.join(resp.streaming_content) if resp.streaming else resp.content
+    return resp, content.decode()
+
+
+@pytest.fixture
+def booked_session(api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    slot = api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id})).data['results'][0]
+    api_patient.patch(reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot['id']}), {})
+    return doctor, slot
+
+
+@pytest.mark.django_db
+def test_calendar_feed(api_client, api_patient, booked_session, django_assert_num_queries):
+    doctor, slot = booked_session
+    patient = User.objects.get(username='user1').profile
+
+    resp = api_patient.get(reverse('schedule-calendar', kwargs={'person_pk': patient.id}))
+    assert resp.status_code == HTTP_200_OK
+    url = resp.data['url']
+
+    resp, feed = _feed(api_client, url)
+    assert resp.status_code == HTTP_200_OK
+    assert resp['Content-Type'] == 'text/calendar; charset=utf-8'
+    assert feed.startswith('BEGIN:VCALENDAR\r\n')
+    assert feed.count('BEGIN:VEVENT') == 1
+    assert f'UID:session-{slot["id"]}@ybooking' in feed
+    assert 'SUMMARY:Session with doctor doctor_first_name doctor_last_name' in feed
+
+    # cached feed costs no queries
+    with django_assert_num_queries(0):
+        cached, cached_feed = _feed(api_client, url)
+    assert not cached.streaming
+    assert cached_feed == feed
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code == HTTP_304_NOT_MODIFIED
+
+    # doctor's feed holds booked sessions only
+    _, doctor_feed = _feed(api_client, reverse('calendar-feed', kwargs={'token': make_feed_token(doctor.id, 0)}))
+    assert doctor_feed.count('BEGIN:VEVENT') == 1
+
+
+@pytest.mark.django_db
+def test_calendar_feed_invalidated(api_client, api_patient, booked_session):
+    doctor, slot = booked_session
+    patient = User.objects.get(username='user1').profile
+    url = reverse('calendar-feed', kwargs={'token': make_feed_token(patient.id, 0)})
+    resp, _ = _feed(api_client, url)
+
+    bulk_url = reverse('schedule-bulk', kwargs={'person_pk': doctor.id})
+    api_patient.post(bulk_url, {'action': 'cancel', 'ids': [slot['id']]}, format='json')
+
+    resp, feed = _feed(api_client, url, HTTP_IF_NONE_MATCH=resp['ETag'])
+    assert resp.status_code == HTTP_200_OK
+    assert 'BEGIN:VEVENT' not in feed
+
+
+@pytest.mark.django_db
+def test_calendar_feed_access(api_client, api_patient, booked_session):
+    doctor, _ = booked_session
+
+    assert api_patient.get(reverse('schedule-calendar', kwargs={'person_pk': doctor.id})).status_code == \
+        HTTP_403_FORBIDDEN
+    assert api_client.get(reverse('calendar-feed', kwargs={'token': f'{doctor.id}:forged'})).status_code == \
+        HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_calendar_feed_revoked(api_client, api_patient, booked_session):
+    patient = User.objects.get(username='user1').profile
+    calendar_url = reverse('schedule-calendar', kwargs={'person_pk': patient.id})
+    url = api_patient.get(calendar_url).data['url']
+    assert api_client.get(url).status_code == HTTP_200_OK
+
+    resp = api_patient.post(calendar_url)
+    assert resp.status_code == HTTP_200_OK
+    assert api_client.get(url).status_code == HTTP_404_NOT_FOUND
+    url = resp.data['url']
+    assert api_client.get(url).status_code == HTTP_200_OK
+
+    # feeds of deactivated persons are revoked too
+    patient.user.is_active = False
+    patient.user.save()
+    assert api_client.get(url).status_code == HTTP_404_NOT_FOUND
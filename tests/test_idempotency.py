@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_409_CONFLICT, HTTP_422_UNPROCESSABLE_ENTITY
+
+from ybooking_app.models import Timetable
+
+PERSON = {
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'patronymic': 'patronymic',
+    'sex': 1,
+    'is_doctor': False,
+    'birthday': '2000-01-01',
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_create_person_idempotency(api_admin):
+    url = reverse('persons-list')
+
+    resp = api_admin.post(url, PERSON, HTTP_IDEMPOTENCY_KEY='key-1')
+    assert resp.status_code == HTTP_201_CREATED
+    assert 'Idempotent-Replayed' not in resp
+
+    retry = api_admin.post(url, PERSON, HTTP_IDEMPOTENCY_KEY='key-1')
+    assert retry.status_code == HTTP_201_CREATED
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert retry.data == resp.data
+    assert User.objects.filter(last_name='last_name').count() == 1
+
+    # the key can't be reused for another request
+    resp = api_admin.post(url, {**PERSON, 'last_name': 'other'}, HTTP_IDEMPOTENCY_KEY='key-1')
+    assert resp.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.django_db
+def test_booking_idempotency(api_patient, make_doctor, django_assert_max_num_queries):
+    doctor = make_doctor()
+    start = timezone.now() + timedelta(hours=1)
+    slot = Timetable.objects.create(doctor=doctor, start=start, stop=start + timedelta(minutes=30))
+    url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot.id})
+
+    resp = api_patient.patch(url, {}, HTTP_IDEMPOTENCY_KEY='booking-1')
+    assert resp.status_code == HTTP_200_OK
+
+    # authentication and permission checks only
+    with django_assert_max_num_queries(4):
+        retry = api_patient.patch(url, {}, HTTP_IDEMPOTENCY_KEY='booking-1')
+    assert retry.status_code == HTTP_200_OK
+    assert retry.data == resp.data
+
+    assert api_patient.patch(url, {}, HTTP_IDEMPOTENCY_KEY='booking-2').status_code == HTTP_409_CONFLICT
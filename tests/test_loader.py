@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.db import IntegrityError
+from django.utils import timezone
+
+from ybooking_app.loader import load_sessions
+from ybooking_app.models import Timetable
+
+
+def _sessions(doctor, count):
+    start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), datetime.min.time()))
+    return [
+        Timetable(doctor=doctor, start=start + timedelta(minutes=30 * i), stop=start + timedelta(minutes=30 * (i + 1)))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_load_sessions_skips_existing(make_doctor):
+    doctor = make_doctor()
+
+    assert load_sessions(_sessions(doctor, 10), batch_size=3) == 10
+    # re-run and overlapping input insert only new sessions
+    assert load_sessions(_sessions(doctor, 10), batch_size=3) == 0
+    assert load_sessions(_sessions(doctor, 15) + _sessions(doctor, 15), batch_size=4) == 5
+
+    assert Timetable.objects.filter(doctor=doctor).count() == 15
+
+
+@pytest.mark.django_db
+def test_load_sessions_keeps_booked(make_doctor):
+    doctor = make_doctor()
+    patient = make_doctor(last_name='patient')
+    booked = _sessions(doctor, 1)[0]
+    booked.patient = patient
+    booked.save()
+
+    assert load_sessions(_sessions(doctor, 2)) == 1
+    assert Timetable.objects.get(doctor=doctor, start=booked.start).patient_id == patient.id
+
+
+@pytest.mark.django_db
+def test_timetable_doctor_start_unique(make_doctor):
+    doctor = make_doctor()
+    _sessions(doctor, 1)[0].save()
+
+    with pytest.raises(IntegrityError):
+        _sessions(doctor, 1)[0].save()
@@ -0,0 +1,111 @@
+import importlib
+import threading
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+from rest_framework.test import APIClient
+
+from ybooking import settings as project_settings
+from ybooking_app.checks import check_metrics_token
+from ybooking_app.metrics import Histogram, MetricsRegistry, registry
+
+
+@pytest.fixture(autouse=True)
+def metrics_registry(settings):
+    settings.METRICS_TOKEN = 'secret'
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def _samples():
+    resp = APIClient().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+    assert resp.status_code == HTTP_200_OK
+    assert resp['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    samples = {}
+    for line in resp.content.decode().splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram():
+    histogram = Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    assert histogram.render('latency', 'view="v"') == [
+        'latency_bucket{view="v",le="1"} 2',
+        'latency_bucket{view="v",le="5"} 3',
+        'latency_bucket{view="v",le="+Inf"} 4',
+        'latency_sum{view="v"} 14.5',
+        'latency_count{view="v"} 4',
+    ]
+
+
+def test_registry_threads():
+    metrics = MetricsRegistry()
+
+    def observe():
+        for _ in range(1000):
+            metrics.observe('persons-list', 'GET', 200, 0.01, 2, 0.001)
+
+    threads = [threading.Thread(target=observe) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 'ybooking_http_requests_total{view="persons-list",method="GET",status="200"} 8000' in metrics.render()
+
+
+@pytest.mark.django_db
+def test_request_metrics(api_patient, make_doctor):
+    doctor = make_doctor()
+    api_patient.get(reverse('persons-list'))
+    api_patient.get(reverse('persons-list'))
+    api_patient.get(reverse('schedule-list', kwargs={'person_pk': doctor.id}))
+    api_patient.get('/no-such-page/')
+    api_patient.generic('PURGE', reverse('persons-list'))
+
+    samples = _samples()
+    persons = 'view="persons-list",method="GET"'
+    assert samples[f'ybooking_http_requests_total{{{persons},status="200"}}'] == 2
+    assert samples[f'ybooking_http_request_duration_seconds_count{{{persons}}}'] == 2
+    assert samples[f'ybooking_http_request_duration_seconds_bucket{{{persons},le="+Inf"}}'] == 2
+    assert samples[f'ybooking_db_queries_per_request_sum{{{persons}}}'] >= 2
+    assert samples[f'ybooking_db_query_duration_seconds_total{{{persons}}}'] > 0
+
+    assert samples['ybooking_http_requests_total{view="schedule-list",method="GET",status="200"}'] == 1
+    assert samples['ybooking_http_requests_total{view="unmatched",method="GET",status="404"}'] == 1
+    assert samples['ybooking_http_requests_total{view="persons-list",method="other",status="405"}'] == 1
+    assert samples['ybooking_free_slots_cache_misses_total'] == 1
+
+
+@pytest.mark.django_db
+def test_metrics_token(settings, api_client):
+    assert api_client.get(reverse('metrics')).status_code == HTTP_401_UNAUTHORIZED
+
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+    assert api_client.get(reverse('metrics')).status_code == HTTP_200_OK
+
+    # metrics are open without a token only in DEBUG
+    settings.METRICS_TOKEN = ''
+    assert api_client.get(reverse('metrics')).status_code == HTTP_404_NOT_FOUND
+    settings.DEBUG = True
+    assert api_client.get(reverse('metrics')).status_code == HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_metrics_closed_with_debug_off(monkeypatch, settings, api_client):
+    # DEBUG=0 in the environment is off, not a non-empty string
+    monkeypatch.setenv('DEBUG', '0')
+    settings.DEBUG = importlib.reload(project_settings).DEBUG
+    assert settings.DEBUG is False
+
+    settings.METRICS_TOKEN = ''
+    assert api_client.get(reverse('metrics')).status_code == HTTP_404_NOT_FOUND
+    assert [message.id for message in check_metrics_token(None)] == ['ybooking_app.W002']
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+from ybooking_app.availability import get_virtual_slot_id
+from ybooking_app.models import Timetable
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _week():
+    today = timezone.localdate()
+    return today, today + timedelta(days=6)
+
+
+def _free_sessions(**filters):
+    return list(Timetable.objects.filter(
+        patient_id__isnull=True,
+        start__gt=timezone.now(),
+        **filters,
+    ).order_by('start', 'doctor_id').values_list('id', 'doctor_id'))
+
+
+@pytest.mark.django_db
+def test_search_merges_doctors(occupancy_index, make_doctor):
+    first = make_doctor(last_name='first')
+    second = make_doctor(last_name='second')
+    generate_timeslots_for()
+
+    slots = occupancy_index.search(*_week(), limit=1000)
+    assert [(slot['id'], slot['doctor_id']) for slot in slots] == _free_sessions()
+
+    slots = occupancy_index.search(*_week(), doctor_ids=[second.id], limit=3)
+    assert [(slot['id'], slot['doctor_id']) for slot in slots] == _free_sessions(doctor_id=second.id)[:3]
+    assert first.id not in {slot['doctor_id'] for slot in slots}
+
+
+@pytest.mark.django_db
+def test_search_uses_loaded_days(occupancy_index, make_doctor, django_assert_num_queries):
+    make_doctor()
+    generate_timeslots_for()
+    occupancy_index.search(*_week())
+
+    with django_assert_num_queries(0):
+        assert occupancy_index.search(*_week())
+
+
+@pytest.mark.django_db
+def test_index_follows_booking_and_cancel(occupancy_index, api_patient, make_doctor,
+                                          django_capture_on_commit_callbacks):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    slot = occupancy_index.search(*_week(), limit=1)[0]
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot['id']})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert api_patient.patch(detail_url, {}).status_code == HTTP_200_OK
+    assert slot['id'] not in {slot['id'] for slot in occupancy_index.search(*_week(), limit=1000)}
+
+    bulk_url = reverse('schedule-bulk', kwargs={'person_pk': doctor.id})
+    with django_capture_on_commit_callbacks(execute=True):
+        assert api_patient.post(bulk_url, {'action': 'cancel', 'ids': [slot['id']]}, format='json').status_code == \
+            HTTP_200_OK
+    assert occupancy_index.search(*_week(), limit=1)[0]['id'] == slot['id']
+
+
+@pytest.mark.django_db
+def test_virtual_search(settings, occupancy_index, api_patient, make_doctor, django_capture_on_commit_callbacks):
+    settings.TIMESLOTS_VIRTUAL = True
+    doctor = make_doctor()
+
+    slot = occupancy_index.search(*_week(), limit=1)[0]
+    assert slot['id'] == get_virtual_slot_id(slot['start'])
+
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slot['id']})
+    with django_capture_on_commit_callbacks(execute=True):
+        assert api_patient.patch(detail_url, {}).status_code == HTTP_200_OK
+    assert occupancy_index.search(*_week(), limit=1)[0]['start'] > slot['start']
+
+
+@pytest.mark.django_db
+def test_availability_endpoint(api_patient, make_doctor):
+    make_doctor(last_name='first')
+    second = make_doctor(last_name='second')
+    generate_timeslots_for()
+    url = reverse('availability-list')
+
+    resp = api_patient.get(url, {'doctors': str(second.id), 'limit': 2})
+    assert resp.status_code == HTTP_200_OK
+    assert [slot['id'] for slot in resp.data['results']] == [
+        slot_id for slot_id, _ in _free_sessions(doctor_id=second.id)[:2]
+    ]
+    assert set(resp.data['results'][0]) == {'id', 'doctor_id', 'start', 'stop'}
+
+    today = timezone.localdate()
+    assert api_patient.get(url, {'start': today, 'stop': today - timedelta(days=1)}).status_code == \
+        HTTP_400_BAD_REQUEST
+    assert api_patient.get(url, {'doctors': 'first'}).status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_availability_skips_held_slots(api_patient, make_doctor, slot_holds):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('availability-list')
+    first_id = api_patient.get(url).data['results'][0]['id']
+
+    slot_holds.acquire(doctor.id, first_id, holder_id=-1, ttl=60)
+    assert api_patient.get(url).data['results'][0]['id'] != first_id
@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+
+from ybooking_app.availability import get_virtual_slot_id
+from ybooking_app.models import Timetable
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _walk(client, url, params, direction='next'):
+    pages = []
+    while url:
+        resp = client.get(url, params)
+        pages.append([item['id'] for item in resp.data['results']])
+        url, params = resp.data[direction], None
+    return pages
+
+
+@pytest.mark.django_db
+def test_schedule_pagination(api_patient, make_doctor, django_assert_max_num_queries):
+    doctor = make_doctor()
+    start = timezone.now() + timedelta(hours=1)
+    sessions = [
+        Timetable.objects.create(doctor=doctor, start=start + timedelta(minutes=30 * i), stop=start)
+        for i in range(25)
+    ]
+    expected = [session.id for session in sorted(sessions, key=lambda session: (session.start, session.id))]
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    pages = _walk(api_patient, url, {'page_size': 10})
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == expected
+
+    first = api_patient.get(url, {'page_size': 10})
+    assert first.data['previous'] is None
+    second = api_patient.get(first.data['next'])
+    assert [item['id'] for item in api_patient.get(second.data['previous']).data['results']] == expected[:10]
+
+    # walk back from the last page
+    last = api_patient.get(second.data['next'])
+    assert last.data['next'] is None
+    assert sum(reversed(_walk(api_patient, last.data['previous'], None, 'previous')), []) == expected[:20]
+
+    # no COUNT, a deep page is a single range query
+    with django_assert_max_num_queries(6):
+        api_patient.get(last.data['previous'])
+
+
+@pytest.mark.django_db
+def test_person_pagination(api_admin, make_doctor):
+    for i in range(15):
+        make_doctor(last_name=f'doctor_{i}')
+
+    pages = _walk(api_admin, reverse('persons-list'), {'page_size': 4})
+    assert sum(pages, []) == list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+
+    assert api_admin.get(reverse('persons-list'), {'cursor': 'broken'}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_virtual_schedule_pagination(settings, api_patient, make_doctor):
+    settings.TIMESLOTS_VIRTUAL = True
+    doctor = make_doctor(planning_days=14)
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    pages = _walk(api_patient, url, {'page_size': 7})
+    ids = sum(pages, [])
+    assert len(ids) == len(set(ids)) > 7
+    assert ids[0] == api_patient.get(url).data['results'][0]['id'] < 0
+    assert get_virtual_slot_id(timezone.now()) > ids[0]
+
+
+def _cursor(position):
+    return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_values(api_admin, api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    persons_url = reverse('persons-list')
+    schedule_url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    for cursor in (['abc'], [True], [1.5], [1, 2]):
+        assert api_admin.get(persons_url, {'cursor': _cursor(cursor)}).status_code == 404
+    for cursor in (['abc', 1], [5, 1], ['2030-01-01T09:00:00', 1], ['2030-01-01T09:00:00+00:00', '1']):
+        assert api_patient.get(schedule_url, {'cursor': _cursor(cursor)}).status_code == 404
+
+    assert api_admin.get(persons_url, {'cursor': _cursor([1])}).status_code == 200
+    assert api_patient.get(schedule_url, {'cursor': _cursor(['2030-01-01T09:00:00+00:00', 1])}).status_code == 200
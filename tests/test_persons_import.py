@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+from ybooking_app.helpers import allocate_usernames
+from ybooking_app.models import Profile
+from ybooking_app.persons_import import import_persons, read_rows
+from ybooking_app.serializers import UserSerializer
+
+PERSON = {
+    'first_name': 'Ivan',
+    'last_name': 'Petrov',
+    'patronymic': 'Ivanovich',
+    'sex': Profile.Sex.MAN,
+    'birthday': '1980-01-01',
+    'is_doctor': False,
+}
+
+CSV_ROWS = (
+    'first_name,last_name,patronymic,sex,birthday,is_doctor\n'
+    'Ivan,Petrov,Ivanovich,1,1980-01-01,false\n'
+    'Irina,Petrova,Ivanovna,2,1985-02-02,true\n'
+    'Oleg,,Olegovich,1,1990-03-03,false\n'
+    'Igor,Petrov,Igorevich,1,not a date,false\n'
+)
+
+
+@pytest.mark.django_db
+def test_allocate_usernames():
+    User.objects.create(username='i_petrov')
+    User.objects.create(username='i_petrov_3')
+    User.objects.create(username='i_petrovich')
+
+    assert allocate_usernames(['i_petrov', 'i_sidorov', 'i_petrov', 'i_sidorov']) == [
+        'i_petrov_4', 'i_sidorov', 'i_petrov_5', 'i_sidorov_2',
+    ]
+
+
+@pytest.mark.django_db
+def test_serializer_username_collision():
+    for _ in range(2):
+        serializer = UserSerializer(data=PERSON)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    assert set(User.objects.values_list('username', flat=True)) == {'i_petrov', 'i_petrov_2'}
+
+
+@pytest.mark.django_db
+def test_import_persons(django_assert_max_num_queries):
+    rows = read_rows(CSV_ROWS.splitlines(keepends=True), 'csv')
+    # a lookup of usernames, users INSERT, ids SELECT and profiles INSERT
+    with django_assert_max_num_queries(6):
+        result = import_persons(rows, batch_size=10)
+
+    assert result['created'] == 2
+    assert [error['row'] for error in result['errors']] == [3, 4]
+    assert 'last_name' in result['errors'][0]['errors']
+    assert 'birthday' in result['errors'][1]['errors']
+
+    persons = {profile.user.username: profile for profile in Profile.objects.select_related('user')}
+    assert set(persons) == {'i_petrov', 'i_petrova'}
+    assert persons['i_petrova'].is_doctor
+    assert not persons['i_petrov'].user.has_usable_password()
+
+
+@pytest.mark.django_db
+def test_import_persons_batches():
+    lines = [json.dumps(PERSON) for _ in range(5)] + ['not json', '[]']
+    result = import_persons(read_rows(lines, 'ndjson'), batch_size=2)
+
+    assert result['created'] == 5
+    assert [error['row'] for error in result['errors']] == [6, 7]
+    assert set(User.objects.values_list('username', flat=True)) == {
+        'i_petrov', 'i_petrov_2', 'i_petrov_3', 'i_petrov_4', 'i_petrov_5',
+    }
+
+
+@pytest.mark.django_db
+def test_import_persons_endpoint(api_admin, api_patient):
+    url = reverse('persons-bulk-import')
+
+    def upload(client, **data):
+        return client.post(url, {'file': SimpleUploadedFile('persons.csv', CSV_ROWS.encode()), **data})
+
+    assert upload(api_patient).status_code == HTTP_403_FORBIDDEN
+    assert upload(api_admin, input='xml').status_code == HTTP_400_BAD_REQUEST
+
+    resp = upload(api_admin)
+    assert resp.status_code == HTTP_201_CREATED
+    assert resp.data['created'] == 2
+    assert len(resp.data['errors']) == 2
+
+
+@pytest.mark.django_db
+def test_import_persons_not_utf8(settings, api_admin):
+    settings.PERSONS_IMPORT_BATCH_SIZE = 1
+    # the broken row comes after batches which would be committed
+    content = CSV_ROWS.encode() + 'Ольга,Петрова,,2,1985-02-02,false\n'.encode('cp1251')
+
+    resp = api_admin.post(reverse('persons-bulk-import'), {'file': SimpleUploadedFile('persons.csv', content)})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Profile.objects.filter(user__last_name__startswith='Petrov').exists()
+
+
+@pytest.mark.django_db
+def test_import_persons_command(tmp_path):
+    path = tmp_path / 'persons.ndjson'
+    path.write_text('\n'.join(json.dumps(PERSON) for _ in range(3)))
+
+    call_command('import_persons', str(path), input='ndjson')
+    assert Profile.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_persons_failed_batch(monkeypatch):
+    User.objects.create(username='taken')
+    # usernames are taken concurrently on every attempt
+    monkeypatch.setattr('ybooking_app.persons_import.allocate_usernames', lambda bases: ['taken'] * len(bases))
+
+    lines = ['not json'] + [json.dumps(PERSON) for _ in range(2)]
+    result = import_persons(read_rows(lines, 'ndjson'), batch_size=10)
+
+    assert result['created'] == 0
+    assert [error['row'] for error in result['errors']] == [1, 2, 3]
+    assert 'non_field_errors' in result['errors'][1]['errors']
+    assert User.objects.count() == 1
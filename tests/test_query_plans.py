@@ -0,0 +1,86 @@
+import re
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ybooking_app.daily_statistics import _filter_days, get_daily_counts
+from ybooking_app.models import Profile, Timetable
+from ybooking_app.pagination import SchedulePagination
+from ybooking_app.views import TimetableViewSet
+
+SEQUENTIAL_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on timetable\b'),
+    # a full scan of an index is a scan too
+    'sqlite': re.compile(r'SCAN (TABLE )?timetable\b'),
+}
+
+
+@pytest.fixture
+def seeded_db():
+    call_command('seed_clinic', doctors=10, patients=20, planning_days=14, history_days=14, seed=1)
+
+    if connection.vendor == 'postgresql':
+        # the dataset is small, make the planner prefer indexes whenever it can use them
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+
+def assert_index_scan(queryset):
+    plan = queryset.explain()
+    pattern = SEQUENTIAL_SCANS.get(connection.vendor)
+    if pattern is None:
+        pytest.skip(f'Query plans are not checked on {connection.vendor}')
+
+    assert not pattern.search(plan), f'Sequential scan of timetable:\n{plan}'
+
+
+def _schedule_queryset(person, user):
+    request = Request(APIRequestFactory().get('/'))
+    request.user = user
+    view = TimetableViewSet(kwargs={'person_pk': person.id}, request=request, action='list', format_kwarg=None)
+    return view.get_queryset()
+
+
+@pytest.mark.django_db
+def test_doctor_free_slots_plan(seeded_db):
+    doctor = Profile.objects.filter(is_doctor=True).first()
+    patient = Profile.objects.filter(is_doctor=False).select_related('user').first()
+
+    assert_index_scan(_schedule_queryset(doctor, patient.user).order_by('start', 'id'))
+
+
+@pytest.mark.django_db
+def test_patient_sessions_plan(seeded_db):
+    patient = Profile.objects.filter(is_doctor=False).select_related('user').first()
+
+    assert_index_scan(_schedule_queryset(patient, patient.user).order_by('start', 'id'))
+
+
+@pytest.mark.django_db
+def test_statistics_plan(seeded_db):
+    """ Days recounted after booking, generation or regeneration """
+    doctor_ids = list(Profile.objects.filter(is_doctor=True).values_list('id', flat=True)[:2])
+    today = timezone.localdate()
+    sessions = _filter_days(Timetable.objects.filter(doctor_id__in=doctor_ids), today, today + timedelta(days=2))
+
+    assert_index_scan(get_daily_counts(sessions))
+
+
+@pytest.mark.django_db
+def test_past_sessions_plan(seeded_db):
+    assert_index_scan(Timetable.objects.filter(start__lt=timezone.now()).values('id')[:100])
+
+
+@pytest.mark.django_db
+def test_schedule_deep_page_plan(seeded_db):
+    doctor = Profile.objects.filter(is_doctor=True).first()
+    patient = Profile.objects.filter(is_doctor=False).select_related('user').first()
+    queryset = _schedule_queryset(doctor, patient.user).order_by('start', 'id')
+    last = queryset.last()
+
+    assert_index_scan(queryset.filter(SchedulePagination()._build_filter((last.start, last.id), False)))
@@ -0,0 +1,112 @@
+from datetime import time, timedelta
+
+import pytest
+from django.utils import timezone
+
+from ybooking_app.daily_statistics import rebuild
+from ybooking_app.models import DailyStatistics, DayInterval, Profile, Timetable, Vacation
+from ybooking_app.regeneration import get_affected_days, regenerate_days
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _next_weekday():
+    day = timezone.localdate() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def _day_sessions(doctor, day):
+    return list(Timetable.objects.filter(doctor=doctor, start__date=day).order_by('start').values_list(
+        'start__time', 'stop__time', 'patient_id', 'conflict',
+    ))
+
+
+def _assert_statistics_recounted():
+    aggregate = set(DailyStatistics.objects.exclude(booked=0, free=0).values_list('day', 'doctor_id', 'booked', 'free'))
+    rebuild()
+    assert aggregate == set(DailyStatistics.objects.exclude(booked=0, free=0).values_list(
+        'day', 'doctor_id', 'booked', 'free',
+    ))
+
+
+@pytest.fixture
+def booked_doctor(make_doctor, api_patient):
+    """ Doctor with generated sessions, the first session of the next weekday is booked """
+    doctor = make_doctor()
+    generate_timeslots_for()
+
+    day = _next_weekday()
+    session = Timetable.objects.filter(doctor=doctor, start__date=day).order_by('start').first()
+    session.patient = Profile.objects.get(user__username='user1')
+    session.save()
+    rebuild()
+    return doctor, day, session
+
+
+@pytest.mark.django_db
+def test_session_duration_change(booked_doctor, django_capture_on_commit_callbacks):
+    doctor, day, session = booked_doctor
+    other_doctor_sessions = Timetable.objects.exclude(doctor=doctor).count()
+
+    schedule = doctor.schedule_set.get()
+    schedule.session_duration = 60
+    with django_capture_on_commit_callbacks(execute=True):
+        schedule.save()
+
+    # the booked 9:00-9:30 session takes the doctor's 9:00-10:00 slot
+    assert _day_sessions(doctor, day) == [
+        (time(9), time(9, 30), session.patient_id, True),
+        (time(10), time(11), None, False),
+    ]
+    assert Timetable.objects.exclude(doctor=doctor).count() == other_doctor_sessions
+    _assert_statistics_recounted()
+
+
+@pytest.mark.django_db
+def test_vacation_change(booked_doctor, django_capture_on_commit_callbacks):
+    doctor, day, session = booked_doctor
+    sessions_before = _day_sessions(doctor, day)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        vacation = Vacation.objects.create(doctor=doctor, start_date=day, stop_date=day)
+    assert _day_sessions(doctor, day) == [(time(9), time(9, 30), session.patient_id, True)]
+    _assert_statistics_recounted()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        vacation.delete()
+    assert _day_sessions(doctor, day) == sessions_before
+    _assert_statistics_recounted()
+
+
+@pytest.mark.django_db
+def test_day_interval_change(booked_doctor, django_capture_on_commit_callbacks):
+    doctor, day, session = booked_doctor
+    interval = DayInterval.objects.get(doctor=doctor, weekday=day.weekday() + 1)
+
+    # both the old and the new weekday are affected
+    interval.weekday = DayInterval.Weekdays.SAT
+    assert get_affected_days(interval) == {
+        doctor.id: {d for d in _generated_days(doctor) if d.weekday() == 5},
+    }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        interval.save()
+    assert _day_sessions(doctor, day) == [(time(9), time(9, 30), session.patient_id, True)]
+
+    saturdays = [d for d in _generated_days(doctor) if d.weekday() == 5]
+    for saturday in saturdays:
+        assert len(_day_sessions(doctor, saturday)) == 4
+
+
+@pytest.mark.django_db
+def test_regenerate_past_days(booked_doctor):
+    doctor, _, _ = booked_doctor
+    yesterday = timezone.localdate() - timedelta(days=1)
+    assert regenerate_days({doctor.id: [yesterday]}) == {'deleted': 0, 'created': 0, 'conflicts': 0}
+
+
+def _generated_days(doctor):
+    through = doctor.schedule_set.get().generated_through
+    today = timezone.localdate()
+    return [today + timedelta(days=i) for i in range((through - today).days + 1)]
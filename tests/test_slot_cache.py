@@ -0,0 +1,88 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK
+
+from ybooking_app.checks import check_shared_caches
+from ybooking_app.models import Timetable
+from ybooking_app.slots import generate_timeslots_for
+
+
+def _list_ids(client, url):
+    resp = client.get(url, {'page_size': 100})
+    assert resp.status_code == HTTP_200_OK
+    return [slot['id'] for slot in resp.data['results']]
+
+
+@pytest.mark.django_db
+def test_cache_hit(api_patient, make_doctor, free_slots_cache):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+
+    slots = _list_ids(api_patient, url)
+    assert free_slots_cache.get_stats() == {'hits': 0, 'misses': 1}
+
+    with CaptureQueriesContext(connection) as captured:
+        assert _list_ids(api_patient, url) == slots
+    assert free_slots_cache.get_stats() == {'hits': 1, 'misses': 1}
+    assert not [query for query in captured.captured_queries if '"timetable"' in query['sql']]
+    # the doctor is not looked up
+    assert not [query for query in captured.captured_queries if '"profile"."id" =' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_cache_invalidated_by_booking_and_cancel(api_patient, make_doctor, free_slots_cache):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    slots = _list_ids(api_patient, url)
+
+    detail_url = reverse('schedule-detail', kwargs={'person_pk': doctor.id, 'pk': slots[0]})
+    assert api_patient.patch(detail_url, {}).status_code == HTTP_200_OK
+    assert _list_ids(api_patient, url) == slots[1:]
+
+    patient = User.objects.get(username='user1').profile
+    cancel_url = reverse('schedule-detail', kwargs={'person_pk': patient.id, 'pk': slots[0]})
+    assert api_patient.delete(cancel_url).status_code == HTTP_200_OK
+    assert _list_ids(api_patient, url) == slots
+    assert free_slots_cache.get_stats() == {'hits': 0, 'misses': 3}
+
+
+@pytest.mark.django_db
+def test_cache_invalidated_by_generation(api_patient, make_doctor):
+    doctor = make_doctor(planning_days=3)
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    _list_ids(api_patient, url)
+
+    doctor.schedule_set.update(planning_days=7)
+    generate_timeslots_for()
+    assert _list_ids(api_patient, url) == list(Timetable.objects.filter(
+        doctor=doctor,
+        start__gt=timezone.now(),
+    ).order_by('start').values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_cache_invalidated_by_deactivation(api_admin, api_patient, make_doctor):
+    doctor = make_doctor()
+    generate_timeslots_for()
+    url = reverse('schedule-list', kwargs={'person_pk': doctor.id})
+    assert _list_ids(api_patient, url)
+
+    api_admin.delete(reverse('persons-detail', args=(doctor.user_id,)))
+    with pytest.raises(ValueError):
+        api_patient.get(url)
+
+
+def test_shared_cache_check(settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.DEBUG = False
+    assert {message.id for message in check_shared_caches(None)} == {'ybooking_app.E001'}
+
+    settings.CACHES = {'default': {'BACKEND': 'django_redis.cache.RedisCache'}}
+    assert check_shared_caches(None) == []
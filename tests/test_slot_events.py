@@ -0,0 +1,126 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK
+
+from ybooking_app.event_stream import SlotEventsRouter
+from ybooking_app.models import Timetable
+from ybooking_app.signals import BOOK, CANCEL, GENERATE
+from ybooking_app.slot_events import FREED, GENERATED, RedisSlotEventBroker, get_slot_events
+
+
+async def _django_application(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'django'})
+
+
+application = SlotEventsRouter(_django_application)
+
+
+def _scope(path, token=None, method='GET'):
+    headers = [] if token is None else [(b'authorization', f'Token {token}'.encode())]
+    return {'type': 'http', 'method': method, 'path': path, 'headers': headers}
+
+
+async def _request(scope):
+    communicator = ApplicationCommunicator(application, scope)
+    await communicator.send_input({'type': 'http.request'})
+    start = await communicator.receive_output()
+    body = await communicator.receive_output()
+    await communicator.wait()
+    return start['status'], body['body']
+
+
+def _session(start, doctor_id=1):
+    return {'id': 10, 'doctor_id': doctor_id, 'patient_id': 2, 'start': start, 'stop': start + timedelta(minutes=30)}
+
+
+def test_get_slot_events():
+    now = timezone.now()
+    past, upcoming = _session(now - timedelta(hours=1)), _session(now + timedelta(hours=1))
+
+    assert get_slot_events(CANCEL, [past, upcoming], {}, now=now) == [{
+        'event': FREED,
+        'doctor_id': 1,
+        'id': 10,
+        'start': upcoming['start'].isoformat(),
+        'stop': upcoming['stop'].isoformat(),
+    }]
+    assert get_slot_events(BOOK, [upcoming], {}, now=now) == []
+    assert get_slot_events(GENERATE, [], {1: {date(2030, 1, 2), date(2030, 1, 1)}, 2: set()}, now=now) == [
+        {'event': GENERATED, 'doctor_id': 1, 'days': ['2030-01-01', '2030-01-02']},
+    ]
+
+
+@pytest.mark.django_db
+def test_slot_events_access(api_patient, make_doctor):
+    doctor = make_doctor()
+    token = Token.objects.get(user__username='user1').key
+    patient_id = Token.objects.get(key=token).user.profile.id
+
+    assert async_to_sync(_request)(_scope('/persons/')) == (200, b'django')
+    assert async_to_sync(_request)(_scope(f'/persons/{doctor.id}/schedule/events/'))[0] == 401
+    assert async_to_sync(_request)(_scope(f'/persons/{doctor.id}/schedule/events/', token='bad'))[0] == 401
+    assert async_to_sync(_request)(_scope(f'/persons/{patient_id}/schedule/events/', token=token))[0] == 404
+    assert async_to_sync(_request)(_scope(f'/persons/{doctor.id}/schedule/events/', token, method='POST'))[0] == 405
+
+
+@pytest.mark.django_db
+def test_slot_events_stream(api_patient, make_doctor, settings, django_capture_on_commit_callbacks):
+    settings.SLOT_EVENTS_KEEPALIVE = 0.1
+    doctor = make_doctor()
+    token = Token.objects.get(user__username='user1').key
+    patient = Token.objects.get(key=token).user.profile
+    start = timezone.now() + timedelta(days=1)
+    slot = Timetable.objects.create(doctor=doctor, patient=patient, start=start, stop=start + timedelta(minutes=30))
+
+    def cancel():
+        with django_capture_on_commit_callbacks(execute=True):
+            url = reverse('schedule-detail', kwargs={'person_pk': patient.id, 'pk': slot.id})
+            assert api_patient.delete(url).status_code == HTTP_200_OK
+
+    async def listen():
+        communicator = ApplicationCommunicator(application, _scope(f'/persons/{doctor.id}/schedule/events/', token))
+        await communicator.send_input({'type': 'http.request'})
+
+        response_start = await communicator.receive_output()
+        assert response_start['status'] == 200
+        assert (b'content-type', b'text/event-stream') in response_start['headers']
+        assert (await communicator.receive_output())['body'].startswith(b'retry:')
+
+        # an idle connection is kept alive
+        assert (await communicator.receive_output())['body'] == b': keepalive\n\n'
+
+        await sync_to_async(cancel)()
+        message = await communicator.receive_output()
+        while message['body'] == b': keepalive\n\n':
+            message = await communicator.receive_output()
+
+        name, data = message['body'].decode().splitlines()[:2]
+        assert name == f'event: {FREED}'
+        assert json.loads(data.split(': ', 1)[1])['id'] == slot.id
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait()
+
+    async_to_sync(listen)()
+
+
+def test_redis_slot_event_broker():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeStrictRedis()
+    broker = RedisSlotEventBroker(client=client)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(f'{RedisSlotEventBroker.CHANNEL_PREFIX}1')
+
+    broker.publish([{'event': GENERATED, 'doctor_id': 1, 'days': ['2030-01-01']}])
+    # the first message is the subscription confirmation
+    messages = [pubsub.get_message() for _ in range(2)]
+    message = next(message for message in messages if message is not None)
+    assert json.loads(message['data']) == {'event': GENERATED, 'doctor_id': 1, 'days': ['2030-01-01']}
@@ -0,0 +1,113 @@
+from datetime import timedelta, time
+
+import pytest
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from ybooking_app.models import Schedule, Timetable, Vacation
+from ybooking_app import tasks
+from ybooking_app.slots import generate_timeslots_for
+from ybooking_app.tasks import timeslots_workflow
+
+
+def _weekdays_ahead(days):
+    today = timezone.localdate()
+    return [today + timedelta(days=i) for i in range(days) if (today + timedelta(days=i)).weekday() < 5]
+
+
+@pytest.mark.django_db
+def test_generate_timeslots(make_doctor):
+    doctor = make_doctor()
+
+    created = generate_timeslots_for()
+
+    workdays = _weekdays_ahead(7)
+    assert created == len(workdays) * 4
+
+    sessions = Timetable.objects.filter(doctor=doctor).order_by('start')
+    assert sessions.count() == created
+    first = sessions.first()
+    assert timezone.localtime(first.start).time() == time(9)
+    assert first.stop - first.start == timedelta(minutes=30)
+    assert {timezone.localdate(session.start) for session in sessions} == set(workdays)
+
+
+@pytest.mark.django_db
+def test_generate_timeslots_skips_vacations(make_doctor):
+    doctor = make_doctor()
+    workdays = _weekdays_ahead(7)
+    Vacation.objects.create(doctor=doctor, start_date=workdays[0], stop_date=workdays[0])
+
+    assert generate_timeslots_for() == (len(workdays) - 1) * 4
+    # days which already have sessions are not generated again
+    assert generate_timeslots_for() == 0
+    assert not Timetable.objects.filter(start__date=workdays[0]).exists()
+
+
+@pytest.mark.django_db
+def test_generate_timeslots_query_count(make_doctor, django_assert_max_num_queries):
+    for i in range(10):
+        make_doctor(last_name=f'doctor_{i}')
+
+    # schedules, intervals, vacations, inserts (split by SQLite parameters limit),
+    # watermarks update and daily statistics recount
+    with django_assert_max_num_queries(12):
+        assert generate_timeslots_for() == len(_weekdays_ahead(7)) * 4 * 10
+
+
+@pytest.mark.django_db
+def test_generate_timeslots_watermark(make_doctor, django_assert_max_num_queries):
+    doctor = make_doctor(planning_days=3)
+    today = timezone.localdate()
+
+    generate_timeslots_for()
+    schedule = Schedule.objects.get(doctor=doctor)
+    assert schedule.generated_through == today + timedelta(days=2)
+
+    # watermark is up to date, nothing to generate
+    with django_assert_max_num_queries(5):
+        assert generate_timeslots_for() == 0
+
+    # longer horizon: only days beyond the watermark are created
+    schedule.planning_days = 10
+    schedule.save()
+    new_days = [day for day in _weekdays_ahead(10) if day > today + timedelta(days=2)]
+    assert generate_timeslots_for() == len(new_days) * 4
+
+    schedule.refresh_from_db()
+    assert schedule.generated_through == today + timedelta(days=9)
+    assert Timetable.objects.filter(doctor=doctor).count() == len(_weekdays_ahead(10)) * 4
+
+
+@pytest.mark.django_db
+def test_timeslots_workflow(make_doctor, celery_eager):
+    for i in range(7):
+        make_doctor(last_name=f'doctor_{i}')
+
+    summary = timeslots_workflow(chunk_size=3).apply_async().get()
+
+    assert summary == {'doctors': 7, 'slots': len(_weekdays_ahead(7)) * 4 * 7, 'failed': []}
+    assert Timetable.objects.count() == summary['slots']
+
+
+@pytest.mark.django_db
+def test_timeslots_workflow_failed_chunk(make_doctor, celery_eager, monkeypatch):
+    doctors = [make_doctor(last_name=f'doctor_{i}') for i in range(4)]
+    calls = []
+
+    def flaky_generate(doctor_ids):
+        calls.append(list(doctor_ids))
+        if doctors[0].id in doctor_ids:
+            raise DatabaseError('connection lost')
+        return generate_timeslots_for(doctor_ids)
+
+    monkeypatch.setattr(tasks, 'generate_timeslots_for', flaky_generate)
+    summary = timeslots_workflow(chunk_size=2).apply_async().get()
+
+    assert summary['doctors'] == 2
+    assert summary['failed'] == [doctors[0].id, doctors[1].id]
+    # the failed chunk is retried, the other one is processed once
+    assert calls.count([doctors[2].id, doctors[3].id]) == 1
+    assert calls.count([doctors[0].id, doctors[1].id]) == settings.TIMESLOTS_CHUNK_MAX_RETRIES + 1
+    assert not Timetable.objects.filter(doctor_id__in=[doctors[0].id, doctors[1].id]).exists()
@@ -0,0 +1,48 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+from ybooking_app.models import Timetable
+from ybooking_app.serializers import (
+    TimetableSerializer,
+    TimetableValuesSerializer,
+    UserSerializer,
+    UserValuesSerializer,
+)
+
+
+@pytest.mark.django_db
+def test_user_values_serializer(doctor_obj, api_patient):
+    users = User.objects.filter(profile__isnull=False).order_by('id')
+    rows = UserValuesSerializer.get_values(users)
+
+    assert [UserValuesSerializer.to_representation(row) for row in rows] == \
+        [dict(data) for data in UserSerializer(users, many=True).data]
+
+
+@pytest.mark.django_db
+def test_timetable_values_serializer(doctor_obj):
+    sessions = Timetable.objects.order_by('id')
+    rows = TimetableValuesSerializer.get_values(sessions)
+
+    assert [TimetableValuesSerializer.to_representation(row) for row in rows] == \
+        [dict(data) for data in TimetableSerializer(sessions, many=True).data]
+
+
+@pytest.mark.django_db
+def test_persons_list_single_query(api_patient, make_doctor, django_assert_num_queries):
+    for i in range(5):
+        make_doctor(last_name=f'doctor{i}')
+    url = reverse('persons-list')
+    api_patient.get(url)
+
+    with django_assert_num_queries(1):
+        resp = api_patient.get(url, {'page_size': 100})
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.data['results']) == 6
+
+    doctor = User.objects.get(last_name='doctor0')
+    resp = api_patient.get(reverse('persons-detail', args=(doctor.id,)))
+    assert resp.status_code == HTTP_200_OK
+    assert resp.data == UserSerializer(doctor).data
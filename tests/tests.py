@@ -9,6 +9,7 @@ from rest_framework.status import (
     HTTP_401_UNAUTHORIZED,
     HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
 )
 
 
@@ -110,7 +111,7 @@ def test_sessions_user(api_user, doctor_obj):
 
     get_resp = api_user.get(list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 2
+    assert len(get_resp.data['results']) == 2
 
     post_resp = api_user.post(list_url, {})
     assert post_resp.status_code == HTTP_403_FORBIDDEN
@@ -137,7 +138,7 @@ def test_sessions_patient(api_patient, doctor_obj):
 
     get_resp = api_patient.get(doctor_slots_list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 2
+    assert len(get_resp.data['results']) == 2
 
     data = json.loads(get_resp.content.decode())
     doctor_free_slots = data['results']
@@ -162,12 +163,12 @@ def test_sessions_patient(api_patient, doctor_obj):
 
     # try to book it again
     resp = api_patient.patch(doctor_slot_detail_url, {})
-    assert resp.status_code == HTTP_404_NOT_FOUND
+    assert resp.status_code == HTTP_409_CONFLICT
 
     # slot was removed from free doctor slots, so now doctor has 1 free slot
     get_resp = api_patient.get(doctor_slots_list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 1
+    assert len(get_resp.data['results']) == 1
 
     patient_slots_list_url = reverse(
         'schedule-list',
@@ -177,7 +178,7 @@ def test_sessions_patient(api_patient, doctor_obj):
     # patient has 1 booked timeslot
     get_resp = api_patient.get(patient_slots_list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 1
+    assert len(get_resp.data['results']) == 1
 
     data = json.loads(get_resp.content.decode())
     patient_slots = data['results']
@@ -197,9 +198,9 @@ def test_sessions_patient(api_patient, doctor_obj):
     # now patient has no booked timeslot
     get_resp = api_patient.get(patient_slots_list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 0
+    assert len(get_resp.data['results']) == 0
 
     # and doctor again has 2 slots
     get_resp = api_patient.get(doctor_slots_list_url)
     assert get_resp.status_code == HTTP_200_OK
-    assert get_resp.data['count'] == 2
+    assert len(get_resp.data['results']) == 2
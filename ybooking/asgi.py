@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ybooking.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once Django is set up
+from ybooking_app.event_stream import SlotEventsRouter  # noqa: E402
+
+application = SlotEventsRouter(django_application)
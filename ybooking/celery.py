@@ -20,4 +20,8 @@ app.conf.beat_schedule = {
         'task': 'ybooking_app.tasks.generate_timeslots',
         'schedule': crontab(minute=0, hour=0),  # daily at midnight
     },
+    'archive-sessions': {
+        'task': 'ybooking_app.tasks.archive_sessions',
+        'schedule': crontab(minute=0, hour=3),  # daily at 3 AM
+    },
 }
\ No newline at end of file
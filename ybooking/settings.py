@@ -24,7 +24,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.environ.get('DEBUG', default=0)
+DEBUG = bool(int(os.environ.get('DEBUG', default=0)))
 
 ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS').split(' ')
 
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, latency covers other middleware
+    'ybooking_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +92,17 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -135,12 +148,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'ybooking_app.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# Cached token -> user -> profile lookups
+AUTH_CACHE = os.environ.get("AUTH_CACHE", "default")
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 60))  # seconds
+
+# Cursor pagination of persons and schedules
+KEYSET_PAGE_SIZE = int(os.environ.get("KEYSET_PAGE_SIZE", 10))
+KEYSET_MAX_PAGE_SIZE = int(os.environ.get("KEYSET_MAX_PAGE_SIZE", 100))
+
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_BROKER", "redis://localhost:6379/0")
+
+# Timeslots generation
+TIMESLOTS_BATCH_SIZE = int(os.environ.get("TIMESLOTS_BATCH_SIZE", 5000))
+TIMESLOTS_CHUNK_SIZE = int(os.environ.get("TIMESLOTS_CHUNK_SIZE", 500))
+TIMESLOTS_CHUNK_MAX_RETRIES = int(os.environ.get("TIMESLOTS_CHUNK_MAX_RETRIES", 3))
+# compute free slots from schedule templates instead of generating Timetable items
+TIMESLOTS_VIRTUAL = bool(int(os.environ.get("TIMESLOTS_VIRTUAL", 0)))
+
+# Archive of past sessions
+TIMETABLE_ARCHIVE_AFTER_DAYS = int(os.environ.get("TIMETABLE_ARCHIVE_AFTER_DAYS", 90))
+TIMETABLE_ARCHIVE_BATCH_SIZE = int(os.environ.get("TIMETABLE_ARCHIVE_BATCH_SIZE", 5000))
+TIMETABLE_ARCHIVE_MAX_BATCHES = int(os.environ.get("TIMETABLE_ARCHIVE_MAX_BATCHES", 100))  # per task run
+# monthly partitions of the archive, PostgreSQL only (see partition_timetable_archive command)
+TIMETABLE_ARCHIVE_PARTITIONED = bool(int(os.environ.get("TIMETABLE_ARCHIVE_PARTITIONED", 0)))
+
+# Booking
+BULK_BOOKING_MAX_SLOTS = int(os.environ.get("BULK_BOOKING_MAX_SLOTS", 50))
+
+# Bulk import of persons
+PERSONS_IMPORT_BATCH_SIZE = int(os.environ.get("PERSONS_IMPORT_BATCH_SIZE", 1000))
+
+# Versions of schedules and statistics for caching and conditional GET
+VERSIONS_CACHE = os.environ.get("VERSIONS_CACHE", "default")
+# seconds a schedule ETag stays valid while its sessions start
+SCHEDULE_ETAG_MAX_AGE = int(os.environ.get("SCHEDULE_ETAG_MAX_AGE", 60))
+
+# Streaming exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# iCalendar feeds of persons' sessions
+CALENDAR_FEED_CACHE = os.environ.get("CALENDAR_FEED_CACHE", "default")
+CALENDAR_FEED_TTL = int(os.environ.get("CALENDAR_FEED_TTL", 24 * 60 * 60))  # seconds
+CALENDAR_FEED_PAST_DAYS = int(os.environ.get("CALENDAR_FEED_PAST_DAYS", 30))
+
+# Read-through cache of doctors' free slots
+FREE_SLOTS_CACHE = os.environ.get("FREE_SLOTS_CACHE", "default")
+FREE_SLOTS_CACHE_TTL = int(os.environ.get("FREE_SLOTS_CACHE_TTL", 300))  # seconds
+
+# Multi-doctor availability search
+OCCUPANCY_INDEX_TTL = int(os.environ.get("OCCUPANCY_INDEX_TTL", 60))  # seconds
+AVAILABILITY_SEARCH_MAX_DAYS = int(os.environ.get("AVAILABILITY_SEARCH_MAX_DAYS", 31))
+AVAILABILITY_SEARCH_MAX_LIMIT = int(os.environ.get("AVAILABILITY_SEARCH_MAX_LIMIT", 100))
+
+# Short-lived slot holds before booking
+SLOT_HOLDS_BACKEND = os.environ.get("SLOT_HOLDS_BACKEND", "ybooking_app.holds.RedisHoldBackend")
+SLOT_HOLDS_REDIS_URL = os.environ.get("SLOT_HOLDS_REDIS", CELERY_BROKER_URL)
+SLOT_HOLDS_TTL = int(os.environ.get("SLOT_HOLDS_TTL", 300))  # seconds
+
+# Request metrics served at /metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # bearer token of scrapers, required unless DEBUG
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Server-sent events of freed and generated slots
+SLOT_EVENTS_BACKEND = os.environ.get("SLOT_EVENTS_BACKEND", "ybooking_app.slot_events.RedisSlotEventBroker")
+SLOT_EVENTS_REDIS_URL = os.environ.get("SLOT_EVENTS_REDIS", CELERY_BROKER_URL)
+SLOT_EVENTS_QUEUE_SIZE = int(os.environ.get("SLOT_EVENTS_QUEUE_SIZE", 100))  # events per client
+SLOT_EVENTS_KEEPALIVE = int(os.environ.get("SLOT_EVENTS_KEEPALIVE", 15))  # seconds
+SLOT_EVENTS_RETRY = int(os.environ.get("SLOT_EVENTS_RETRY", 5))  # seconds before a client reconnects
+SLOT_EVENTS_RECONNECT_DELAY = int(os.environ.get("SLOT_EVENTS_RECONNECT_DELAY", 1))  # seconds
+
+# Idempotency-Key header support
+IDEMPOTENCY_CACHE = os.environ.get("IDEMPOTENCY_CACHE", "default")
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 24 * 60 * 60))  # seconds
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 30))  # seconds
@@ -1,7 +1,16 @@
 from django.contrib import admin
 
-from ybooking_app.models import Profile, Timetable, Vacation
+from ybooking_app.models import DayInterval, Profile, Schedule, Timetable, Vacation
+
+
+@admin.register(Timetable)
+class TimetableAdmin(admin.ModelAdmin):
+    list_display = ('id', 'doctor', 'patient', 'start', 'stop', 'conflict')
+    # booked sessions which don't fit changed schedules
+    list_filter = ('conflict',)
+
 
 admin.site.register(Profile)
-admin.site.register(Timetable)
+admin.site.register(Schedule)
+admin.site.register(DayInterval)
 admin.site.register(Vacation)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class YbookingAppConfig(AppConfig):
+    name = 'ybooking_app'
+
+    def ready(self):
+        from ybooking_app import checks, receivers  # noqa: F401
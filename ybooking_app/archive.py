@@ -0,0 +1,142 @@
+"""
+Archive of past sessions.
+
+Sessions which started more than TIMETABLE_ARCHIVE_AFTER_DAYS days ago are
+moved from Timetable to ArchivedTimetable in bounded batches, so the live table
+only holds the active horizon. Daily statistics of archived days are kept in
+DailyStatistics and recounted from both tables (see daily_statistics.py).
+
+On PostgreSQL the archive may be partitioned by month of session start:
+`partition_timetable_archive` command converts the table once and with
+TIMETABLE_ARCHIVE_PARTITIONED partitions are created before sessions are moved.
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ybooking_app.helpers import get_day_start
+from ybooking_app.models import ArchivedTimetable, Timetable
+from ybooking_app.signals import SESSION_FIELDS
+from ybooking_app.versions import bump_versions, schedule_scope
+
+TABLE = ArchivedTimetable._meta.db_table
+
+
+def get_archive_cutoff(today: Optional[date] = None) -> datetime:
+    """ Sessions started before the moment are archived """
+    today = today or timezone.localdate()
+    return get_day_start(today - timedelta(days=settings.TIMETABLE_ARCHIVE_AFTER_DAYS))
+
+
+def archive_sessions(before: Optional[datetime] = None, batch_size: Optional[int] = None,
+                     max_batches: Optional[int] = None) -> int:
+    """
+    Move sessions started before the moment to the archive, a transaction per
+    batch; returns the number of archived sessions
+    """
+    before = before or get_archive_cutoff()
+    batch_size = batch_size or settings.TIMETABLE_ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.TIMETABLE_ARCHIVE_MAX_BATCHES
+    archived = 0
+
+    for _ in range(max_batches):
+        with transaction.atomic():
+            sessions = list(
+                Timetable.objects.select_for_update()
+                .filter(start__lt=before)
+                .order_by('start', 'id')
+                .values(*SESSION_FIELDS, 'conflict')[:batch_size]
+            )
+            if not sessions:
+                break
+
+            if settings.TIMETABLE_ARCHIVE_PARTITIONED:
+                create_partitions(get_partition_months(session['start'] for session in sessions))
+
+            ArchivedTimetable.objects.bulk_create([ArchivedTimetable(**session) for session in sessions])
+            Timetable.objects.filter(pk__in=[session['id'] for session in sessions]).delete()
+
+        # archived sessions leave calendar feeds of the persons
+        persons = {session['doctor_id'] for session in sessions}
+        persons.update(session['patient_id'] for session in sessions if session['patient_id'] is not None)
+        bump_versions(schedule_scope(person_id) for person_id in persons)
+
+        archived += len(sessions)
+        if len(sessions) < batch_size:
+            break
+
+    return archived
+
+
+def get_partition_months(starts: Iterable[datetime]) -> List[date]:
+    """ First days of UTC months of the moments """
+    return sorted({start.astimezone(timezone.utc).date().replace(day=1) for start in starts})
+
+
+def get_partition_name(month: date) -> str:
+    return f'{TABLE}_y{month.year}m{month.month:02d}'
+
+
+def create_partitions(months: Iterable[date]):
+    """ Create missing monthly partitions of the archive (PostgreSQL) """
+    with connection.cursor() as cursor:
+        for month in months:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {get_partition_name(month)} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [f'{month.isoformat()} 00:00:00+00', f'{next_month.isoformat()} 00:00:00+00'],
+            )
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+
+@transaction.atomic()
+def partition_archive_table() -> int:
+    """
+    Convert the archive to a table partitioned by month of start (PostgreSQL),
+    returns the number of created partitions
+    """
+    old_table = f'{TABLE}_unpartitioned'
+    indexes = [index.name for index in ArchivedTimetable._meta.indexes]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old_table}')
+        cursor.execute(f'ALTER TABLE {old_table} RENAME CONSTRAINT {TABLE}_pkey TO {old_table}_pkey')
+        for name in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+
+        # the partition key is a part of the primary key
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (
+                id bigint NOT NULL,
+                doctor_id bigint NOT NULL REFERENCES profile (id) DEFERRABLE INITIALLY DEFERRED,
+                patient_id bigint NULL REFERENCES profile (id) DEFERRABLE INITIALLY DEFERRED,
+                start timestamp with time zone NOT NULL,
+                stop timestamp with time zone NOT NULL,
+                conflict boolean NOT NULL,
+                PRIMARY KEY (id, start)
+            ) PARTITION BY RANGE (start)
+        """)
+        for index in ArchivedTimetable._meta.indexes:
+            columns = ', '.join(ArchivedTimetable._meta.get_field(field).column for field in index.fields)
+            cursor.execute(f'CREATE INDEX {index.name} ON {TABLE} ({columns})')
+
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', start AT TIME ZONE 'UTC')::date FROM {old_table}")
+        months = sorted(row[0] for row in cursor.fetchall())
+        create_partitions(months)
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT id, doctor_id, patient_id, start, stop, conflict FROM {old_table}')
+        cursor.execute(f'DROP TABLE {old_table}')
+
+    return len(months)
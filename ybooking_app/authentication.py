@@ -0,0 +1,98 @@
+"""
+Token authentication with cached token -> user -> profile lookups.
+
+Token, user and profile are fetched with one joined query. Their ids and the
+flags permission checks need (not the user with its password hash) are kept in
+AUTH_CACHE for AUTH_CACHE_TTL seconds, the user and the profile are rebuilt
+from them with the other fields deferred, so `request.user.profile` costs no
+queries for the rest of the request. Entries are dropped when the token, the
+user or the profile is saved or deleted; AUTH_CACHE must be shared between
+processes for that to reach all of them.
+"""
+import hashlib
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from ybooking_app.models import Profile
+
+USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+PROFILE_FIELDS = ('id', 'user_id', 'is_doctor')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache = _get_cache()
+        cache_key = _get_cache_key(key)
+
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            try:
+                token = Token.objects.select_related('user', 'user__profile').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            credentials = _dump_credentials(token)
+            cache.set(cache_key, credentials, timeout=settings.AUTH_CACHE_TTL)
+
+        if not credentials['user']['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return _load_credentials(key, credentials)
+
+
+def _dump_credentials(token: Token) -> dict:
+    """ Ids and flags of the token's user and profile """
+    user = token.user
+    profile = getattr(user, 'profile', None)
+    return {
+        'user': {field: getattr(user, field) for field in USER_FIELDS},
+        'profile': {field: getattr(profile, field) for field in PROFILE_FIELDS} if profile else None,
+    }
+
+
+def _load_credentials(key: str, credentials: dict):
+    """ User with its profile and token, fields which aren't cached are deferred """
+    user = _from_db(User, credentials['user'])
+    profile = _from_db(Profile, credentials['profile']) if credentials['profile'] else None
+    # a user without a profile must not query for it either
+    User.profile.related.set_cached_value(user, profile)
+    if profile is not None:
+        Profile.user.field.set_cached_value(profile, user)
+
+    token = _from_db(Token, {'key': key, 'user_id': user.id})
+    Token.user.field.set_cached_value(token, user)
+    return user, token
+
+
+def _from_db(model, values: dict):
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        None,
+        [field.attname for field in fields],
+        [values.get(field.attname, DEFERRED) for field in fields],
+    )
+
+
+def invalidate_tokens(keys: Iterable[str]):
+    _get_cache().delete_many([_get_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id: int):
+    invalidate_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+def _get_cache_key(key: str) -> str:
+    return f'auth-token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _get_cache():
+    return caches[settings.AUTH_CACHE]
@@ -0,0 +1,90 @@
+"""
+Virtual (not materialized) free slots.
+
+Free slots are computed from Schedule, DayInterval and Vacation on request,
+a Timetable item is created only when a patient books the slot. Virtual slots
+are identified by negative ids: minutes since epoch of the slot start.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.utils import timezone
+
+from ybooking_app.models import Profile, Timetable
+from ybooking_app.slots import load_templates
+
+
+def get_virtual_slot_id(start: datetime) -> int:
+    return -int(start.timestamp() // 60)
+
+
+def is_virtual_slot_id(slot_id) -> bool:
+    try:
+        return int(slot_id) < 0
+    except (TypeError, ValueError):
+        return False
+
+
+def get_virtual_slot_start(slot_id) -> Optional[datetime]:
+    """ Start of the virtual slot, None if the id is out of the datetime range """
+    try:
+        return datetime.fromtimestamp(-int(slot_id) * 60, tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def get_free_slots(doctor: Profile) -> List[dict]:
+    """
+    Upcoming free slots of the doctor ordered by start
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    template = load_templates(today, [doctor.id]).get(doctor.id)
+
+    # materialized sessions replace virtual ones, booked sessions are hidden
+    sessions = {
+        session['start']: session
+        for session in Timetable.objects.filter(
+            doctor_id=doctor.id,
+            start__gt=now,
+        ).values('id', 'start', 'stop', 'patient_id')
+    }
+
+    slots = [
+        {'id': session['id'], 'start': session['start'], 'stop': session['stop']}
+        for session in sessions.values()
+        if session['patient_id'] is None
+    ]
+
+    if template is not None:
+        for offset in range(template.planning_days):
+            for start, stop in template.sessions(today + timedelta(days=offset)):
+                if start > now and start not in sessions:
+                    slots.append({'id': get_virtual_slot_id(start), 'start': start, 'stop': stop})
+
+    return sorted(slots, key=lambda slot: (slot['start'], slot['id']))
+
+
+def get_virtual_slot(doctor: Profile, slot_id) -> Optional[Timetable]:
+    """
+    Free session of the doctor by virtual id: existing free Timetable item
+    or a new unsaved one, None if there is no such free slot
+    """
+    start = get_virtual_slot_start(slot_id)
+    if start is None or start <= timezone.now():
+        return None
+
+    session = Timetable.objects.filter(doctor_id=doctor.id, start=start).first()
+    if session is not None:
+        return session if session.patient_id is None else None
+
+    day = timezone.localdate(start)
+    template = load_templates(day, [doctor.id]).get(doctor.id)
+    if template is None or (day - timezone.localdate()).days >= template.planning_days:
+        return None
+
+    for session_start, session_stop in template.sessions(day):
+        if session_start == start:
+            return Timetable(doctor_id=doctor.id, patient_id=None, start=session_start, stop=session_stop)
+
+    return None
@@ -0,0 +1,200 @@
+"""
+Benchmarks of slot generation and hot endpoints.
+
+Every benchmark is a factory which prepares a single run and returns a callable
+to be timed. Runs are executed in a transaction which is rolled back, so the
+dataset (see `seed_clinic` command) stays the same between runs.
+"""
+import random
+import statistics
+import time
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ybooking_app.models import Profile, Schedule, Timetable
+from ybooking_app.serializers import (
+    TimetableSerializer,
+    TimetableValuesSerializer,
+    UserSerializer,
+    UserValuesSerializer,
+)
+from ybooking_app.slot_cache import invalidate_free_slots
+from ybooking_app.slots import generate_timeslots_for
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+class BenchmarkContext:
+    """
+    Dataset entities and API clients shared by benchmarks
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.doctors = list(Profile.objects.filter(
+            is_doctor=True,
+            user__is_active=True,
+            schedule__isnull=False,
+        ).values_list('id', flat=True).distinct())
+        self.patients = list(Profile.objects.filter(
+            is_doctor=False,
+            user__is_active=True,
+        ).values_list('id', flat=True))
+
+        if not self.doctors or not self.patients:
+            raise ValueError('There are no doctors or patients, fill the database with seed_clinic command')
+
+    def doctor(self) -> int:
+        return self.random.choice(self.doctors)
+
+    def patient_client(self) -> APIClient:
+        patient = Profile.objects.select_related('user').get(id=self.random.choice(self.patients))
+        client = APIClient()
+        client.force_authenticate(patient.user)
+        return client
+
+
+@benchmark('generate_timeslots')
+def generate_timeslots_benchmark(context: BenchmarkContext):
+    # forget generated free sessions of all doctors
+    Timetable.objects.filter(patient_id__isnull=True, start__gt=timezone.now()).delete()
+    Schedule.objects.update(generated_through=None)
+    return generate_timeslots_for
+
+
+@benchmark('schedule_list')
+def schedule_list_benchmark(context: BenchmarkContext):
+    client = context.patient_client()
+    url = reverse('schedule-list', kwargs={'person_pk': context.doctor()})
+    return lambda: _check(client.get(url))
+
+
+@benchmark('booking')
+def booking_benchmark(context: BenchmarkContext):
+    client = context.patient_client()
+    session = Timetable.objects.filter(
+        doctor_id=context.doctor(),
+        patient_id__isnull=True,
+        start__gt=timezone.now(),
+    ).order_by('start').first()
+    if session is None:
+        return lambda: None
+
+    url = reverse('schedule-detail', kwargs={'person_pk': session.doctor_id, 'pk': session.id})
+    return lambda: _check(client.patch(url, {}))
+
+
+@benchmark('availability_search')
+def availability_search_benchmark(context: BenchmarkContext):
+    client = context.patient_client()
+    url = reverse('availability-list')
+    return lambda: _check(client.get(url, {'limit': 50}))
+
+
+@benchmark('persons_list')
+def persons_list_benchmark(context: BenchmarkContext):
+    client = context.patient_client()
+    url = reverse('persons-list')
+    return lambda: _check(client.get(url, {'page_size': settings.KEYSET_MAX_PAGE_SIZE}))
+
+
+# serialization of a page of persons and sessions: model serializers versus values() rows
+
+@benchmark('persons_page_serializer')
+def persons_page_serializer_benchmark(context: BenchmarkContext):
+    queryset = User.objects.filter(is_active=True).order_by('id')[:settings.KEYSET_MAX_PAGE_SIZE]
+    return lambda: UserSerializer(queryset.all(), many=True).data
+
+
+@benchmark('persons_page_values')
+def persons_page_values_benchmark(context: BenchmarkContext):
+    queryset = User.objects.filter(is_active=True).order_by('id')[:settings.KEYSET_MAX_PAGE_SIZE]
+    return lambda: [
+        UserValuesSerializer.to_representation(row) for row in UserValuesSerializer.get_values(queryset.all())
+    ]
+
+
+@benchmark('sessions_page_serializer')
+def sessions_page_serializer_benchmark(context: BenchmarkContext):
+    queryset = Timetable.objects.order_by('start', 'id')[:settings.KEYSET_MAX_PAGE_SIZE]
+    return lambda: TimetableSerializer(queryset.all(), many=True).data
+
+
+@benchmark('sessions_page_values')
+def sessions_page_values_benchmark(context: BenchmarkContext):
+    queryset = Timetable.objects.order_by('start', 'id')[:settings.KEYSET_MAX_PAGE_SIZE]
+    return lambda: [
+        TimetableValuesSerializer.to_representation(row)
+        for row in TimetableValuesSerializer.get_values(queryset.all())
+    ]
+
+
+@benchmark('statistics')
+def statistics_benchmark(context: BenchmarkContext):
+    client = context.patient_client()
+    url = reverse('statistics-list')
+    return lambda: _check(client.get(url))
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise AssertionError(f'Unexpected response {response.status_code}: {response.content[:200]!r}')
+
+
+def run_benchmarks(names=None, repeat=5, seed=None) -> dict:
+    """
+    Run benchmarks, returns wall time, database time and query count of every benchmark
+    """
+    context = BenchmarkContext(seed)
+    results = {}
+
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name in names or BENCHMARKS:
+            wall, db, queries = [], [], []
+
+            for _ in range(repeat):
+                with transaction.atomic():
+                    run = BENCHMARKS[name](context)
+
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        run()
+                        wall.append((time.perf_counter() - started) * 1000)
+
+                    db.append(sum(float(query['time']) for query in captured.captured_queries) * 1000)
+                    queries.append(len(captured))
+                    transaction.set_rollback(True)
+
+                # free slots cached from rolled back data
+                invalidate_free_slots(context.doctors)
+
+            results[name] = {
+                'runs': repeat,
+                'wall_ms': _summary(wall),
+                'db_ms': _summary(db),
+                'queries': _summary(queries),
+            }
+
+    return results
+
+
+def _summary(values) -> dict:
+    return {
+        'min': round(min(values), 3),
+        'median': round(statistics.median(values), 3),
+        'max': round(max(values), 3),
+    }
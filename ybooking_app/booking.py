@@ -0,0 +1,137 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ybooking_app.availability import get_virtual_slot, get_virtual_slot_start
+from ybooking_app.models import Profile, Timetable
+from ybooking_app.signals import BOOK, CANCEL, CREATE, SESSION_FIELDS, notify_timetable_changed
+
+BOOKED = 'booked'
+CANCELED = 'canceled'
+CONFLICT = 'conflict'
+NOT_FOUND = 'not_found'
+
+
+def book_slot(doctor_id: int, slot_id: int, patient_id: int) -> Tuple[str, Optional[dict]]:
+    """
+    Assign a free session to the patient with a single conditional UPDATE,
+    returns booking status and SESSION_FIELDS of the booked session
+    """
+    with transaction.atomic():
+        booked = Timetable.objects.filter(
+            pk=slot_id,
+            doctor_id=doctor_id,
+            patient_id__isnull=True,
+            start__gt=timezone.now(),
+        ).update(patient_id=patient_id)
+
+        if booked:
+            # the updated row is locked until commit, the response and events are built from this read
+            session = Timetable.objects.filter(pk=slot_id).values(*SESSION_FIELDS).get()
+            notify_timetable_changed(BOOK, [session])
+            return BOOKED, session
+
+    # tell an already taken session from a missing one
+    if Timetable.objects.filter(pk=slot_id, doctor_id=doctor_id, start__gt=timezone.now()).exists():
+        return CONFLICT, None
+
+    return NOT_FOUND, None
+
+
+def book_virtual_slot(doctor: Profile, slot_id: int, patient_id: int) -> Tuple[str, Optional[dict]]:
+    """
+    Materialize a virtual slot as a booked session,
+    returns booking status and SESSION_FIELDS of the session
+    """
+    slot = get_virtual_slot(doctor, slot_id)
+    if slot is None:
+        start = get_virtual_slot_start(slot_id)
+        taken = start is not None and Timetable.objects.filter(doctor_id=doctor.id, start=start).exists()
+        return (CONFLICT, None) if taken else (NOT_FOUND, None)
+
+    if slot.pk is not None:
+        return book_slot(doctor.id, slot.pk, patient_id)
+
+    slot.patient_id = patient_id
+    try:
+        with transaction.atomic():
+            slot.save(force_insert=True)
+    except IntegrityError:
+        # the slot has been booked concurrently
+        return CONFLICT, None
+
+    session = {field: getattr(slot, field) for field in SESSION_FIELDS}
+    notify_timetable_changed(CREATE, [session])
+    return BOOKED, session
+
+
+def book_slots(doctor: Profile, slot_ids: Iterable[int], patient_id: int) -> Dict[int, str]:
+    """
+    Book several sessions of the doctor in a single transaction,
+    returns booking status of every session
+    """
+    slot_ids = list(dict.fromkeys(slot_ids))
+    results = {}
+
+    with transaction.atomic():
+        sessions = dict(Timetable.objects.select_for_update().filter(
+            pk__in=[slot_id for slot_id in slot_ids if slot_id > 0],
+            doctor_id=doctor.id,
+            start__gt=timezone.now(),
+        ).values_list('id', 'patient_id'))
+
+        free = [slot_id for slot_id, session_patient_id in sessions.items() if session_patient_id is None]
+        if free:
+            Timetable.objects.filter(pk__in=free, patient_id__isnull=True).update(patient_id=patient_id)
+            notify_timetable_changed(BOOK, Timetable.objects.filter(pk__in=free).values(*SESSION_FIELDS))
+
+        for slot_id in slot_ids:
+            if slot_id < 0 and settings.TIMESLOTS_VIRTUAL:
+                results[slot_id] = book_virtual_slot(doctor, slot_id, patient_id)[0]
+            elif slot_id not in sessions:
+                results[slot_id] = NOT_FOUND
+            else:
+                results[slot_id] = BOOKED if sessions[slot_id] is None else CONFLICT
+
+    return results
+
+
+def cancel_slot(session: Timetable) -> bool:
+    """
+    Release a booked session with a conditional UPDATE, returns False if
+    the session isn't booked by its loaded patient anymore
+    """
+    if session.patient_id is None:
+        return False
+
+    canceled = {field: getattr(session, field) for field in SESSION_FIELDS}
+    with transaction.atomic():
+        released = Timetable.objects.filter(pk=session.pk, patient_id=session.patient_id).update(patient_id=None)
+        if not released:
+            return False
+
+        session.patient_id = None
+        notify_timetable_changed(CANCEL, [canceled])
+    return True
+
+
+def cancel_slots(slot_ids: Iterable[int], patient_id: int, doctor_id: Optional[int] = None) -> Dict[int, str]:
+    """
+    Cancel several upcoming sessions of the patient in a single transaction,
+    returns cancellation status of every session
+    """
+    slot_ids = list(dict.fromkeys(slot_ids))
+    sessions = Timetable.objects.filter(pk__in=slot_ids, patient_id=patient_id, start__gt=timezone.now())
+    if doctor_id is not None:
+        sessions = sessions.filter(doctor_id=doctor_id)
+
+    with transaction.atomic():
+        canceled = list(sessions.select_for_update().values(*SESSION_FIELDS))
+        canceled_ids = {session['id'] for session in canceled}
+        if canceled:
+            Timetable.objects.filter(pk__in=canceled_ids).update(patient_id=None)
+            notify_timetable_changed(CANCEL, canceled)
+
+    return {slot_id: CANCELED if slot_id in canceled_ids else NOT_FOUND for slot_id in slot_ids}
@@ -0,0 +1,48 @@
+"""
+System checks of the deployment configuration.
+
+Caches invalidated from other processes (Celery workers bump versions and free
+slots of the web process) must be shared, a per-process LocMemCache keeps
+stale entries until they expire. Metrics are served only to scrapers with
+METRICS_TOKEN outside DEBUG.
+"""
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# settings naming cache aliases which must be shared between processes
+SHARED_CACHE_SETTINGS = ('FREE_SLOTS_CACHE', 'IDEMPOTENCY_CACHE', 'VERSIONS_CACHE', 'AUTH_CACHE')
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    messages = []
+    for setting in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, setting)
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend not in LOCAL_CACHE_BACKENDS:
+            continue
+
+        # a single runserver process may live with it, deployments may not
+        message_class = Warning if settings.DEBUG else Error
+        messages.append(message_class(
+            f'{setting} cache "{alias}" uses {backend} which is not shared between processes.',
+            hint='Set CACHE_BACKEND to a shared backend, e.g. django_redis.cache.RedisCache.',
+            id='ybooking_app.E001' if message_class is Error else 'ybooking_app.W001',
+        ))
+    return messages
+
+
+@register()
+def check_metrics_token(app_configs, **kwargs):
+    if settings.METRICS_TOKEN or settings.DEBUG:
+        return []
+
+    return [Warning(
+        'METRICS_TOKEN is not set, /metrics is not served.',
+        hint='Set METRICS_TOKEN to the bearer token of Prometheus scrapers.',
+        id='ybooking_app.W002',
+    )]
@@ -0,0 +1,64 @@
+"""
+Conditional GET for polled list endpoints.
+
+ETag and Last-Modified are computed from scope versions (see versions.py)
+without running the list query, so `If-None-Match` and `If-Modified-Since`
+are answered with 304 by a version lookup.
+"""
+import functools
+import hashlib
+import math
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from ybooking_app.versions import get_versions
+
+# (version scopes, other values the response depends on)
+Validators = Tuple[List[str], Iterable]
+
+
+def conditional(get_validators: Callable[..., Validators], max_age: Optional[int] = None):
+    """
+    Decorator of viewset actions answering conditional requests,
+    `get_validators(view, request)` returns version scopes of the response.
+    Responses which change with time (e.g. upcoming sessions) are revalidated
+    after `max_age` seconds even if versions are the same.
+    """
+
+    def decorator(view_method):
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            scopes, extra = get_validators(self, request)
+            versions = get_versions(scopes)
+            # rounded up, a change later in the same second must not be older than the header
+            last_modified = math.ceil(max(versions.values()))
+
+            if max_age:
+                period_start = int(time.time()) // max_age * max_age
+                extra = [*extra, period_start]
+                last_modified = max(last_modified, period_start)
+
+            etag = _make_etag(request, versions, extra)
+
+            response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _make_etag(request, versions, extra) -> str:
+    user_id = request.user.id if request.user and request.user.is_authenticated else None
+    parts = [request.get_full_path(), user_id, *sorted(versions.items()), *extra]
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
@@ -0,0 +1,118 @@
+"""
+Daily statistics aggregate.
+
+DailyStatistics holds the number of booked and free sessions per day and
+doctor. Booking and cancellation shift counters of a day, generated or deleted
+days are recounted from Timetable and its archive, `rebuild_statistics` command
+reconciles the whole table (e.g. after sessions are edited in admin).
+"""
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ybooking_app.helpers import get_day_start
+from ybooking_app.models import ArchivedTimetable, DailyStatistics, Timetable
+
+# (day, doctor_id) -> (booked, free) change
+Changes = Dict[Tuple[date, int], Tuple[int, int]]
+
+
+def get_session_changes(sessions: Iterable[dict], booked: int, free: int) -> Changes:
+    """ Changes of counters when every session moves by (booked, free) """
+    sessions_by_day = Counter((timezone.localdate(session['start']), session['doctor_id']) for session in sessions)
+    return {key: (booked * count, free * count) for key, count in sessions_by_day.items()}
+
+
+def apply_changes(changes: Changes):
+    """ Shift counters of days, missing rows are created first """
+    changes = {key: change for key, change in changes.items() if change != (0, 0)}
+    if not changes:
+        return
+
+    with transaction.atomic(savepoint=False):
+        DailyStatistics.objects.bulk_create(
+            [DailyStatistics(day=day, doctor_id=doctor_id) for day, doctor_id in changes],
+            ignore_conflicts=True,
+        )
+        for (day, doctor_id), (booked, free) in changes.items():
+            DailyStatistics.objects.filter(day=day, doctor_id=doctor_id).update(
+                booked=F('booked') + booked,
+                free=F('free') + free,
+            )
+
+
+def refresh_days(doctor_days: Dict[int, Iterable[date]]):
+    """ Recount days of the doctors from Timetable and the archive """
+    days_by_doctor = {doctor_id: set(days) for doctor_id, days in doctor_days.items() if days}
+    if not days_by_doctor:
+        return
+
+    all_days = set().union(*days_by_doctor.values())
+    sessions = [
+        _filter_days(model.objects.filter(doctor_id__in=days_by_doctor), min(all_days), max(all_days))
+        for model in (Timetable, ArchivedTimetable)
+    ]
+
+    with transaction.atomic(savepoint=False):
+        stale = Q()
+        for doctor_id, days in days_by_doctor.items():
+            stale |= Q(doctor_id=doctor_id, day__in=days)
+        DailyStatistics.objects.filter(stale).delete()
+
+        DailyStatistics.objects.bulk_create([
+            row for row in _count_sessions(sessions)
+            if row.day in days_by_doctor[row.doctor_id]
+        ], batch_size=settings.TIMESLOTS_BATCH_SIZE)
+
+
+def rebuild(first_day: Optional[date] = None, last_day: Optional[date] = None) -> int:
+    """
+    Recount days in the range (all days by default) from Timetable and the archive,
+    returns the number of aggregate rows
+    """
+    sessions = [_filter_days(model.objects.all(), first_day, last_day) for model in (Timetable, ArchivedTimetable)]
+    rows = DailyStatistics.objects.all()
+    if first_day is not None:
+        rows = rows.filter(day__gte=first_day)
+    if last_day is not None:
+        rows = rows.filter(day__lte=last_day)
+
+    with transaction.atomic():
+        rows.delete()
+        created = DailyStatistics.objects.bulk_create(_count_sessions(sessions), batch_size=settings.TIMESLOTS_BATCH_SIZE)
+
+    return len(created)
+
+
+def _filter_days(sessions, first_day: Optional[date], last_day: Optional[date]):
+    if first_day is not None:
+        sessions = sessions.filter(start__gte=get_day_start(first_day))
+    if last_day is not None:
+        sessions = sessions.filter(start__lt=get_day_start(last_day + timedelta(days=1)))
+    return sessions
+
+
+def get_daily_counts(sessions):
+    """ Booked and free sessions of the queryset grouped by day and doctor """
+    return sessions.annotate(day=TruncDate('start')).values('doctor_id', 'day').annotate(
+        booked_sessions=Count('id', filter=Q(patient__isnull=False)),
+        free_sessions=Count('id', filter=Q(patient__isnull=True)),
+    ).order_by()
+
+
+def _count_sessions(querysets) -> Iterator[DailyStatistics]:
+    """ Counters of sessions of all querysets, a day may be split between them """
+    counters: Dict[Tuple[date, int], Tuple[int, int]] = {}
+    for sessions in querysets:
+        for row in get_daily_counts(sessions).iterator():
+            booked, free = counters.get((row['day'], row['doctor_id']), (0, 0))
+            counters[(row['day'], row['doctor_id'])] = (booked + row['booked_sessions'], free + row['free_sessions'])
+
+    for (day, doctor_id), (booked, free) in counters.items():
+        yield DailyStatistics(day=day, doctor_id=doctor_id, booked=booked, free=free)
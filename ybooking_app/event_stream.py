@@ -0,0 +1,140 @@
+"""
+Server-sent events of a doctor's slots.
+
+`GET persons/{id}/schedule/events/` keeps the connection open and streams
+`freed` and `generated` events of the doctor (see slot_events.py), so waiting
+patients hold an idle connection instead of polling the schedule. Django 3.2
+views can't stream asynchronously, the endpoint is a plain ASGI application
+routed in front of Django by `SlotEventsRouter` (see ybooking/asgi.py).
+"""
+import asyncio
+import json
+import re
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions
+
+from ybooking_app.authentication import CachedTokenAuthentication
+from ybooking_app.models import Profile
+from ybooking_app.slot_events import get_event_broker
+
+EVENTS_PATH = re.compile(r'^/persons/(?P<person_id>[0-9]+)/schedule/events/$')
+
+
+class SlotEventsRouter:
+    """
+    Serves slot events, other requests go to the wrapped application
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            match = EVENTS_PATH.match(scope['path'])
+            if match:
+                return await stream_slot_events(scope, receive, send, int(match['person_id']))
+
+        return await self.application(scope, receive, send)
+
+
+async def stream_slot_events(scope, receive, send, doctor_id: int):
+    if scope['method'] != 'GET':
+        return await _send_error(send, 405, 'Method not allowed.')
+
+    error = await sync_to_async(_authorize)(_get_token(scope), doctor_id)
+    if error is not None:
+        return await _send_error(send, *error)
+
+    # subscribed before the response starts, so the client misses no events
+    subscription = get_event_broker().subscribe(doctor_id)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    event = asyncio.ensure_future(subscription.get())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # no buffering by nginx
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await _send_body(send, f'retry: {settings.SLOT_EVENTS_RETRY * 1000}\n\n')
+
+        while True:
+            await asyncio.wait({disconnect, event}, timeout=settings.SLOT_EVENTS_KEEPALIVE,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if disconnect.done():
+                return
+
+            if not event.done():
+                # keeps proxies from closing the idle connection
+                await _send_body(send, ': keepalive\n\n')
+                continue
+
+            if event.result() is None:
+                # events were lost, the client reconnects and reloads the schedule
+                break
+
+            await _send_body(send, _format_event(event.result()))
+            event = asyncio.ensure_future(subscription.get())
+    finally:
+        subscription.close()
+        disconnect.cancel()
+        event.cancel()
+
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def _authorize(token: Optional[str], doctor_id: int) -> Optional[Tuple[int, str]]:
+    """ Error status and message, None if the events are available """
+    if token is None:
+        return 401, 'Authentication credentials were not provided.'
+
+    try:
+        CachedTokenAuthentication().authenticate_credentials(token)
+    except exceptions.AuthenticationFailed as e:
+        return 401, str(e.detail)
+
+    if not Profile.objects.filter(pk=doctor_id, is_doctor=True, user__is_active=True).exists():
+        return 404, 'Not found.'
+
+    return None
+
+
+def _get_token(scope) -> Optional[str]:
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            parts = value.decode('latin1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    return None
+
+
+def _format_event(event: dict) -> str:
+    data = {key: value for key, value in event.items() if key != 'event'}
+    return f'event: {event["event"]}\ndata: {json.dumps(data)}\n\n'
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _send_body(send, text: str):
+    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+
+async def _send_error(send, status: int, detail: str):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
@@ -1,5 +1,61 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Sequence
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
 from slugify import slugify
 
+# bases looked up with a single query
+USERNAME_LOOKUP_CHUNK_SIZE = 200
+
+_NUMBERED_USERNAME = re.compile(r'^(?P<base>.+)_(?P<number>[0-9]+)$')
+
 
 def generate_username(first_name: str, last_name: str) -> str:
-    return f'{slugify(first_name.lower()[0])}_{slugify(last_name.lower())}'
\ No newline at end of file
+    return f'{slugify(first_name.lower()[0])}_{slugify(last_name.lower())}'
+
+
+def allocate_usernames(bases: Sequence[str]) -> List[str]:
+    """
+    Unique usernames for the bases: a base is used as is while it's free,
+    then numbered `base_2`, `base_3`, ... Existing usernames of all bases are
+    looked up at once.
+    """
+    last_numbers = _get_last_username_numbers(set(bases))
+
+    usernames = []
+    for base in bases:
+        number = last_numbers.get(base, 0) + 1
+        last_numbers[base] = number
+        usernames.append(base if number == 1 else f'{base}_{number}')
+    return usernames
+
+
+def _get_last_username_numbers(bases) -> Dict[str, int]:
+    """ The highest number of existing usernames of every base, a base itself is number 1 """
+    bases = sorted(bases)
+    last_numbers = defaultdict(int)
+
+    for i in range(0, len(bases), USERNAME_LOOKUP_CHUNK_SIZE):
+        chunk = bases[i:i + USERNAME_LOOKUP_CHUNK_SIZE]
+        prefixes = Q()
+        for base in chunk:
+            prefixes |= Q(username__startswith=base)
+
+        chunk = set(chunk)
+        for username in User.objects.filter(prefixes).values_list('username', flat=True).iterator():
+            match = _NUMBERED_USERNAME.match(username)
+            if username in chunk:
+                last_numbers[username] = max(last_numbers[username], 1)
+            elif match and match['base'] in chunk:
+                last_numbers[match['base']] = max(last_numbers[match['base']], int(match['number']))
+
+    return last_numbers
+
+
+def get_day_start(day: date) -> datetime:
+    """ Aware midnight of the day in the current time zone """
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
@@ -0,0 +1,211 @@
+"""
+Short-lived slot holds.
+
+A patient may hold a free slot for a few minutes before booking it, other
+patients don't see held slots in doctor's schedule. Holds expire by themselves
+and are released when the slot is booked. While the Redis backend is down slots
+are treated as not held, new holds are refused with 503.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+class HoldsUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Slot holds are temporarily unavailable.'
+    default_code = 'holds_unavailable'
+
+
+class BaseHoldBackend:
+
+    def acquire(self, doctor_id: int, slot_id: int, holder_id: int, ttl: int) -> bool:
+        """
+        Hold the slot, holding it again by the same holder extends the hold;
+        raises HoldsUnavailable if holds can't be stored
+        """
+        raise NotImplementedError
+
+    def release(self, doctor_id: int, slot_id: int, holder_id: int) -> bool:
+        """ Remove the hold if it belongs to the holder """
+        raise NotImplementedError
+
+    def get_holder(self, doctor_id: int, slot_id: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def get_held_slots(self, doctor_id: int, exclude_holder: Optional[int] = None) -> Set[int]:
+        """ Slots of the doctor held by anybody except `exclude_holder` """
+        raise NotImplementedError
+
+
+class LocMemHoldBackend(BaseHoldBackend):
+    """
+    In-process backend for tests and single process deployments
+    """
+
+    def __init__(self):
+        self._holds: Dict[Tuple[int, int], Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, doctor_id, slot_id, holder_id, ttl):
+        with self._lock:
+            holder = self._get_holder((doctor_id, slot_id))
+            if holder not in (None, holder_id):
+                return False
+
+            self._holds[(doctor_id, slot_id)] = (holder_id, time.time() + ttl)
+            return True
+
+    def release(self, doctor_id, slot_id, holder_id):
+        with self._lock:
+            if self._get_holder((doctor_id, slot_id)) != holder_id:
+                return False
+
+            del self._holds[(doctor_id, slot_id)]
+            return True
+
+    def get_holder(self, doctor_id, slot_id):
+        with self._lock:
+            return self._get_holder((doctor_id, slot_id))
+
+    def get_held_slots(self, doctor_id, exclude_holder=None):
+        with self._lock:
+            return {
+                slot_id
+                for (hold_doctor_id, slot_id) in list(self._holds)
+                if hold_doctor_id == doctor_id and self._get_holder((doctor_id, slot_id)) not in (None, exclude_holder)
+            }
+
+    def _get_holder(self, key):
+        hold = self._holds.get(key)
+        if hold is None:
+            return None
+
+        holder_id, expires_at = hold
+        if expires_at <= time.time():
+            del self._holds[key]
+            return None
+
+        return holder_id
+
+
+class RedisHoldBackend(BaseHoldBackend):
+    """
+    Every hold is a key with TTL, holds of a doctor are also indexed
+    in a sorted set scored by expiration time
+    """
+
+    RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            redis.call('del', KEYS[1])
+            redis.call('zrem', KEYS[2], ARGV[2])
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(settings.SLOT_HOLDS_REDIS_URL)
+
+        self.client = client
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, doctor_id, slot_id, holder_id, ttl):
+        import redis
+
+        key = self._key(doctor_id, slot_id)
+        index = self._index_key(doctor_id)
+        try:
+            if not self.client.set(key, holder_id, ex=ttl, nx=True):
+                if self._to_int(self.client.get(key)) != holder_id:
+                    return False
+                self.client.expire(key, ttl)
+
+            pipe = self.client.pipeline()
+            pipe.zadd(index, {self._member(slot_id, holder_id): time.time() + ttl})
+            pipe.expire(index, ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception('Failed to hold slot %s of doctor %s', slot_id, doctor_id)
+            raise HoldsUnavailable()
+        return True
+
+    def release(self, doctor_id, slot_id, holder_id):
+        import redis
+
+        try:
+            return bool(self._release(
+                keys=[self._key(doctor_id, slot_id), self._index_key(doctor_id)],
+                args=[holder_id, self._member(slot_id, holder_id)],
+            ))
+        except redis.RedisError:
+            # the hold expires by itself
+            logger.exception('Failed to release hold of slot %s of doctor %s', slot_id, doctor_id)
+            return False
+
+    def get_holder(self, doctor_id, slot_id):
+        import redis
+
+        try:
+            return self._to_int(self.client.get(self._key(doctor_id, slot_id)))
+        except redis.RedisError:
+            # the slot may be booked without holds
+            logger.exception('Failed to load hold of slot %s of doctor %s', slot_id, doctor_id)
+            return None
+
+    def get_held_slots(self, doctor_id, exclude_holder=None):
+        import redis
+
+        index = self._index_key(doctor_id)
+        try:
+            pipe = self.client.pipeline()
+            pipe.zremrangebyscore(index, '-inf', time.time())
+            pipe.zrange(index, 0, -1)
+            _, members = pipe.execute()
+        except redis.RedisError:
+            # schedule is still available without holds
+            logger.exception('Failed to load slot holds of doctor %s', doctor_id)
+            return set()
+
+        held = set()
+        for member in members:
+            slot_id, holder_id = (int(value) for value in member.decode().split(':'))
+            if holder_id != exclude_holder:
+                held.add(slot_id)
+        return held
+
+    @staticmethod
+    def _key(doctor_id, slot_id):
+        return f'ybooking:hold:{doctor_id}:{slot_id}'
+
+    @staticmethod
+    def _index_key(doctor_id):
+        return f'ybooking:holds:{doctor_id}'
+
+    @staticmethod
+    def _member(slot_id, holder_id):
+        return f'{slot_id}:{holder_id}'
+
+    @staticmethod
+    def _to_int(value):
+        return None if value is None else int(value)
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path: str) -> BaseHoldBackend:
+    return import_string(path)()
+
+
+def get_hold_backend() -> BaseHoldBackend:
+    return _load_backend(settings.SLOT_HOLDS_BACKEND)
@@ -0,0 +1,171 @@
+"""
+iCalendar feeds of persons' sessions.
+
+Calendar apps poll feeds by URL with a signed token of the person, so a feed
+needs no authentication. The token carries the person's feed version, a new
+version revokes URLs given out before. A rendered feed is cached under the person's schedule
+version (see versions.py): polls cost a cache lookup until the person's
+sessions change.
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from ybooking_app.helpers import get_day_start
+from ybooking_app.models import Profile, Timetable
+
+SALT = 'ybooking.calendar'
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+
+def make_feed_token(person_id: int, version: int) -> str:
+    return signing.dumps({'p': person_id, 'v': version}, salt=SALT)
+
+
+def load_feed_token(token: str) -> Optional[Tuple[int, int]]:
+    """ Person id and feed version of the token, None if the token is forged """
+    try:
+        data = signing.loads(token, salt=SALT)
+        return data['p'], data['v']
+    except (signing.BadSignature, TypeError, KeyError):
+        return None
+
+
+def get_feed_version(person_id: int) -> Optional[int]:
+    """ Current feed version of the person, None if there is no such active person """
+    cache = _get_cache()
+    key = _version_key(person_id)
+
+    version = cache.get(key)
+    if version is None:
+        version = Profile.objects.filter(pk=person_id, user__is_active=True).values_list(
+            'calendar_feed_version', flat=True,
+        ).first()
+        if version is not None:
+            cache.set(key, version, timeout=settings.CALENDAR_FEED_TTL)
+    return version
+
+
+def rotate_feed_version(person_id: int) -> int:
+    """ Revoke feed URLs of the person, returns the new version """
+    Profile.objects.filter(pk=person_id).update(calendar_feed_version=F('calendar_feed_version') + 1)
+    invalidate_feed_version(person_id)
+    return Profile.objects.values_list('calendar_feed_version', flat=True).get(pk=person_id)
+
+
+def invalidate_feed_version(person_id: int):
+    _get_cache().delete(_version_key(person_id))
+
+
+def get_feed_person(person_id: int) -> Optional[Profile]:
+    return Profile.objects.filter(pk=person_id, user__is_active=True).first()
+
+
+def get_cache_key(person_id: int, version) -> str:
+    # the window of past sessions moves daily
+    return f'calendar:{person_id}:{version}:{timezone.localdate().isoformat()}'
+
+
+def get_cached_feed(cache_key: str) -> Optional[str]:
+    return _get_cache().get(cache_key)
+
+
+def stream_feed(person: Profile, cache_key: str) -> Iterator[str]:
+    """ Yield lines of the feed, the whole feed is cached once it's rendered """
+    lines = []
+    for line in _render(person):
+        lines.append(line)
+        yield line
+
+    _get_cache().set(cache_key, ''.join(lines), timeout=settings.CALENDAR_FEED_TTL)
+
+
+def _render(person: Profile) -> Iterator[str]:
+    yield from _lines(
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//ybooking//sessions//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+    )
+
+    now = _format_datetime(timezone.now())
+    for session in _get_sessions(person):
+        yield from _lines(
+            'BEGIN:VEVENT',
+            f'UID:session-{session["id"]}@ybooking',
+            f'DTSTAMP:{now}',
+            f'DTSTART:{_format_datetime(session["start"])}',
+            f'DTEND:{_format_datetime(session["stop"])}',
+            f'SUMMARY:{_escape(_get_summary(person, session))}',
+            'END:VEVENT',
+        )
+
+    yield from _lines('END:VCALENDAR')
+
+
+def _get_sessions(person: Profile):
+    since = get_day_start(timezone.localdate() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS))
+    if person.is_doctor:
+        # free slots are not events
+        sessions = Timetable.objects.filter(doctor_id=person.id, patient_id__isnull=False)
+        other = 'patient'
+    else:
+        sessions = Timetable.objects.filter(patient_id=person.id)
+        other = 'doctor'
+
+    return sessions.filter(start__gte=since).order_by('start', 'id').values(
+        'id',
+        'start',
+        'stop',
+        first_name=F(f'{other}__user__first_name'),
+        last_name=F(f'{other}__user__last_name'),
+    ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _get_summary(person: Profile, session: dict) -> str:
+    name = f'{session["first_name"]} {session["last_name"]}'.strip()
+    return f'Session with {name}' if person.is_doctor else f'Session with doctor {name}'
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _lines(*lines: str) -> Iterator[str]:
+    for line in lines:
+        yield _fold(line) + '\r\n'
+
+
+def _fold(line: str) -> str:
+    """ Lines are folded at 75 octets (RFC 5545, 3.1) """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # don't split multi-byte characters
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return '\r\n '.join(parts)
+
+
+def _version_key(person_id: int) -> str:
+    return f'calendar-version:{person_id}'
+
+
+def _get_cache():
+    return caches[settings.CALENDAR_FEED_CACHE]
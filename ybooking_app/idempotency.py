@@ -0,0 +1,78 @@
+"""
+Idempotency keys for unsafe requests.
+
+The first response to a request with `Idempotency-Key` header is stored in the
+cache, retries with the same key replay it without running the view again.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+STORED_HEADERS = ('Location',)
+
+
+def idempotent(view_method):
+    """
+    Decorator of viewset actions supporting `Idempotency-Key` header
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+        cache_key = _get_cache_key(request, key)
+        fingerprint = hashlib.sha256(request._request.body).hexdigest()
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        # only one request with the key is processed at a time
+        lock_key = f'{cache_key}:lock'
+        if not cache.add(lock_key, True, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(status=status.HTTP_409_CONFLICT, data='Request with this idempotency key is in progress.')
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+
+            # server errors are not stored, so the request may be retried
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                    'headers': {header: response[header] for header in STORED_HEADERS if response.has_header(header)},
+                }, timeout=settings.IDEMPOTENCY_TTL)
+        finally:
+            cache.delete(lock_key)
+
+        return response
+
+    return wrapper
+
+
+def _get_cache_key(request, key: str) -> str:
+    user_id = request.user.id if request.user and request.user.is_authenticated else None
+    scope = hashlib.sha256(f'{user_id}:{request.method}:{request.path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{scope}'
+
+
+def _replay(stored: dict, fingerprint: str) -> Response:
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            data='Idempotency key is already used with another request body.',
+        )
+
+    response = Response(status=stored['status'], data=stored['data'], headers=stored['headers'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
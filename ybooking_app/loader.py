@@ -0,0 +1,112 @@
+import io
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from ybooking_app.models import Timetable
+
+FIELDS = ('doctor', 'patient', 'start', 'stop', 'conflict')
+CONFLICT_FIELDS = ('doctor', 'start')
+
+
+def load_sessions(sessions: Iterable[Timetable], batch_size: Optional[int] = None,
+                  using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Insert sessions skipping already existing (doctor, start) pairs,
+    returns the number of inserted items
+    """
+    batch_size = batch_size or settings.TIMESLOTS_BATCH_SIZE
+    connection = connections[using]
+
+    if connection.vendor == 'postgresql':
+        loader = _copy_batches
+    else:
+        loader = _insert_batches
+
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        return loader(connection, cursor, _batches(sessions, batch_size))
+
+
+def _batches(sessions: Iterable[Timetable], batch_size: int) -> Iterator[List[Timetable]]:
+    sessions = iter(sessions)
+    while True:
+        batch = list(islice(sessions, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _get_fields():
+    return [Timetable._meta.get_field(name) for name in FIELDS]
+
+
+def _columns(connection, names) -> str:
+    return ', '.join(
+        connection.ops.quote_name(Timetable._meta.get_field(name).column) for name in names
+    )
+
+
+def _copy_batches(connection, cursor, batches: Iterator[List[Timetable]]) -> int:
+    """
+    PostgreSQL: COPY every batch into a temporary table and move it with INSERT ... ON CONFLICT
+    """
+    fields = _get_fields()
+    columns = _columns(connection, FIELDS)
+    table = connection.ops.quote_name(Timetable._meta.db_table)
+    staging = connection.ops.quote_name(f'{Timetable._meta.db_table}_load')
+
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP '
+        f'AS SELECT {columns} FROM {table} WITH NO DATA'
+    )
+
+    inserted = 0
+    for batch in batches:
+        buffer = io.StringIO()
+        for session in batch:
+            values = (field.get_db_prep_save(getattr(session, field.attname), connection) for field in fields)
+            buffer.write('\t'.join(r'\N' if value is None else str(value) for value in values))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        cursor.copy_expert(f'COPY {staging} ({columns}) FROM STDIN', buffer)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} '
+            f'ON CONFLICT ({_columns(connection, CONFLICT_FIELDS)}) DO NOTHING'
+        )
+        inserted += cursor.rowcount
+        cursor.execute(f'TRUNCATE {staging}')
+
+    return inserted
+
+
+def _insert_batches(connection, cursor, batches: Iterator[List[Timetable]]) -> int:
+    """
+    Other databases: multi-row INSERT ... ON CONFLICT DO NOTHING
+    """
+    fields = _get_fields()
+    table = connection.ops.quote_name(Timetable._meta.db_table)
+    placeholder = '({})'.format(', '.join(['%s'] * len(fields)))
+
+    inserted = 0
+    for batch in batches:
+        # respect the database limit of query parameters
+        rows_per_query = connection.ops.bulk_batch_size(fields, batch)
+        for i in range(0, len(batch), rows_per_query):
+            rows = batch[i:i + rows_per_query]
+            params = [
+                field.get_db_prep_save(getattr(session, field.attname), connection)
+                for session in rows
+                for field in fields
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({_columns(connection, FIELDS)}) '
+                f'VALUES {", ".join([placeholder] * len(rows))} '
+                f'ON CONFLICT ({_columns(connection, CONFLICT_FIELDS)}) DO NOTHING',
+                params,
+            )
+            inserted += cursor.rowcount
+
+    return inserted
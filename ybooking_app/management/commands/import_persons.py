@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ybooking_app.export import CSV, NDJSON
+from ybooking_app.persons_import import import_persons, is_utf8, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create persons from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File with a person per row')
+        parser.add_argument('--input', choices=[CSV, NDJSON], default=CSV, help='File format')
+        parser.add_argument('--batch-size', type=int, default=None, help='Persons per INSERT')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as file:
+            if not is_utf8(iter(lambda: file.read(64 * 1024), b'')):
+                raise CommandError('File is not UTF-8 encoded.')
+
+        with open(options['path'], encoding='utf-8', newline='') as lines:
+            result = import_persons(read_rows(lines, options['input']), options['batch_size'])
+
+        for error in result['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(f'Created {result["created"]} persons, {len(result["errors"])} rows skipped'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ybooking_app.archive import is_partitioned, partition_archive_table
+
+
+class Command(BaseCommand):
+    help = 'Convert sessions archive to a table partitioned by month (PostgreSQL)'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is supported on PostgreSQL only')
+        if is_partitioned():
+            raise CommandError('Sessions archive is already partitioned')
+
+        partitions = partition_archive_table()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {partitions} partitions, set TIMETABLE_ARCHIVE_PARTITIONED=1 to archive into them'
+        ))
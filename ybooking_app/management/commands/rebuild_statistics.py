@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from ybooking_app.daily_statistics import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recount daily statistics aggregate from Timetable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, default=None, help='First day, YYYY-MM-DD')
+        parser.add_argument('--stop', type=date.fromisoformat, default=None, help='Last day, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        rows = rebuild(options['start'], options['stop'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily statistics rows'))
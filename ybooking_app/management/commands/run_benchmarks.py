@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ybooking_app.benchmarks import BENCHMARKS, run_benchmarks
+from ybooking_app.models import Profile, Timetable
+
+
+class Command(BaseCommand):
+    help = 'Time slot generation and hot endpoints, results are saved to compare runs over time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS), help='Run only these benchmarks')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+        parser.add_argument('--output-dir', default=str(settings.BASE_DIR / 'benchmarks'))
+
+    def handle(self, *args, **options):
+        try:
+            results = run_benchmarks(options['benchmark'], options['repeat'], options['seed'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        previous = self._load_previous(output_dir)
+
+        now = datetime.now()
+        report = {
+            'created_at': now.isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'dataset': {
+                'doctors': Profile.objects.filter(is_doctor=True).count(),
+                'patients': Profile.objects.filter(is_doctor=False).count(),
+                'sessions': Timetable.objects.count(),
+            },
+            'results': results,
+        }
+        # microseconds keep names of runs unique and in order
+        output = output_dir / f'{now:%Y%m%d-%H%M%S-%f}.json'
+        output.write_text(json.dumps(report, indent=2))
+
+        self.stdout.write(f'{"benchmark":<20} {"wall ms":>10} {"db ms":>10} {"queries":>8} {"change":>8}')
+        for name, result in results.items():
+            change = ''
+            if name in previous:
+                before = previous[name]['wall_ms']['median']
+                change = f'{(result["wall_ms"]["median"] - before) / before * 100:+.0f}%' if before else ''
+
+            self.stdout.write(
+                f'{name:<20} {result["wall_ms"]["median"]:>10.1f} {result["db_ms"]["median"]:>10.1f} '
+                f'{result["queries"]["median"]:>8.0f} {change:>8}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Results are saved to {output}'))
+
+    @staticmethod
+    def _load_previous(output_dir: Path) -> dict:
+        """ Results of the latest saved run """
+        reports = sorted(output_dir.glob('*.json'))
+        if not reports:
+            return {}
+        return json.loads(reports[-1].read_text()).get('results', {})
@@ -0,0 +1,135 @@
+import random
+import uuid
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ybooking_app import daily_statistics
+from ybooking_app.loader import load_sessions
+from ybooking_app.models import DayInterval, Profile, Schedule, Timetable, Vacation
+from ybooking_app.slots import generate_timeslots_for, load_templates
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic clinic: doctors, patients, schedules and sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--planning-days', type=int, default=14)
+        parser.add_argument('--history-days', type=int, default=30, help='Days of past sessions')
+        parser.add_argument('--session-duration', type=int, default=30, help='Minutes')
+        parser.add_argument('--booking-density', type=float, default=0.3, help='Share of booked sessions')
+        parser.add_argument('--vacation-rate', type=float, default=0.1, help='Share of doctors on vacation')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        today = timezone.localdate()
+
+        with transaction.atomic():
+            doctors = self._create_persons(options['doctors'], 'doctor', is_doctor=True)
+            patients = self._create_persons(options['patients'], 'patient', is_doctor=False)
+            self._create_schedules(doctors, today, rnd, options)
+
+        future = generate_timeslots_for(doctors)
+        history = self._create_history(doctors, patients, today, rnd, options)
+        booked = self._book_sessions(doctors, patients, rnd, options['booking_density'])
+        daily_statistics.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(doctors)} doctors, {len(patients)} patients, '
+            f'{future} future sessions ({booked} booked) and {history} past sessions'
+        ))
+
+    def _create_persons(self, count, group, is_doctor):
+        """ Create users with profiles, returns profile ids """
+        prefix = f'synthetic_{group}_{uuid.uuid4().hex[:8]}_'
+        password = make_password(None)
+
+        User.objects.bulk_create([
+            User(
+                username=f'{prefix}{i}',
+                first_name=f'{group.capitalize()}',
+                last_name=f'{group.capitalize()} {i}',
+                password=password,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+
+        user_ids = User.objects.filter(username__startswith=prefix).values_list('id', flat=True)
+        Profile.objects.bulk_create([
+            Profile(
+                user_id=user_id,
+                birthday=date(1950, 1, 1) + timedelta(days=user_id % 18000),
+                is_doctor=is_doctor,
+                sex=Profile.Sex.MAN if user_id % 2 else Profile.Sex.WOMAN,
+            )
+            for user_id in user_ids
+        ], batch_size=1000)
+
+        return list(Profile.objects.filter(user__username__startswith=prefix).values_list('id', flat=True))
+
+    def _create_schedules(self, doctors, today, rnd, options):
+        schedules, intervals, vacations = [], [], []
+        weekdays = list(DayInterval.Weekdays)
+
+        for doctor_id in doctors:
+            schedules.append(Schedule(
+                doctor_id=doctor_id,
+                planning_days=options['planning_days'],
+                session_duration=options['session_duration'],
+            ))
+
+            for weekday in rnd.sample(weekdays, 5):
+                intervals.append(DayInterval(doctor_id=doctor_id, weekday=weekday, start_time=time(9), stop_time=time(13)))
+                if rnd.random() < 0.5:
+                    intervals.append(DayInterval(doctor_id=doctor_id, weekday=weekday, start_time=time(14), stop_time=time(18)))
+
+            if rnd.random() < options['vacation_rate']:
+                start = today + timedelta(days=rnd.randrange(max(options['planning_days'], 1)))
+                vacations.append(Vacation(doctor_id=doctor_id, start_date=start, stop_date=start + timedelta(days=rnd.randrange(7))))
+
+        Schedule.objects.bulk_create(schedules, batch_size=1000)
+        DayInterval.objects.bulk_create(intervals, batch_size=1000)
+        Vacation.objects.bulk_create(vacations, batch_size=1000)
+
+    def _create_history(self, doctors, patients, today, rnd, options):
+        """ Past sessions for statistics """
+        templates = load_templates(today, doctors)
+
+        def sessions():
+            for template in templates.values():
+                for offset in range(1, options['history_days'] + 1):
+                    for start, stop in template.sessions(today - timedelta(days=offset)):
+                        booked = patients and rnd.random() < options['booking_density']
+                        yield Timetable(
+                            doctor_id=template.doctor_id,
+                            patient_id=rnd.choice(patients) if booked else None,
+                            start=start,
+                            stop=stop,
+                        )
+
+        return load_sessions(sessions())
+
+    def _book_sessions(self, doctors, patients, rnd, density):
+        if not patients:
+            return 0
+
+        free_sessions = Timetable.objects.filter(
+            doctor_id__in=doctors,
+            patient_id__isnull=True,
+            start__gt=timezone.now(),
+        ).values_list('id', flat=True)
+
+        booked = []
+        for session_id in free_sessions.iterator():
+            if rnd.random() < density:
+                booked.append(Timetable(id=session_id, patient_id=rnd.choice(patients)))
+
+        Timetable.objects.bulk_update(booked, ['patient'], batch_size=1000)
+        return len(booked)
@@ -0,0 +1,169 @@
+"""
+Request metrics in Prometheus text format.
+
+`MetricsMiddleware` measures latency, the number of SQL queries and SQL time
+of every request through database execute wrappers and aggregates them per view
+name (URL pattern name, so `persons/1/` and `persons/2/` are the same series).
+Aggregates live in this process: a lock-protected dict of counters updated once
+per request. `render()` adds free slots cache counters, `GET metrics` serves it.
+Latency of streaming responses covers the view, not the streaming.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from typing import Dict, List, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from ybooking_app import slot_cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# views of requests which match no URL pattern, their paths are not labels
+UNMATCHED = 'unmatched'
+# label of non-standard methods, any token is a valid method
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+OTHER_METHOD = 'other'
+
+
+class Histogram:
+    """ Bucket counts (not cumulative), sum and count of observations """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class ViewMetrics:
+    __slots__ = ('latency', 'queries', 'db_time', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(settings.METRICS_LATENCY_BUCKETS)
+        self.queries = Histogram(settings.METRICS_QUERY_BUCKETS)
+        self.db_time = 0.0
+        self.statuses: Dict[int, int] = {}
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._views: Dict[Tuple[str, str], ViewMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view: str, method: str, status: int, latency: float, queries: int, db_time: float):
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[(view, method)] = ViewMetrics()
+
+            metrics.latency.observe(latency)
+            metrics.queries.observe(queries)
+            metrics.db_time += db_time
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            lines += _header('ybooking_http_requests_total', 'counter', 'Requests by view, method and status')
+            for (view, method), metrics in views:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'ybooking_http_requests_total{{{_labels(view, method)},status="{status}"}} {count}')
+
+            lines += _header('ybooking_http_request_duration_seconds', 'histogram', 'Request latency by view')
+            for (view, method), metrics in views:
+                lines += metrics.latency.render('ybooking_http_request_duration_seconds', _labels(view, method))
+
+            lines += _header('ybooking_db_queries_per_request', 'histogram', 'SQL queries per request by view')
+            for (view, method), metrics in views:
+                lines += metrics.queries.render('ybooking_db_queries_per_request', _labels(view, method))
+
+            lines += _header('ybooking_db_query_duration_seconds_total', 'counter', 'SQL time of requests by view')
+            for (view, method), metrics in views:
+                lines.append(f'ybooking_db_query_duration_seconds_total{{{_labels(view, method)}}} {metrics.db_time}')
+
+        stats = slot_cache.get_stats()
+        lines += _header('ybooking_free_slots_cache_hits_total', 'counter', 'Free slots cache hits')
+        lines.append(f'ybooking_free_slots_cache_hits_total {stats["hits"]}')
+        lines += _header('ybooking_free_slots_cache_misses_total', 'counter', 'Free slots cache misses')
+        lines.append(f'ybooking_free_slots_cache_misses_total {stats["misses"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """ Execute wrapper counting queries and their time """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+
+        latency = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match is not None and match.view_name else UNMATCHED
+        method = request.method if request.method in METHODS else OTHER_METHOD
+        registry.observe(view, method, response.status_code, latency, timer.count, timer.time)
+        return response
+
+
+def _header(name: str, metric_type: str, help_text: str) -> List[str]:
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+
+
+def _labels(view: str, method: str) -> str:
+    return f'view="{_escape(view)}",method="{_escape(method)}"'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
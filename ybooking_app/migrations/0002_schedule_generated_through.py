@@ -0,0 +1,23 @@
+# Generated by Django 3.2.5 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='generated_through',
+            field=models.DateField(blank=True, null=True, verbose_name='Sessions are generated through'),
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='session_duration',
+            field=models.IntegerField(verbose_name='Session duration (min)'),
+        ),
+    ]
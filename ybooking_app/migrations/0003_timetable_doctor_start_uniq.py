@@ -0,0 +1,56 @@
+# Generated by Django 3.2.5 on 2026-10-18 15:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicated_sessions(apps, schema_editor):
+    """
+    Keep a single session per (doctor, start), booked sessions are preferred.
+    Several booked sessions of a doctor at the same start are not resolved
+    here, the migration stops with the list of such sessions.
+    """
+    Timetable = apps.get_model('ybooking_app', 'Timetable')
+
+    duplicates = list(Timetable.objects.values('doctor_id', 'start').annotate(
+        items=Count('id'),
+        booked=Count('patient_id'),
+    ).filter(items__gt=1))
+
+    double_booked = [duplicate for duplicate in duplicates if duplicate['booked'] > 1]
+    if double_booked:
+        rows = []
+        for duplicate in double_booked:
+            rows += Timetable.objects.filter(
+                doctor_id=duplicate['doctor_id'],
+                start=duplicate['start'],
+                patient_id__isnull=False,
+            ).order_by('id').values_list('id', 'doctor_id', 'patient_id', 'start')
+        raise RuntimeError(
+            'Doctors have several booked sessions at the same start, '
+            'cancel all but one of each group and migrate again (id, doctor_id, patient_id, start):\n'
+            + '\n'.join(f'  {row}' for row in rows)
+        )
+
+    for duplicate in duplicates:
+        sessions = Timetable.objects.filter(
+            doctor_id=duplicate['doctor_id'],
+            start=duplicate['start'],
+        ).order_by('id')
+        keep = sessions.filter(patient_id__isnull=False).first() or sessions.first()
+        sessions.filter(patient_id__isnull=True).exclude(id=keep.id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0002_schedule_generated_through'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timetable',
+            constraint=models.UniqueConstraint(fields=('doctor', 'start'), name='timetable_doctor_start_uniq'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0003_timetable_doctor_start_uniq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timetable',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='doctor', to='ybooking_app.profile', verbose_name='Doctor'),
+        ),
+        migrations.AlterField(
+            model_name='timetable',
+            name='patient',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ybooking_app.profile', verbose_name='Client'),
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(condition=models.Q(('patient__isnull', True)), fields=['doctor', 'start'], name='timetable_free_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['patient', 'start'], name='timetable_patient_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['start'], name='timetable_start_idx'),
+        ),
+    ]
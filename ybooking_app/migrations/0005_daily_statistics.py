@@ -0,0 +1,57 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:13
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_daily_statistics(apps, schema_editor):
+    Timetable = apps.get_model('ybooking_app', 'Timetable')
+    DailyStatistics = apps.get_model('ybooking_app', 'DailyStatistics')
+
+    rows = Timetable.objects.annotate(day=TruncDate('start')).values('doctor_id', 'day').annotate(
+        booked_sessions=Count('id', filter=Q(patient__isnull=False)),
+        free_sessions=Count('id', filter=Q(patient__isnull=True)),
+    ).order_by()
+    DailyStatistics.objects.bulk_create([
+        DailyStatistics(
+            day=row['day'],
+            doctor_id=row['doctor_id'],
+            booked=row['booked_sessions'],
+            free=row['free_sessions'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0004_timetable_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('booked', models.IntegerField(default=0, verbose_name='Booked sessions')),
+                ('free', models.IntegerField(default=0, verbose_name='Free sessions')),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='ybooking_app.profile', verbose_name='Doctor')),
+            ],
+            options={
+                'db_table': 'daily_statistics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailystatistics',
+            index=models.Index(fields=['doctor', 'day'], name='daily_statistics_doctor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystatistics',
+            constraint=models.UniqueConstraint(fields=('day', 'doctor'), name='daily_statistics_day_doctor_uniq'),
+        ),
+        migrations.RunPython(fill_daily_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0005_daily_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTimetable',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField(verbose_name='Session start datetime')),
+                ('stop', models.DateTimeField(verbose_name='Session stop datetime')),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_doctor_sessions', to='ybooking_app.profile', verbose_name='Doctor')),
+                ('patient', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_patient_sessions', to='ybooking_app.profile', verbose_name='Client')),
+            ],
+            options={
+                'db_table': 'timetable_archive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimetable',
+            index=models.Index(fields=['doctor', 'start'], name='timetable_archive_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimetable',
+            index=models.Index(fields=['patient', 'start'], name='timetable_archive_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimetable',
+            index=models.Index(fields=['start'], name='timetable_archive_start_idx'),
+        ),
+    ]
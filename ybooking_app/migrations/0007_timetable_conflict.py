@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0006_timetable_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetable',
+            name='conflict',
+            field=models.BooleanField(default=False, verbose_name='Conflicts with schedule'),
+        ),
+    ]
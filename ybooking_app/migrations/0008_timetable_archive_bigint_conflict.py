@@ -0,0 +1,38 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+def widen_partitioned_foreign_keys(apps, schema_editor):
+    """ The partitioned archive was created with integer foreign key columns """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'timetable_archive'::regclass")
+        if cursor.fetchone() is not None:
+            cursor.execute(
+                'ALTER TABLE timetable_archive ALTER COLUMN doctor_id TYPE bigint, ALTER COLUMN patient_id TYPE bigint'
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0007_timetable_conflict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtimetable',
+            name='conflict',
+            field=models.BooleanField(default=False, verbose_name='Conflicts with schedule'),
+        ),
+        migrations.AlterField(
+            model_name='archivedtimetable',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(widen_partitioned_foreign_keys, migrations.RunPython.noop),
+    ]
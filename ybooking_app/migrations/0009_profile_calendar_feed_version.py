@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ybooking_app', '0008_timetable_archive_bigint_conflict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='calendar_feed_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Calendar feed version'),
+        ),
+    ]
@@ -14,6 +14,8 @@ class Profile(models.Model):
 
     Sex = models.IntegerChoices('Sex', 'MAN WOMAN UNDEFINED')
     sex = models.IntegerField(choices=Sex.choices, default=Sex.UNDEFINED, verbose_name='Sex')
+    # changed to revoke URLs of the person's calendar feed
+    calendar_feed_version = models.PositiveIntegerField(default=0, verbose_name='Calendar feed version')
 
     class Meta:
         db_table = 'profile'
@@ -24,19 +26,42 @@ class Profile(models.Model):
 
 
 class Timetable(models.Model):
-    doctor = models.ForeignKey(Profile, on_delete=CASCADE, verbose_name='Doctor', related_name='doctor')
-    patient = models.ForeignKey(Profile, null=True, blank=True, on_delete=SET_NULL, verbose_name='Client')
+    # foreign keys are covered by composite indexes below
+    doctor = models.ForeignKey(
+        Profile, on_delete=CASCADE, verbose_name='Doctor', related_name='doctor', db_index=False,
+    )
+    patient = models.ForeignKey(
+        Profile, null=True, blank=True, on_delete=SET_NULL, verbose_name='Client', db_index=False,
+    )
     start = models.DateTimeField(verbose_name='Session start datetime')
     stop = models.DateTimeField(verbose_name='Session stop datetime')
+    # set for booked sessions which no longer fit the doctor's schedule
+    conflict = models.BooleanField(default=False, verbose_name='Conflicts with schedule')
 
     class Meta:
         db_table = 'timetable'
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'start'], name='timetable_doctor_start_uniq'),
+        ]
+        indexes = [
+            # free slots of a doctor, (doctor, start) is covered by the unique constraint
+            models.Index(
+                fields=['doctor', 'start'],
+                condition=models.Q(patient__isnull=True),
+                name='timetable_free_slot_idx',
+            ),
+            # sessions of a patient
+            models.Index(fields=['patient', 'start'], name='timetable_patient_start_idx'),
+            # daily statistics
+            models.Index(fields=['start'], name='timetable_start_idx'),
+        ]
 
 
 class Schedule(models.Model):
     doctor = models.ForeignKey(Profile, on_delete=CASCADE, verbose_name='Doctor')
     planning_days = models.IntegerField(default=7, verbose_name='Days number to generate sessions')
     session_duration = models.IntegerField(verbose_name='Session duration (min)')
+    generated_through = models.DateField(null=True, blank=True, verbose_name='Sessions are generated through')
 
     class Meta:
         db_table = 'schedule'
@@ -60,4 +85,52 @@ class Vacation(models.Model):
     stop_date = models.DateField(verbose_name='Vacation stop date')
 
     class Meta:
-        db_table = 'vacation'
\ No newline at end of file
+        db_table = 'vacation'
+
+
+class DailyStatistics(models.Model):
+    """
+    Number of booked and free sessions of a doctor per day, maintained on
+    booking, cancellation and slot generation
+    """
+    day = models.DateField(verbose_name='Day')
+    doctor = models.ForeignKey(Profile, on_delete=CASCADE, verbose_name='Doctor', db_index=False)
+    booked = models.IntegerField(default=0, verbose_name='Booked sessions')
+    free = models.IntegerField(default=0, verbose_name='Free sessions')
+
+    class Meta:
+        db_table = 'daily_statistics'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'doctor'], name='daily_statistics_day_doctor_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['doctor', 'day'], name='daily_statistics_doctor_idx'),
+        ]
+
+
+class ArchivedTimetable(models.Model):
+    """
+    Past sessions moved out of Timetable by `archive_sessions` task, ids are
+    kept. On PostgreSQL the table may be partitioned by month of start
+    (see `partition_timetable_archive` command).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    doctor = models.ForeignKey(
+        Profile, on_delete=CASCADE, verbose_name='Doctor', related_name='archived_doctor_sessions', db_index=False,
+    )
+    patient = models.ForeignKey(
+        Profile, null=True, blank=True, on_delete=SET_NULL, verbose_name='Client',
+        related_name='archived_patient_sessions', db_index=False,
+    )
+    start = models.DateTimeField(verbose_name='Session start datetime')
+    stop = models.DateTimeField(verbose_name='Session stop datetime')
+    conflict = models.BooleanField(default=False, verbose_name='Conflicts with schedule')
+
+    class Meta:
+        db_table = 'timetable_archive'
+        indexes = [
+            models.Index(fields=['doctor', 'start'], name='timetable_archive_doctor_idx'),
+            models.Index(fields=['patient', 'start'], name='timetable_archive_patient_idx'),
+            # daily statistics
+            models.Index(fields=['start'], name='timetable_archive_start_idx'),
+        ]
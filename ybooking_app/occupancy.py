@@ -0,0 +1,180 @@
+"""
+In-memory occupancy index of doctors' sessions.
+
+Sessions of every doctor are kept per day as arrays sorted by start with a
+bitmap of free slots (bit i is set when the i-th session is free), so the
+earliest free slots of many doctors are found without touching the database.
+The index is filled lazily per day, kept up to date in this process by the
+`timetable_changed` signal and reloaded after OCCUPANCY_INDEX_TTL seconds to
+pick up changes made by other processes.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from django.conf import settings
+from django.utils import timezone
+
+from ybooking_app.availability import get_virtual_slot_id
+from ybooking_app.helpers import get_day_start
+from ybooking_app.models import Timetable
+from ybooking_app.slots import load_templates
+
+
+class DayOccupancy:
+    """
+    Sessions of a single doctor in a single day
+    """
+    __slots__ = ('starts', 'stops', 'ids', 'free')
+
+    def __init__(self, sessions: Iterable[dict]):
+        sessions = sorted(sessions, key=lambda session: session['start'])
+        self.starts: List[datetime] = [session['start'] for session in sessions]
+        self.stops: List[datetime] = [session['stop'] for session in sessions]
+        self.ids: List[int] = [session['id'] for session in sessions]
+        self.free = 0
+        for i, session in enumerate(sessions):
+            if session['patient_id'] is None:
+                self.free |= 1 << i
+
+    def mark(self, start: datetime, free: bool, slot_id: int) -> bool:
+        """ Set occupancy of the session, returns False if there is no such session """
+        i = bisect_left(self.starts, start)
+        if i == len(self.starts) or self.starts[i] != start:
+            return False
+
+        # a virtual slot gets a real id when it is booked
+        self.ids[i] = slot_id
+        if free:
+            self.free |= 1 << i
+        else:
+            self.free &= ~(1 << i)
+        return True
+
+    def free_slots(self, doctor_id: int, after: datetime) -> Iterator[tuple]:
+        """ Yield (start, doctor_id, id, stop) of free sessions starting after the moment """
+        # drop sessions which have already started
+        first = bisect_right(self.starts, after)
+        mask = self.free >> first << first
+        while mask:
+            lowest = mask & -mask
+            i = lowest.bit_length() - 1
+            yield self.starts[i], doctor_id, self.ids[i], self.stops[i]
+            mask ^= lowest
+
+
+class OccupancyIndex:
+
+    def __init__(self):
+        self._days: Dict[date, Dict[int, DayOccupancy]] = {}
+        self._loaded_at: Dict[date, float] = {}
+        self._lock = threading.RLock()
+
+    def search(self, first_day: date, last_day: date, doctor_ids: Optional[Iterable[int]] = None,
+               limit: int = 20, now: Optional[datetime] = None,
+               get_held_slots: Optional[Callable[[int], Set[int]]] = None) -> List[dict]:
+        """
+        Earliest free slots of the doctors (all doctors by default) within the days,
+        slots held by other patients are skipped when `get_held_slots` is given
+        """
+        now = now or timezone.now()
+        first_day = max(first_day, timezone.localdate(now))
+        doctor_ids = None if doctor_ids is None else set(doctor_ids)
+        held = {}
+        results = []
+
+        day = first_day
+        while day <= last_day and len(results) < limit:
+            doctors = self._get_day(day)
+            candidates = heapq.merge(*(
+                occupancy.free_slots(doctor_id, now)
+                for doctor_id, occupancy in doctors.items()
+                if doctor_ids is None or doctor_id in doctor_ids
+            ))
+
+            for start, doctor_id, slot_id, stop in candidates:
+                if get_held_slots is not None:
+                    if doctor_id not in held:
+                        held[doctor_id] = get_held_slots(doctor_id)
+                    if slot_id in held[doctor_id]:
+                        continue
+
+                results.append({'id': slot_id, 'doctor_id': doctor_id, 'start': start, 'stop': stop})
+                if len(results) == limit:
+                    break
+
+            day += timedelta(days=1)
+
+        return results
+
+    def mark(self, doctor_id: int, start: datetime, free: bool, slot_id: int):
+        """ Update occupancy of a booked or canceled session """
+        day = timezone.localdate(start)
+        with self._lock:
+            doctors = self._days.get(day)
+            if doctors is None:
+                return
+
+            occupancy = doctors.get(doctor_id)
+            if occupancy is None or not occupancy.mark(start, free, slot_id):
+                # unknown session, the day is reloaded on next search
+                self.invalidate({day})
+
+    def invalidate(self, days: Optional[Iterable[date]] = None):
+        """ Forget the days (all days by default) """
+        with self._lock:
+            if days is None:
+                self._days.clear()
+                self._loaded_at.clear()
+                return
+
+            for day in days:
+                self._days.pop(day, None)
+                self._loaded_at.pop(day, None)
+
+    def _get_day(self, day: date) -> Dict[int, DayOccupancy]:
+        with self._lock:
+            loaded_at = self._loaded_at.get(day)
+            if loaded_at is None or time.monotonic() - loaded_at > settings.OCCUPANCY_INDEX_TTL:
+                self._days[day] = self._load_day(day)
+                self._loaded_at[day] = time.monotonic()
+
+            return self._days[day]
+
+    def _load_day(self, day: date) -> Dict[int, DayOccupancy]:
+        day_start = get_day_start(day)
+        sessions: Dict[int, Dict[datetime, dict]] = {}
+        for session in Timetable.objects.filter(
+            start__gte=day_start,
+            start__lt=day_start + timedelta(days=1),
+            doctor__user__is_active=True,
+        ).values('id', 'doctor_id', 'patient_id', 'start', 'stop').iterator():
+            sessions.setdefault(session['doctor_id'], {})[session['start']] = session
+
+        if settings.TIMESLOTS_VIRTUAL:
+            # free slots which are not materialized yet come from schedule templates
+            today = timezone.localdate()
+            for doctor_id, template in load_templates(today).items():
+                if not 0 <= (day - today).days < template.planning_days:
+                    continue
+
+                doctor_sessions = sessions.setdefault(doctor_id, {})
+                for start, stop in template.sessions(day):
+                    doctor_sessions.setdefault(start, {
+                        'id': get_virtual_slot_id(start),
+                        'patient_id': None,
+                        'start': start,
+                        'stop': stop,
+                    })
+
+        return {
+            doctor_id: DayOccupancy(doctor_sessions.values())
+            for doctor_id, doctor_sessions in sessions.items()
+            if doctor_sessions
+        }
+
+
+occupancy_index = OccupancyIndex()
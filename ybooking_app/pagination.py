@@ -0,0 +1,171 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination by unique ordering keys: a page is fetched with
+    `WHERE keys > cursor ORDER BY keys LIMIT page_size`, so it takes the same
+    time however deep the client scrolls. Accepts querysets and lists of dicts
+    already ordered by the keys.
+    """
+    ordering: Sequence[str] = ('id',)
+    # types of the ordering keys, cursor values are checked against them
+    ordering_types: Sequence[type] = (int,)
+    page_size = settings.KEYSET_PAGE_SIZE
+    max_page_size = settings.KEYSET_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        if isinstance(queryset, QuerySet):
+            items = self._fetch_queryset(queryset, position, reverse, page_size + 1)
+        else:
+            items = self._fetch_list(queryset, position, reverse, page_size + 1)
+
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if reverse:
+            items.reverse()
+
+        self.next_position = self.previous_position = None
+        if items:
+            if has_more or reverse:
+                self.next_position = self._get_position(items[-1])
+            has_previous = has_more if reverse else position is not None
+            if has_previous:
+                self.previous_position = self._get_position(items[0])
+
+        return items
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_previous_link(self) -> Optional[str]:
+        if self.previous_position is None:
+            return None
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(self.previous_position, reverse=True),
+        )
+
+    def encode_cursor(self, position, reverse=False) -> str:
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        data = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position = self._parse_position(data['p'])
+            reverse = bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def _parse_position(self, values) -> tuple:
+        """ Cursor values of the ordering keys, raises ValueError if they don't match key types """
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError('Unexpected number of cursor values')
+
+        position = []
+        for value, value_type in zip(values, self.ordering_types):
+            if value_type is datetime:
+                value = parse_datetime(value) if isinstance(value, str) else None
+                if value is None or timezone.is_naive(value):
+                    raise ValueError('Cursor value is not an aware datetime')
+            # bool is an int too
+            elif type(value) is not value_type:
+                raise ValueError(f'Cursor value is not {value_type.__name__}')
+            position.append(value)
+
+        return tuple(position)
+
+    def _fetch_queryset(self, queryset, position, reverse, limit):
+        if position is not None:
+            queryset = queryset.filter(self._build_filter(position, reverse))
+
+        ordering = [f'-{key}' if reverse else key for key in self.ordering]
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def _fetch_list(self, items, position, reverse, limit):
+        if reverse:
+            items = [item for item in reversed(items) if position is None or self._get_position(item) < position]
+        else:
+            items = [item for item in items if position is None or self._get_position(item) > position]
+
+        return items[:limit]
+
+    def _build_filter(self, position, reverse) -> Q:
+        """ (k1, k2) > (v1, v2) is k1 > v1 OR (k1 = v1 AND k2 > v2) """
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+        for i, key in enumerate(self.ordering):
+            equal = {prev_key: position[j] for j, prev_key in enumerate(self.ordering[:i])}
+            condition |= Q(**equal, **{f'{key}__{lookup}': position[i]})
+        return condition
+
+    def _get_position(self, item):
+        if isinstance(item, dict):
+            return tuple(item[key] for key in self.ordering)
+        return tuple(getattr(item, key) for key in self.ordering)
+
+
+class PersonPagination(KeysetPagination):
+    ordering = ('id',)
+    ordering_types = (int,)
+
+
+class SchedulePagination(KeysetPagination):
+    ordering = ('start', 'id')
+    ordering_types = (datetime, int)
@@ -21,5 +21,6 @@ class IsPatientOwner(IsPatient):
         return bool(
             request.user and
             request.user.is_authenticated and
-            obj.patient.user == request.user
+            hasattr(request.user, 'profile') and
+            obj.patient_id == request.user.profile.id
         )
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Bulk import of persons from CSV or NDJSON.
+
+Rows are validated with the same rules as `POST persons/`, valid rows of a
+batch get unique usernames with one lookup of existing ones and are inserted
+with two bulk INSERTs (users and profiles). Invalid rows are reported and
+skipped, they don't stop the import; so are rows of a batch which can't be
+inserted after MAX_ATTEMPTS.
+"""
+import codecs
+import csv
+import json
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from ybooking_app.export import CSV, NDJSON
+from ybooking_app.helpers import allocate_usernames, generate_username
+from ybooking_app.models import Profile
+from ybooking_app.serializers import PersonImportSerializer
+
+logger = logging.getLogger(__name__)
+
+# usernames taken concurrently are allocated again
+MAX_ATTEMPTS = 3
+
+
+def is_utf8(chunks: Iterable[bytes]) -> bool:
+    """ Whether the whole file decodes, batches are committed as rows are read """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for chunk in chunks:
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def read_rows(lines: Iterable[str], input_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """ Yield (row number, row), row is None if the line can't be parsed """
+    if input_format == CSV:
+        reader = csv.DictReader(lines)
+        for number, row in enumerate(reader, start=1):
+            yield number, {key: value for key, value in row.items() if key is not None and value != ''}
+        return
+
+    if input_format != NDJSON:
+        raise ValueError(f'Unknown input format {input_format}')
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def import_persons(rows: Iterable[Tuple[int, Optional[dict]]], batch_size: Optional[int] = None) -> dict:
+    """
+    Create users with profiles, returns the number of created persons
+    and errors of invalid rows
+    """
+    batch_size = batch_size or settings.PERSONS_IMPORT_BATCH_SIZE
+    created = 0
+    errors = []
+
+    batch = []
+    for number, row in rows:
+        if row is None:
+            errors.append({'row': number, 'errors': {'non_field_errors': ['Invalid row.']}})
+            continue
+
+        serializer = PersonImportSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'row': number, 'errors': serializer.errors})
+            continue
+
+        batch.append((number, serializer.validated_data))
+        if len(batch) == batch_size:
+            created += _create_persons(batch, errors)
+            batch = []
+
+    if batch:
+        created += _create_persons(batch, errors)
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'errors': errors}
+
+
+def _create_persons(rows: List[Tuple[int, dict]], errors: List[dict]) -> int:
+    """ Insert a batch, returns the number of created persons; rows of a failed batch are added to errors """
+    password = make_password(None)
+    batch = [data for _, data in rows]
+    bases = [generate_username(data['first_name'], data['last_name']) for data in batch]
+
+    for attempt in range(MAX_ATTEMPTS):
+        usernames = allocate_usernames(bases)
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(
+                        username=username,
+                        first_name=data['first_name'],
+                        last_name=data['last_name'],
+                        password=password,
+                    )
+                    for username, data in zip(usernames, batch)
+                ])
+                user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+                Profile.objects.bulk_create([
+                    Profile(user_id=user_ids[username], **data['profile'])
+                    for username, data in zip(usernames, batch)
+                ])
+        except IntegrityError:
+            if attempt == MAX_ATTEMPTS - 1:
+                logger.exception('Failed to import a batch of %s persons', len(batch))
+        else:
+            return len(batch)
+
+    errors.extend(
+        {'row': number, 'errors': {'non_field_errors': ['Person could not be saved, try to import the row again.']}}
+        for number, _ in rows
+    )
+    return 0
@@ -0,0 +1,121 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from ybooking_app import daily_statistics, ical
+from ybooking_app.authentication import invalidate_tokens, invalidate_user_tokens
+from ybooking_app.models import DayInterval, Profile, Schedule, Vacation
+
+from ybooking_app.occupancy import occupancy_index
+from ybooking_app.regeneration import get_affected_days, regenerate_days
+from ybooking_app.slot_events import get_event_broker, get_slot_events
+from ybooking_app.signals import BOOK, CANCEL, CREATE, timetable_changed
+from ybooking_app.versions import STATISTICS_SCOPE, bump_versions, schedule_scope
+
+
+@receiver(timetable_changed)
+def update_occupancy_index(sender, action, sessions, days, committed, **kwargs):
+    if not committed:
+        return
+
+    for session in sessions:
+        if action in (BOOK, CREATE, CANCEL):
+            occupancy_index.mark(session['doctor_id'], session['start'], action == CANCEL, session['id'])
+
+    # sessions generated or deleted in bulk are reloaded
+    occupancy_index.invalidate({day for doctor_days in days.values() for day in doctor_days})
+
+
+@receiver(timetable_changed)
+def bump_timetable_versions(sender, action, sessions, days, **kwargs):
+    # bumped within the transaction for its own reads and once more after commit
+    # to drop data cached by concurrent requests from the snapshot before commit
+    persons = set(days)
+    for session in sessions:
+        persons.add(session['doctor_id'])
+        if session['patient_id'] is not None:
+            persons.add(session['patient_id'])
+
+    bump_versions([STATISTICS_SCOPE, *(schedule_scope(person_id) for person_id in persons)])
+
+
+@receiver(timetable_changed)
+def publish_slot_events(sender, action, sessions, days, committed, **kwargs):
+    if not committed:
+        return
+
+    events = get_slot_events(action, sessions, days)
+    if events:
+        get_event_broker().publish(events)
+
+
+# counter changes of booked and free sessions
+STATISTICS_CHANGES = {
+    BOOK: (1, -1),
+    CREATE: (1, 0),
+    CANCEL: (-1, 1),
+}
+
+
+@receiver(timetable_changed)
+def update_daily_statistics(sender, action, sessions, days, committed, **kwargs):
+    # updated within the transaction of the change
+    if committed:
+        return
+
+    if action in STATISTICS_CHANGES:
+        daily_statistics.apply_changes(daily_statistics.get_session_changes(sessions, *STATISTICS_CHANGES[action]))
+    daily_statistics.refresh_days(days)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_user_token_cache(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.id if sender is User else instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_calendar_feed_version(sender, instance, **kwargs):
+    """ Feeds of deactivated or deleted persons are revoked """
+    if sender is Profile:
+        ical.invalidate_feed_version(instance.id)
+        return
+
+    for profile_id in Profile.objects.filter(user_id=instance.id).values_list('id', flat=True):
+        ical.invalidate_feed_version(profile_id)
+
+
+@receiver(pre_save, sender=Schedule)
+@receiver(pre_save, sender=DayInterval)
+@receiver(pre_save, sender=Vacation)
+def remember_template_days(sender, instance, raw=False, **kwargs):
+    """ Days of the template before the change are regenerated too """
+    previous = None if raw or instance.pk is None else sender.objects.filter(pk=instance.pk).first()
+    instance._template_days = get_affected_days(previous) if previous is not None else {}
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=DayInterval)
+@receiver(post_save, sender=Vacation)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=DayInterval)
+@receiver(post_delete, sender=Vacation)
+def regenerate_template_days(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    doctor_days = get_affected_days(instance)
+    for doctor_id, days in getattr(instance, '_template_days', {}).items():
+        doctor_days.setdefault(doctor_id, set()).update(days)
+
+    # after commit, the doctor may be deleted along with the template
+    if doctor_days:
+        transaction.on_commit(lambda: regenerate_days(doctor_days))
@@ -0,0 +1,152 @@
+"""
+Targeted regeneration of already generated days.
+
+Generation skips days up to the generated-through watermark, so changes of a
+doctor's Schedule, DayInterval or Vacation don't reach sessions generated
+earlier. Future days affected by such a change are regenerated: their free
+sessions are deleted and created again from the current template in one batch,
+booked sessions are kept and flagged with `conflict` when they don't fit the
+template anymore.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from ybooking_app.helpers import get_day_start
+from ybooking_app.loader import load_sessions
+from ybooking_app.models import DayInterval, Schedule, Timetable, Vacation
+from ybooking_app.signals import DELETE, GENERATE, SESSION_FIELDS, notify_timetable_changed
+from ybooking_app.slots import WEEKDAYS, load_templates
+
+logger = logging.getLogger(__name__)
+
+
+def get_generated_days(doctor_id: int, today: date, generated_through: Optional[date] = None) -> List[date]:
+    """ Days from today through the doctor's generated-through watermark """
+    if generated_through is None:
+        generated_through = Schedule.objects.filter(doctor_id=doctor_id).aggregate(
+            Max('generated_through'),
+        )['generated_through__max']
+
+    if generated_through is None or generated_through < today:
+        return []
+    return [today + timedelta(days=i) for i in range((generated_through - today).days + 1)]
+
+
+def get_affected_days(instance, today: Optional[date] = None) -> Dict[int, Set[date]]:
+    """ Generated future days whose sessions depend on the Schedule, DayInterval or Vacation """
+    today = today or timezone.localdate()
+
+    if isinstance(instance, Schedule):
+        days = get_generated_days(instance.doctor_id, today, instance.generated_through)
+    elif isinstance(instance, DayInterval):
+        days = [
+            day for day in get_generated_days(instance.doctor_id, today)
+            if day.weekday() == WEEKDAYS.get(instance.weekday)
+        ]
+    elif isinstance(instance, Vacation):
+        days = [
+            day for day in get_generated_days(instance.doctor_id, today)
+            if instance.start_date <= day <= instance.stop_date
+        ]
+    else:
+        raise TypeError(f'Unexpected template object {instance!r}')
+
+    return {instance.doctor_id: set(days)} if days else {}
+
+
+def regenerate_days(doctor_days: Dict[int, Iterable[date]], today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Recreate free sessions of the doctors' days from their templates, booked
+    sessions which don't fit the templates are flagged; returns numbers of
+    deleted and created sessions and conflicts
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    doctor_days = {doctor_id: {day for day in days if day >= today} for doctor_id, days in doctor_days.items()}
+    doctor_days = {doctor_id: days for doctor_id, days in doctor_days.items() if days}
+    if not doctor_days:
+        return {'deleted': 0, 'created': 0, 'conflicts': 0}
+
+    templates = load_templates(today, doctor_days)
+
+    days_filter = Q()
+    for doctor_id, days in doctor_days.items():
+        for day in days:
+            days_filter |= Q(
+                doctor_id=doctor_id,
+                start__gte=get_day_start(day),
+                start__lt=get_day_start(day + timedelta(days=1)),
+            )
+
+    with transaction.atomic():
+        # past sessions of today are left as they are
+        sessions = Timetable.objects.select_for_update().filter(days_filter, start__gt=now)
+        deleted = list(sessions.filter(patient_id__isnull=True).values(*SESSION_FIELDS))
+        sessions.filter(patient_id__isnull=True).delete()
+
+        booked = defaultdict(list)
+        for session in sessions.values('id', 'doctor_id', 'start', 'stop', 'conflict'):
+            booked[(session['doctor_id'], timezone.localdate(session['start']))].append(session)
+
+        new_sessions = []
+        fitting = set()
+        for doctor_id, days in doctor_days.items():
+            template = templates.get(doctor_id)
+            if template is None:
+                continue
+
+            _, last = template.planning_range(today)
+            for day in sorted(days):
+                if day > last:
+                    continue
+
+                day_booked = booked.get((doctor_id, day), ())
+                for start, stop in template.sessions(day):
+                    if start <= now:
+                        continue
+
+                    overlapping = [
+                        session for session in day_booked
+                        if session['start'] < stop and start < session['stop']
+                    ]
+                    for session in overlapping:
+                        if (session['start'], session['stop']) == (start, stop):
+                            fitting.add(session['id'])
+
+                    # the doctor is busy with a booked session
+                    if not overlapping:
+                        new_sessions.append(Timetable(doctor_id=doctor_id, patient_id=None, start=start, stop=stop))
+
+        booked_sessions = [session for day_booked in booked.values() for session in day_booked]
+        conflicts = [session['id'] for session in booked_sessions if session['id'] not in fitting]
+        Timetable.objects.filter(pk__in=conflicts, conflict=False).update(conflict=True)
+        Timetable.objects.filter(pk__in=fitting, conflict=True).update(conflict=False)
+
+        created = load_sessions(new_sessions)
+        _lower_watermarks(templates, doctor_days, today)
+
+        if deleted:
+            notify_timetable_changed(DELETE, deleted)
+        notify_timetable_changed(GENERATE, days=doctor_days)
+
+    if conflicts:
+        logger.warning(
+            '%s booked sessions conflict with changed schedules of doctors %s', len(conflicts), sorted(doctor_days),
+        )
+
+    return {'deleted': len(deleted), 'created': created, 'conflicts': len(conflicts)}
+
+
+def _lower_watermarks(templates, doctor_days, today: date):
+    """ Watermarks beyond shortened planning horizons go back to their ends """
+    for doctor_id in doctor_days:
+        template = templates.get(doctor_id)
+        if template is not None:
+            _, last = template.planning_range(today)
+            Schedule.objects.filter(doctor_id=doctor_id, generated_through__gt=last).update(generated_through=last)
@@ -1,11 +1,44 @@
+from datetime import timedelta
+from typing import Callable, Dict
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 
-from ybooking_app.helpers import generate_username
+from ybooking_app.export import CSV, NDJSON
+from ybooking_app.helpers import allocate_usernames, generate_username
 from ybooking_app.models import Profile, Timetable
 
 
+class ValuesSerializer:
+    """
+    Read-only serializer of `QuerySet.values()` rows: only the response columns
+    are selected (related ones are joined) and response dicts are built without
+    per-field serializer overhead. Dates are formatted as DRF fields do.
+    """
+    # response field -> lookup
+    fields: Dict[str, str] = {}
+    formatters: Dict[str, Callable] = {}
+
+    @classmethod
+    def get_values(cls, queryset):
+        return queryset.values(
+            *[name for name, lookup in cls.fields.items() if name == lookup],
+            **{name: F(lookup) for name, lookup in cls.fields.items() if name != lookup},
+        )
+
+    @classmethod
+    def to_representation(cls, row: dict) -> dict:
+        data = {}
+        for name in cls.fields:
+            formatter = cls.formatters.get(name)
+            data[name] = row[name] if formatter is None else formatter(row[name])
+        return data
+
+
 class UserSerializer(serializers.ModelSerializer):
     patronymic = serializers.CharField(source='profile.patronymic')
     sex = serializers.IntegerField(source='profile.sex')
@@ -25,7 +58,7 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name': validated_data.pop('last_name')
         }
         user = User.objects.create_user(
-            username=generate_username(**user_data),
+            username=allocate_usernames([generate_username(**user_data)])[0],
             email=None,
             password=None,
             **user_data,
@@ -48,16 +81,99 @@ class UserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class PersonImportSerializer(UserSerializer):
+    # usernames are generated from names
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+
+
+class PersonsImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    input = serializers.ChoiceField(choices=[CSV, NDJSON], default=CSV)
+
+
 class TimetableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Timetable
         fields = ('id', 'start', 'stop')
 
 
-class StatisticsSerializer(serializers.ModelSerializer):
+class UserValuesSerializer(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'patronymic': 'profile__patronymic',
+        'sex': 'profile__sex',
+        'birthday': 'profile__birthday',
+        'is_doctor': 'profile__is_doctor',
+    }
+    formatters = {'birthday': serializers.DateField().to_representation}
+
+
+class TimetableValuesSerializer(ValuesSerializer):
+    fields = {'id': 'id', 'start': 'start', 'stop': 'stop'}
+    formatters = {
+        'start': serializers.DateTimeField().to_representation,
+        'stop': serializers.DateTimeField().to_representation,
+    }
+
+
+class StatisticsSerializer(serializers.Serializer):
     day = serializers.DateField()
     count = serializers.IntegerField()
+    booked = serializers.IntegerField(source='booked_sessions')
+    free = serializers.IntegerField(source='free_sessions')
 
-    class Meta:
-        model = Timetable
-        fields = ('day', 'count')
+
+class StatisticsFilterSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    stop = serializers.DateField(required=False)
+    doctor = serializers.IntegerField(required=False)
+
+
+class ExportSerializer(StatisticsFilterSerializer):
+    # `format` query parameter is taken by DRF format suffixes
+    output = serializers.ChoiceField(choices=[CSV, NDJSON], default=CSV)
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['book', 'cancel'])
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.BULK_BOOKING_MAX_SLOTS,
+    )
+
+
+class AvailabilitySearchSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    stop = serializers.DateField(required=False)
+    doctors = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.AVAILABILITY_SEARCH_MAX_LIMIT, default=20)
+
+    def validate_doctors(self, value):
+        try:
+            return {int(doctor_id) for doctor_id in value.split(',') if doctor_id.strip()}
+        except ValueError:
+            raise serializers.ValidationError('Comma-separated doctor ids are expected.')
+
+    def validate(self, attrs):
+        today = timezone.localdate()
+        attrs['start'] = attrs.get('start') or today
+        attrs['stop'] = attrs.get('stop') or attrs['start'] + timedelta(days=6)
+
+        if attrs['stop'] < attrs['start']:
+            raise serializers.ValidationError('Stop date is earlier than start date.')
+        if (attrs['stop'] - attrs['start']).days >= settings.AVAILABILITY_SEARCH_MAX_DAYS:
+            raise serializers.ValidationError(
+                f'Search range is limited to {settings.AVAILABILITY_SEARCH_MAX_DAYS} days.'
+            )
+        return attrs
+
+
+class AvailableSlotSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    doctor_id = serializers.IntegerField()
+    start = serializers.DateTimeField()
+    stop = serializers.DateTimeField()
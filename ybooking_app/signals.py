@@ -0,0 +1,36 @@
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.dispatch import Signal
+
+BOOK = 'book'
+# sessions inserted already booked (virtual slots)
+CREATE = 'create'
+CANCEL = 'cancel'
+GENERATE = 'generate'
+DELETE = 'delete'
+
+SESSION_FIELDS = ('id', 'doctor_id', 'patient_id', 'start', 'stop')
+
+# Sent when Timetable items are changed: right away within the transaction
+# and once more after it is committed.
+# Arguments:
+#   action: BOOK, CREATE, CANCEL, GENERATE or DELETE
+#   sessions: list of changed sessions as dicts of SESSION_FIELDS,
+#             patient_id of canceled sessions is the patient before cancellation
+#   days: {doctor_id: days} whose sessions have been generated or deleted in bulk
+#   committed: False for the first signal, True after commit
+timetable_changed = Signal()
+
+
+def notify_timetable_changed(action: str, sessions: Iterable[dict] = (),
+                             days: Optional[Dict[int, Iterable[date]]] = None):
+    sessions = list(sessions)
+    days = days or {}
+
+    def send(committed):
+        timetable_changed.send(sender='ybooking_app', action=action, sessions=sessions, days=days, committed=committed)
+
+    send(False)
+    transaction.on_commit(lambda: send(True))
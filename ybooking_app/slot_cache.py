@@ -0,0 +1,69 @@
+"""
+Read-through cache of doctors' upcoming free slots.
+
+Cached lists are keyed by the doctor's schedule version (see versions.py),
+invalidation replaces the version after booking, cancellation or generation.
+A list loaded from a stale snapshot is stored under the old version and is
+never read again.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from ybooking_app.versions import bump_versions, get_versions, schedule_scope
+
+_MISSING = object()
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cached_free_slots(doctor_id: int, load: Callable[[], Optional[List[dict]]]) -> Optional[List[dict]]:
+    """
+    Upcoming free slots of the doctor ordered by (start, id), `load` is called
+    on cache miss and returns None if the person is not a doctor
+    """
+    cache = _get_cache()
+    scope = schedule_scope(doctor_id)
+    key = f'free-slots:{doctor_id}:{get_versions([scope])[scope]}'
+
+    slots = cache.get(key, _MISSING)
+    if slots is not _MISSING:
+        _count('hits')
+        if slots is None:
+            return None
+
+        now = timezone.now()
+        return [slot for slot in slots if slot['start'] > now]
+
+    _count('misses')
+    slots = load()
+    cache.set(key, slots, timeout=settings.FREE_SLOTS_CACHE_TTL)
+    return slots
+
+
+def invalidate_free_slots(doctor_ids: Iterable[int]):
+    bump_versions(schedule_scope(doctor_id) for doctor_id in doctor_ids)
+
+
+def get_stats() -> Dict[str, int]:
+    """ Hit and miss counters of this process """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def _count(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def _get_cache():
+    return caches[settings.FREE_SLOTS_CACHE]
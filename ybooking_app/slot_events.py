@@ -0,0 +1,206 @@
+"""
+Pub/sub of doctors' slot events.
+
+Freed and newly generated slots are published after commit, so patients
+waiting for a slot subscribe to a doctor's events instead of polling the
+schedule (see event_stream.py). Subscribers are asyncio queues of this
+process; the Redis broker relays events published by any process to them
+through a single Redis subscription per process.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ybooking_app.signals import CANCEL, GENERATE
+
+logger = logging.getLogger(__name__)
+
+FREED = 'freed'
+GENERATED = 'generated'
+
+
+def get_slot_events(action: str, sessions: Iterable[dict], days: Dict[int, Iterable],
+                    now: Optional[datetime] = None) -> List[dict]:
+    """ Events of a `timetable_changed` signal, only upcoming slots are of interest """
+    now = now or timezone.now()
+    if action == CANCEL:
+        return [
+            {
+                'event': FREED,
+                'doctor_id': session['doctor_id'],
+                'id': session['id'],
+                'start': session['start'].isoformat(),
+                'stop': session['stop'].isoformat(),
+            }
+            for session in sessions
+            if session['start'] > now
+        ]
+
+    if action == GENERATE:
+        return [
+            {'event': GENERATED, 'doctor_id': doctor_id, 'days': sorted(day.isoformat() for day in doctor_days)}
+            for doctor_id, doctor_days in days.items()
+            if doctor_days
+        ]
+
+    return []
+
+
+class Subscription:
+    """
+    Events of a doctor for a single client, an overflowed subscription
+    is closed and the client is expected to reload the schedule
+    """
+
+    def __init__(self, broker: 'LocMemSlotEventBroker', doctor_id: int, max_size: int):
+        self.broker = broker
+        self.doctor_id = doctor_id
+        self.overflowed = False
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+
+    async def get(self) -> Optional[dict]:
+        """ Next event, None once the subscription is overflowed """
+        return await self._queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def put(self, event: dict):
+        # called from any thread
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the loop of a disconnected client is closed
+            self.close()
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+
+        if self._queue.qsize() >= self._queue.maxsize - 1:
+            self.overflowed = True
+            event = None
+        self._queue.put_nowait(event)
+
+
+class BaseSlotEventBroker:
+
+    def publish(self, events: List[dict]):
+        raise NotImplementedError
+
+    def subscribe(self, doctor_id: int) -> Subscription:
+        """ Subscribe to events of the doctor, must be called within an event loop """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription):
+        raise NotImplementedError
+
+
+class LocMemSlotEventBroker(BaseSlotEventBroker):
+    """
+    In-process broker for tests and single process deployments
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        self.dispatch(events)
+
+    def subscribe(self, doctor_id):
+        subscription = Subscription(self, doctor_id, settings.SLOT_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.setdefault(doctor_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.doctor_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.doctor_id, None)
+
+    def dispatch(self, events: Iterable[dict]):
+        """ Deliver events to subscriptions of this process """
+        for event in events:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(event['doctor_id'], ()))
+            for subscription in subscriptions:
+                subscription.put(event)
+
+
+class RedisSlotEventBroker(LocMemSlotEventBroker):
+    """
+    Events are published to a Redis channel per doctor, a listener thread
+    of the process relays them to local subscriptions
+    """
+
+    CHANNEL_PREFIX = 'ybooking:slot-events:'
+
+    def __init__(self, client=None):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(settings.SLOT_EVENTS_REDIS_URL)
+
+        self.client = client
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, events):
+        import redis
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for event in events:
+                pipe.publish(self._channel(event['doctor_id']), json.dumps(event))
+            pipe.execute()
+        except redis.RedisError:
+            # waiting clients miss the event, the schedule is still correct
+            logger.exception('Failed to publish %s slot events', len(events))
+
+    def subscribe(self, doctor_id):
+        self._start_listener()
+        return super().subscribe(doctor_id)
+
+    def _start_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='slot-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import redis
+
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.CHANNEL_PREFIX}*')
+                for message in pubsub.listen():
+                    self.dispatch([json.loads(message['data'])])
+            except redis.RedisError:
+                logger.exception('Slot events subscription failed, reconnecting')
+                time.sleep(settings.SLOT_EVENTS_RECONNECT_DELAY)
+
+    def _channel(self, doctor_id: int) -> str:
+        return f'{self.CHANNEL_PREFIX}{doctor_id}'
+
+
+@lru_cache(maxsize=None)
+def _load_broker(path: str) -> BaseSlotEventBroker:
+    return import_string(path)()
+
+
+def get_event_broker() -> BaseSlotEventBroker:
+    return _load_broker(settings.SLOT_EVENTS_BACKEND)
@@ -0,0 +1,159 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ybooking_app.loader import load_sessions
+from ybooking_app.models import DayInterval, Schedule, Timetable, Vacation
+from ybooking_app.signals import GENERATE, notify_timetable_changed
+
+# DayInterval.Weekdays value -> datetime.weekday()
+WEEKDAYS = {
+    DayInterval.Weekdays.MON: 0,
+    DayInterval.Weekdays.TUE: 1,
+    DayInterval.Weekdays.WED: 2,
+    DayInterval.Weekdays.THU: 3,
+    DayInterval.Weekdays.FRI: 4,
+    DayInterval.Weekdays.SAT: 5,
+    DayInterval.Weekdays.SUN: 6,
+}
+
+
+class DoctorTemplate:
+    """
+    Schedule, day intervals and vacations of a single doctor
+    """
+
+    def __init__(self, schedule: Schedule):
+        self.schedule_id = schedule.id
+        self.doctor_id = schedule.doctor_id
+        self.generated_through = schedule.generated_through
+        self.planning_days = schedule.planning_days
+        self.session_duration = timedelta(minutes=schedule.session_duration)
+        self.intervals = defaultdict(list)
+        self.vacations = []
+
+    def planning_range(self, today: date) -> Tuple[date, date]:
+        """ First and last days of the planning horizon """
+        return today, today + timedelta(days=self.planning_days - 1)
+
+    def days_to_generate(self, today: date) -> List[date]:
+        """ Days of the planning horizon after the generated-through watermark """
+        first, last = self.planning_range(today)
+        if self.generated_through is not None:
+            first = max(first, self.generated_through + timedelta(days=1))
+
+        return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+    def is_vacation(self, day: date) -> bool:
+        return any(start <= day <= stop for start, stop in self.vacations)
+
+    def sessions(self, day: date) -> Iterator[Tuple[datetime, datetime]]:
+        """ Yield (start, stop) of every session of the day """
+        if self.is_vacation(day):
+            return
+
+        for start_time, stop_time in self.intervals.get(day.weekday(), ()):
+            current = timezone.make_aware(datetime.combine(day, start_time))
+            interval_stop = timezone.make_aware(datetime.combine(day, stop_time))
+
+            while current + self.session_duration <= interval_stop:
+                yield current, current + self.session_duration
+                current += self.session_duration
+
+
+def get_schedules():
+    """ Schedules of active doctors which are able to produce sessions """
+    return Schedule.objects.filter(
+        doctor__user__is_active=True,
+        doctor__is_doctor=True,
+        planning_days__gt=0,
+        session_duration__gt=0,
+    )
+
+
+def load_templates(today: date, doctor_ids: Optional[Iterable[int]] = None) -> Dict[int, DoctorTemplate]:
+    """
+    Load templates of all active doctors with one query per model
+    """
+    schedules = get_schedules()
+    if doctor_ids is not None:
+        schedules = schedules.filter(doctor_id__in=doctor_ids)
+
+    templates = {}
+    # if a doctor has several schedules the latest one wins
+    for schedule in schedules.order_by('id'):
+        templates[schedule.doctor_id] = DoctorTemplate(schedule)
+
+    doctors = schedules.values('doctor_id')
+
+    intervals = DayInterval.objects.filter(
+        doctor_id__in=doctors,
+    ).order_by('start_time').values_list('doctor_id', 'weekday', 'start_time', 'stop_time')
+    for doctor_id, weekday, start_time, stop_time in intervals.iterator():
+        if doctor_id in templates and weekday in WEEKDAYS:
+            templates[doctor_id].intervals[WEEKDAYS[weekday]].append((start_time, stop_time))
+
+    vacations = Vacation.objects.filter(
+        doctor_id__in=doctors,
+        stop_date__gte=today,
+    ).values_list('doctor_id', 'start_date', 'stop_date')
+    for doctor_id, start_date, stop_date in vacations.iterator():
+        if doctor_id in templates:
+            templates[doctor_id].vacations.append((start_date, stop_date))
+
+    return templates
+
+
+def build_sessions(templates: Dict[int, DoctorTemplate], today: date) -> Iterator[Timetable]:
+    """
+    Yield unsaved Timetable items for not yet generated days of every doctor
+    """
+    for doctor_id, template in templates.items():
+        for day in template.days_to_generate(today):
+            for start, stop in template.sessions(day):
+                yield Timetable(doctor_id=doctor_id, patient_id=None, start=start, stop=stop)
+
+
+def update_watermarks(templates: Dict[int, DoctorTemplate], today: date):
+    """
+    Move generated-through watermarks to the end of planning horizons
+    """
+    schedules_by_day = defaultdict(list)
+    for template in templates.values():
+        _, last = template.planning_range(today)
+        if template.generated_through is None or template.generated_through < last:
+            schedules_by_day[last].append(template.schedule_id)
+            template.generated_through = last
+
+    for day, schedule_ids in schedules_by_day.items():
+        Schedule.objects.filter(id__in=schedule_ids).update(generated_through=day)
+
+
+def generate_timeslots_for(doctor_ids: Optional[Iterable[int]] = None, today: Optional[date] = None) -> int:
+    """
+    Create missing sessions of the given doctors (all active doctors by default),
+    returns the number of created sessions
+    """
+    today = today or timezone.localdate()
+
+    # load schedules, intervals and vacations of all doctors at once
+    templates = load_templates(today, doctor_ids)
+
+    # only days after generated-through watermarks are created,
+    # sessions which already exist are skipped by the loader
+    generated_days = {}
+    for doctor_id, template in templates.items():
+        days = template.days_to_generate(today)
+        if days:
+            generated_days[doctor_id] = days
+
+    with transaction.atomic():
+        created = load_sessions(build_sessions(templates, today))
+        update_watermarks(templates, today)
+        if generated_days:
+            notify_timetable_changed(GENERATE, days=generated_days)
+
+    return created
@@ -1,84 +1,84 @@
-from django.db.models import Q
-from django.db.models.functions import TruncDate
+import logging
+
+from celery import chord
+from django.conf import settings
 
 from ybooking.celery import app
-from ybooking_app.models import Timetable, Profile, DayInterval, Vacation
-from datetime import datetime, timedelta
+from ybooking_app import archive
+from ybooking_app.slots import generate_timeslots_for, get_schedules
+
+logger = logging.getLogger(__name__)
+
+
+@app.task
+def generate_timeslots(chunk_size=None):
+    """
+    Create Timetable items for all doctors, doctors are processed in parallel chunks
+    """
+    if settings.TIMESLOTS_VIRTUAL:
+        # free slots are computed from schedule templates, nothing to generate
+        return None
+
+    return timeslots_workflow(chunk_size).apply_async().id
+
+
+@app.task(bind=True, max_retries=settings.TIMESLOTS_CHUNK_MAX_RETRIES, default_retry_delay=60)
+def generate_timeslots_chunk(self, doctor_ids):
+    """
+    Create Timetable items for a chunk of doctors
+    """
+    try:
+        created = generate_timeslots_for(doctor_ids)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+
+        logger.exception('Timeslots generation failed for doctors %s', doctor_ids)
+        return {'doctors': 0, 'slots': 0, 'failed': list(doctor_ids)}
+
+    return {'doctors': len(doctor_ids), 'slots': created, 'failed': []}
 
 
 @app.task
-def generate_timeslots():
+def summarize_timeslots(results):
     """
-    Create Timetable items for all doctors
+    Merge results of all chunks
     """
-    today_day = datetime.today()
-
-    doctors = Profile.objects.filter(
-        user__is_active=True,
-        is_doctor=True,
-        schedule__isnull=False,
-        schedule__planning_days__gt=0,
-        schedule__session_duration__gt=0,
+    summary = {'doctors': 0, 'slots': 0, 'failed': []}
+    for result in results:
+        summary['doctors'] += result['doctors']
+        summary['slots'] += result['slots']
+        summary['failed'] += result['failed']
+
+    logger.info(
+        'Timeslots generated: %s doctors processed, %s slots created, %s doctors failed',
+        summary['doctors'], summary['slots'], len(summary['failed']),
     )
+    return summary
+
+
+@app.task
+def archive_sessions():
+    """
+    Move past sessions to the archive, at most TIMETABLE_ARCHIVE_MAX_BATCHES batches per run
+    """
+    archived = archive.archive_sessions()
+    logger.info('Sessions archived: %s', archived)
+    return archived
 
-    for doctor in doctors.iterator():
-        # define days to generate schedule
-        days_to_generate = [
-            today_day + timedelta(days=i) for i in range(doctor.planning_days)
-        ]
-        days_range = (days_to_generate[0], days_to_generate[-1])
-
-        # remove days for which timeslots has already been generated
-        already_processed_days = Timetable.objects.filter(
-            start__range=days_range,
-            doctor_id=doctor.id,
-        ).annotate(
-            start_day=TruncDate('start'),
-        ).values_list('start_day', flat=True).distinct()
-
-        for day in already_processed_days:
-            if day in days_to_generate:
-                days_to_generate.remove(day)
-
-        # remove intersection with vacations
-        vacations = Vacation.objects.filter(
-            Q(Q(start_date__range=days_range) | Q(stop_date__range=days_range)),
-            doctor_id=doctor.id,
-        )
-        for vacation in vacations:
-            for day in range(vacation.start_date, vacation.stop_date):
-                if day in days_to_generate:
-                    days_to_generate.remove(day)
-
-        # define weekdays to generate schedule
-        weekdays_to_generate = {day.weekday(): day for day in days_to_generate}
-
-        # find all suitable time intervals
-        intervals = DayInterval.objects.filter(
-            doctor_id=doctor.id,
-            weekday__in=weekdays_to_generate.keys(),
-        )
-
-        # generate timeslots for each interval
-        sessions = []
-        for interval in intervals:
-            current_start_time = interval.start_time
-
-            while current_start_time + doctor.session_duration <= interval.stop_time:
-
-                sessions.append(Timetable(
-                    doctor_id=doctor.id,
-                    patient_id=None,
-                    start=datetime.combine(
-                        weekdays_to_generate[interval.weekday],
-                        current_start_time,
-                    ),
-                    stop=datetime.combine(
-                        weekdays_to_generate[interval.weekday],
-                        current_start_time + doctor.session_duration,
-                    ),
-                ))
-
-                current_start_time -= doctor.session_duration
-
-        Timetable.objects.bulk_create(sessions)
\ No newline at end of file
+
+def timeslots_workflow(chunk_size=None):
+    """
+    Chord of chunk tasks with summary callback
+    """
+    chunk_size = chunk_size or settings.TIMESLOTS_CHUNK_SIZE
+    doctor_ids = list(get_schedules().order_by('doctor_id').values_list('doctor_id', flat=True).distinct())
+    chunks = [doctor_ids[i:i + chunk_size] for i in range(0, len(doctor_ids), chunk_size)]
+
+    if not chunks:
+        return summarize_timeslots.si([])
+
+    return chord(
+        (generate_timeslots_chunk.s(chunk) for chunk in chunks),
+        summarize_timeslots.s(),
+    )
@@ -8,6 +8,8 @@ router = routers.DefaultRouter()
 router.register(r'persons', views.UserViewSet,  basename='persons')
 router.register(r'blocked-persons', views.BlockedUserViewSet, basename='blocked-persons')
 router.register(r'statistics', views.StatisticsViewSet, basename='statistics')
+router.register(r'availability', views.AvailabilityViewSet, basename='availability')
+router.register(r'export', views.ExportViewSet, basename='export')
 
 domains_router = routers.NestedSimpleRouter(router, r'persons', lookup='person')
 domains_router.register(r'schedule', views.TimetableViewSet, basename='schedule')
@@ -15,5 +17,7 @@ domains_router.register(r'schedule', views.TimetableViewSet, basename='schedule'
 urlpatterns = [
     path('', include(router.urls)),
     path('', include(domains_router.urls)),
-    path('api-token-auth/', obtain_auth_token, name='api_token_auth')
+    path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar-feed'),
+    path('metrics', views.metrics_export, name='metrics'),
 ]
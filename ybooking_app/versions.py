@@ -0,0 +1,48 @@
+"""
+Versions of schedules and statistics.
+
+A version is the time of the last change of a scope: a doctor's or a patient's
+schedule or global statistics. Versions are stored in VERSIONS_CACHE and are
+replaced on booking, cancellation and slot generation, so cached data and
+ETags derived from them go stale at once.
+"""
+import time
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+
+STATISTICS_SCOPE = 'statistics'
+
+
+def schedule_scope(person_id) -> str:
+    return f'schedule:{person_id}'
+
+
+def get_versions(scopes: Iterable[str]) -> Dict[str, float]:
+    """ Versions of the scopes, a scope without a version gets the current one """
+    cache = _get_cache()
+    keys = {scope: _key(scope) for scope in scopes}
+
+    stored = cache.get_many(keys.values())
+    missing = [scope for scope, key in keys.items() if key not in stored]
+    if missing:
+        now = time.time()
+        for scope in missing:
+            cache.add(keys[scope], now, timeout=None)
+        stored.update(cache.get_many([keys[scope] for scope in missing]))
+
+    return {scope: stored[key] for scope, key in keys.items()}
+
+
+def bump_versions(scopes: Iterable[str]):
+    now = time.time()
+    _get_cache().set_many({_key(scope): now for scope in set(scopes)}, timeout=None)
+
+
+def _key(scope: str) -> str:
+    return f'version:{scope}'
+
+
+def _get_cache():
+    return caches[settings.VERSIONS_CACHE]
@@ -1,19 +1,102 @@
+import codecs
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from django.db.models import F, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
 from django.utils import timezone
 from rest_framework import permissions, status
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from ybooking_app.models import Profile, Timetable
+from ybooking_app import ical, metrics
+from ybooking_app.availability import get_free_slots, get_virtual_slot, is_virtual_slot_id
+from ybooking_app.booking import (
+    BOOKED,
+    CONFLICT,
+    NOT_FOUND,
+    book_slot,
+    book_slots,
+    book_virtual_slot,
+    cancel_slot,
+    cancel_slots,
+)
+from ybooking_app.conditional import conditional
+from ybooking_app.export import stream_export
+from ybooking_app.helpers import get_day_start
+from ybooking_app.holds import get_hold_backend
+from ybooking_app.idempotency import idempotent
+from ybooking_app.models import ArchivedTimetable, DailyStatistics, Profile, Timetable
+from ybooking_app.occupancy import occupancy_index
+from ybooking_app.pagination import PersonPagination, SchedulePagination
 from ybooking_app.permissions import IsPatient, IsPatientOwner
-from ybooking_app.serializers import UserSerializer, TimetableSerializer, StatisticsSerializer
+from ybooking_app.persons_import import import_persons, is_utf8, read_rows
+from ybooking_app.serializers import (
+    AvailabilitySearchSerializer,
+    AvailableSlotSerializer,
+    BulkBookingSerializer,
+    ExportSerializer,
+    PersonsImportSerializer,
+    StatisticsFilterSerializer,
+    StatisticsSerializer,
+    TimetableSerializer,
+    TimetableValuesSerializer,
+    UserSerializer,
+    UserValuesSerializer,
+)
+from ybooking_app.slot_cache import get_cached_free_slots, invalidate_free_slots
+from ybooking_app.versions import STATISTICS_SCOPE, get_versions, schedule_scope
+
+
+class ValuesReadMixin:
+    """
+    List and retrieve actions build responses from `values()` rows of the
+    queryset with `values_serializer_class`. Permissions of these actions
+    don't check objects, so there is no model instance to check.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.values_serializer_class.get_values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self._represent(page))
+
+        return Response(self._represent(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+            )
+        except (TypeError, ValueError):
+            raise NotFound()
+
+        row = self.values_serializer_class.get_values(queryset).first()
+        if row is None:
+            raise NotFound()
+        return Response(self.values_serializer_class.to_representation(row))
+
+    def _represent(self, rows):
+        return [self.values_serializer_class.to_representation(row) for row in rows]
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ValuesReadMixin, viewsets.ModelViewSet):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
+    values_serializer_class = UserValuesSerializer
+    pagination_class = PersonPagination
 
     permission_classes_by_action = {
         'list': [permissions.IsAuthenticated],
@@ -22,6 +105,7 @@ class UserViewSet(viewsets.ModelViewSet):
         'destroy': [permissions.IsAdminUser],
         'update': [permissions.IsAdminUser],
         'partial_update': [permissions.IsAdminUser],
+        'bulk_import': [permissions.IsAdminUser],
     }
 
     def get_permissions(self):
@@ -30,26 +114,56 @@ class UserViewSet(viewsets.ModelViewSet):
         except KeyError:
             return [permission() for permission in self.permission_classes]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request, *args, **kwargs):
+        """ Create persons from an uploaded CSV or NDJSON file, invalid rows are reported """
+        serializer = PersonsImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data['file']
+        if not is_utf8(upload.chunks()):
+            return Response(status=status.HTTP_400_BAD_REQUEST, data='File is not UTF-8 encoded.')
+
+        upload.seek(0)
+        lines = codecs.iterdecode(upload, 'utf-8')
+        result = import_persons(read_rows(lines, serializer.validated_data['input']))
+
+        return Response(status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK, data=result)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        _invalidate_person_slots(serializer.instance)
+
     def perform_destroy(self, instance):
         """ Deactivate user """
         instance.is_active = False
         instance.save()
+        _invalidate_person_slots(instance)
 
 
-class BlockedUserViewSet(viewsets.ModelViewSet):
+class BlockedUserViewSet(ValuesReadMixin, viewsets.ModelViewSet):
     queryset = User.objects.filter(is_active=False)
     serializer_class = UserSerializer
+    values_serializer_class = UserValuesSerializer
+    pagination_class = PersonPagination
     permission_classes = [permissions.IsAdminUser]
 
     def perform_destroy(self, instance):
         """ Activate user back """
         instance.is_active = True
         instance.save()
+        _invalidate_person_slots(instance)
 
 
-class TimetableViewSet(viewsets.ModelViewSet):
+class TimetableViewSet(ValuesReadMixin, viewsets.ModelViewSet):
     queryset = Timetable.objects.all()
     serializer_class = TimetableSerializer
+    values_serializer_class = TimetableValuesSerializer
+    pagination_class = SchedulePagination
     permission_classes = [IsPatient]
 
     permission_classes_by_action = {
@@ -59,6 +173,9 @@ class TimetableViewSet(viewsets.ModelViewSet):
         'destroy': [IsPatientOwner],
         'update': [permissions.IsAdminUser],
         'partial_update': [IsPatient],
+        'bulk': [IsPatient],
+        'hold': [IsPatient],
+        'calendar': [permissions.IsAuthenticated],
     }
 
     def get_permissions(self):
@@ -68,41 +185,223 @@ class TimetableViewSet(viewsets.ModelViewSet):
             return [permission() for permission in self.permission_classes]
 
     def get_queryset(self):
-        try:
-            person = Profile.objects.get(
-                user__is_active=True,
-                pk=self.kwargs['person_pk'],
-            )
-        except Profile.DoesNotExist:
-            raise ValueError(f'There is no person with id={self.kwargs["persons_pk"]}')
+        person = self._get_person()
+        queryset = Timetable.objects.filter(**self._get_filter_by_person(person))
+
+        if person.is_doctor and self.action == 'list':
+            # slots held by other patients are unavailable
+            queryset = queryset.exclude(pk__in=self._get_held_slots(person))
+
+        return queryset
+
+    def get_object(self):
+        """ Virtual slots are resolved from doctor's schedule template """
+        if not (settings.TIMESLOTS_VIRTUAL and is_virtual_slot_id(self.kwargs.get('pk'))):
+            return super().get_object()
+
+        person = self._get_person()
+        slot = get_virtual_slot(person, self.kwargs['pk']) if person.is_doctor else None
+        if slot is None:
+            raise NotFound()
 
-        return Timetable.objects.filter(**self._get_filter_by_person(person))
+        self.check_object_permissions(self.request, slot)
+        return slot
+
+    def _get_list_validators(self, request):
+        """ Schedule of the person and slots held by other patients """
+        return [schedule_scope(self.kwargs['person_pk'])], sorted(self._get_held_slots_by_id(self.kwargs['person_pk']))
+
+    @conditional(_get_list_validators, max_age=settings.SCHEDULE_ETAG_MAX_AGE)
+    def list(self, request, *args, **kwargs):
+        """ Free slots of doctors are served from the read-through cache """
+        person_id = int(self.kwargs['person_pk'])
+        slots = get_cached_free_slots(person_id, self._load_free_slots)
+        if slots is None:
+            return super().list(request, *args, **kwargs)
+
+        held_slots = self._get_held_slots_by_id(person_id)
+        page = self.paginate_queryset([slot for slot in slots if slot['id'] not in held_slots])
+        return self.get_paginated_response(self._represent(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        if settings.TIMESLOTS_VIRTUAL and is_virtual_slot_id(self.kwargs.get('pk')):
+            return Response(self.get_serializer(self.get_object()).data)
+
+        return super().retrieve(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
         """ Clear patient field in session """
         timetable = self.get_object()
 
-        if self.request.user.id != timetable.patient_id and not self.request.user.is_superuser:
+        if request.user.profile.id != timetable.patient_id and not self.request.user.is_superuser:
             return Response(
                 status=status.HTTP_403_FORBIDDEN,
                 data='Patient can see modify only his/her own schedule.',
             )
 
-        timetable.patient_id = None
-        timetable.save()
+        if not cancel_slot(timetable):
+            return Response(status=status.HTTP_409_CONFLICT, data='Session already canceled.')
         return Response(data='Session canceled')
 
+    @idempotent
     def partial_update(self, request, *args, **kwargs):
-        """ Fill patient field in session """
-        instance = self.get_object()
-        if instance.patient is not None:
-            return Response(status=status.HTTP_423_LOCKED, data='Session already assigned.')
+        """ Fill patient field in session with a single conditional update """
+        person = self._get_person()
+        if not person.is_doctor:
+            # sessions are booked in schedules of doctors only
+            raise NotFound()
 
-        return super().partial_update(request, args, kwargs)
+        patient_id = request.user.profile.id
+        slot_id = self._get_slot_id()
+        holds = get_hold_backend()
+        if holds.get_holder(person.id, slot_id) not in (None, patient_id):
+            return Response(status=status.HTTP_409_CONFLICT, data='Session is held by another patient.')
 
-    def perform_update(self, serializer):
-        serializer.instance.patient_id = self.request.user.id
-        super().perform_update(serializer)
+        if settings.TIMESLOTS_VIRTUAL and is_virtual_slot_id(slot_id):
+            result, session = book_virtual_slot(person, slot_id, patient_id)
+        else:
+            result, session = book_slot(person.id, slot_id, patient_id)
+
+        if result == NOT_FOUND:
+            raise NotFound()
+        if result == CONFLICT:
+            return Response(status=status.HTTP_409_CONFLICT, data='Session already assigned.')
+
+        # the hold is confirmed by booking
+        holds.release(person.id, slot_id, patient_id)
+        return Response(self.values_serializer_class.to_representation(session))
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request, *args, **kwargs):
+        """ Book or cancel several sessions in a single transaction """
+        serializer = BulkBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        person = self._get_person()
+        patient_id = request.user.profile.id
+
+        if serializer.validated_data['action'] == 'book':
+            if not person.is_doctor:
+                return Response(status=status.HTTP_400_BAD_REQUEST, data='Sessions are booked in doctor schedule.')
+            slot_ids = serializer.validated_data['ids']
+            holds = get_hold_backend()
+            held_slots = holds.get_held_slots(person.id, exclude_holder=patient_id)
+
+            # slots held by other patients are in conflict
+            booked = book_slots(person, [slot_id for slot_id in slot_ids if slot_id not in held_slots], patient_id)
+            results = {slot_id: booked.get(slot_id, CONFLICT) for slot_id in slot_ids}
+
+            for slot_id, result in results.items():
+                if result == BOOKED:
+                    holds.release(person.id, slot_id, patient_id)
+        else:
+            if not person.is_doctor and person.id != patient_id:
+                return Response(
+                    status=status.HTTP_403_FORBIDDEN,
+                    data='Patient can see modify only his/her own schedule.',
+                )
+            results = cancel_slots(
+                serializer.validated_data['ids'],
+                patient_id,
+                doctor_id=person.id if person.is_doctor else None,
+            )
+
+        return Response(data={'results': [
+            {'id': slot_id, 'status': result} for slot_id, result in results.items()
+        ]})
+
+    @action(detail=False, methods=['get', 'post'])
+    def calendar(self, request, *args, **kwargs):
+        """ URL of the person's iCalendar feed, POST revokes URLs given before and returns a new one """
+        person = self._get_person()
+        if person.user_id != request.user.id and not request.user.is_superuser:
+            return Response(status=status.HTTP_403_FORBIDDEN, data='Only own calendar is available.')
+
+        if request.method == 'POST':
+            version = ical.rotate_feed_version(person.id)
+        else:
+            version = ical.get_feed_version(person.id)
+        url = reverse('calendar-feed', kwargs={'token': ical.make_feed_token(person.id, version)})
+        return Response(data={'url': request.build_absolute_uri(url)})
+
+    @action(detail=True, methods=['post', 'delete'])
+    def hold(self, request, *args, **kwargs):
+        """ Hold a free session for SLOT_HOLDS_TTL seconds before booking """
+        person = self._get_person()
+        slot_id = self._get_slot_id()
+        patient_id = request.user.profile.id
+        holds = get_hold_backend()
+
+        if request.method == 'DELETE':
+            if not holds.release(person.id, slot_id, patient_id):
+                raise NotFound()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if not person.is_doctor or not self._is_free_slot(person, slot_id):
+            raise NotFound()
+
+        if not holds.acquire(person.id, slot_id, patient_id, settings.SLOT_HOLDS_TTL):
+            return Response(status=status.HTTP_409_CONFLICT, data='Session is held by another patient.')
+
+        return Response(status=status.HTTP_201_CREATED, data={'id': slot_id, 'expires_in': settings.SLOT_HOLDS_TTL})
+
+    def _get_slot_id(self):
+        try:
+            return int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+
+    def _is_free_slot(self, doctor, slot_id):
+        if settings.TIMESLOTS_VIRTUAL and is_virtual_slot_id(slot_id):
+            return get_virtual_slot(doctor, slot_id) is not None
+
+        return Timetable.objects.filter(
+            pk=slot_id,
+            doctor_id=doctor.id,
+            patient_id__isnull=True,
+            start__gt=timezone.now(),
+        ).exists()
+
+    def _load_free_slots(self):
+        """ Upcoming free slots of the doctor, None if the person is not a doctor """
+        person = self._get_person()
+        if not person.is_doctor:
+            return None
+
+        if settings.TIMESLOTS_VIRTUAL:
+            return get_free_slots(person)
+
+        return list(Timetable.objects.filter(
+            **self._get_filter_by_person(person),
+        ).order_by('start', 'id').values('id', 'start', 'stop'))
+
+    def _get_held_slots(self, doctor):
+        """ Slots of the doctor held by other patients """
+        return self._get_held_slots_by_id(doctor.id)
+
+    def _get_held_slots_by_id(self, doctor_id):
+        profile = getattr(self.request.user, 'profile', None)
+        return get_hold_backend().get_held_slots(int(doctor_id), exclude_holder=profile.id if profile else None)
+
+    def _get_person(self):
+        """ Person of the schedule, looked up once per request """
+        if hasattr(self, '_person'):
+            return self._person
+
+        # a person often asks for own schedule
+        profile = getattr(self.request.user, 'profile', None)
+        if profile is not None and str(profile.id) == str(self.kwargs['person_pk']):
+            self._person = profile
+            return profile
+
+        try:
+            self._person = Profile.objects.get(
+                user__is_active=True,
+                pk=self.kwargs['person_pk'],
+            )
+        except Profile.DoesNotExist:
+            raise ValueError(f'There is no person with id={self.kwargs["person_pk"]}')
+        return self._person
 
     def _get_filter_by_person(self, person):
         filters = {'start__gt': timezone.now()}
@@ -124,10 +423,157 @@ class TimetableViewSet(viewsets.ModelViewSet):
 
 
 class StatisticsViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Timetable.objects.annotate(
-        day=TruncDate('start'),
-    ).order_by('day').values('day').annotate(
-        count=Count('day'),
-    )
+    """ Sessions per day from the daily statistics aggregate """
+    queryset = DailyStatistics.objects.values('day').annotate(
+        count=Sum(F('booked') + F('free')),
+        booked_sessions=Sum('booked'),
+        free_sessions=Sum('free'),
+    ).order_by('day')
     serializer_class = StatisticsSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        serializer = StatisticsFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
+        queryset = super().get_queryset()
+        if 'start' in filters:
+            queryset = queryset.filter(day__gte=filters['start'])
+        if 'stop' in filters:
+            queryset = queryset.filter(day__lte=filters['stop'])
+        if 'doctor' in filters:
+            queryset = queryset.filter(doctor_id=filters['doctor'])
+        return queryset
+
+    @conditional(lambda view, request: ([STATISTICS_SCOPE], ()))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """ Streaming CSV or NDJSON exports filtered by ?doctor=, ?start= and ?stop= dates """
+    permission_classes = [permissions.IsAuthenticated]
+
+    permission_classes_by_action = {
+        'statistics': [permissions.IsAuthenticated],
+        'timetable': [permissions.IsAdminUser],
+    }
+
+    def get_permissions(self):
+        try:
+            return [permission() for permission in self.permission_classes_by_action[self.action]]
+        except KeyError:
+            return [permission() for permission in self.permission_classes]
+
+    @action(detail=False)
+    def statistics(self, request):
+        """ Daily statistics per doctor """
+        params = self._get_params()
+        queryset = DailyStatistics.objects.annotate(count=F('booked') + F('free')).order_by('day', 'doctor_id')
+        if 'start' in params:
+            queryset = queryset.filter(day__gte=params['start'])
+        if 'stop' in params:
+            queryset = queryset.filter(day__lte=params['stop'])
+        if 'doctor' in params:
+            queryset = queryset.filter(doctor_id=params['doctor'])
+
+        return stream_export(queryset, ('day', 'doctor_id', 'count', 'booked', 'free'), params['output'], 'statistics')
+
+    @action(detail=False)
+    def timetable(self, request):
+        """ Live and archived sessions ordered by start """
+        params = self._get_params()
+        fields = ('id', 'doctor_id', 'patient_id', 'start', 'stop')
+        queryset = self._filter_sessions(Timetable.objects.values(*fields), params).union(
+            self._filter_sessions(ArchivedTimetable.objects.values(*fields), params), all=True,
+        ).order_by('start', 'id')
+
+        return stream_export(queryset, fields, params['output'], 'timetable')
+
+    @staticmethod
+    def _filter_sessions(queryset, params):
+        if 'start' in params:
+            queryset = queryset.filter(start__gte=get_day_start(params['start']))
+        if 'stop' in params:
+            queryset = queryset.filter(start__lt=get_day_start(params['stop'] + timedelta(days=1)))
+        if 'doctor' in params:
+            queryset = queryset.filter(doctor_id=params['doctor'])
+        return queryset
+
+    def _get_params(self):
+        serializer = ExportSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+def calendar_feed(request, token):
+    """ iCalendar feed of the person's sessions, the signed token in URL grants access """
+    feed = ical.load_feed_token(token)
+    if feed is None:
+        raise Http404()
+
+    # revoked or the person is gone
+    person_id, version = feed
+    if ical.get_feed_version(person_id) != version:
+        raise Http404()
+
+    scope = schedule_scope(person_id)
+    cache_key = ical.get_cache_key(person_id, get_versions([scope])[scope])
+    etag = quote_etag(hashlib.sha256(cache_key.encode()).hexdigest()[:32])
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        feed = ical.get_cached_feed(cache_key)
+        if feed is not None:
+            response = HttpResponse(feed, content_type=ical.CONTENT_TYPE)
+        else:
+            person = ical.get_feed_person(person_id)
+            if person is None:
+                raise Http404()
+            response = StreamingHttpResponse(ical.stream_feed(person, cache_key), content_type=ical.CONTENT_TYPE)
+
+    response['ETag'] = etag
+    return response
+
+
+def metrics_export(request):
+    """ Metrics of this process in Prometheus text format, open without METRICS_TOKEN only in DEBUG """
+    if settings.METRICS_TOKEN:
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if not constant_time_compare(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    elif not settings.DEBUG:
+        raise Http404()
+
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _invalidate_person_slots(user):
+    """ Cached free slots depend on person being an active doctor """
+    if hasattr(user, 'profile'):
+        invalidate_free_slots([user.profile.id])
+
+
+class AvailabilityViewSet(viewsets.ViewSet):
+    """ Earliest free slots across doctors """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        serializer = AvailabilitySearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        profile = getattr(request.user, 'profile', None)
+        holds = get_hold_backend()
+        slots = occupancy_index.search(
+            params['start'],
+            params['stop'],
+            doctor_ids=params.get('doctors'),
+            limit=params['limit'],
+            get_held_slots=lambda doctor_id: holds.get_held_slots(
+                doctor_id,
+                exclude_holder=profile.id if profile else None,
+            ),
+        )
+        return Response(data={'results': AvailableSlotSerializer(slots, many=True).data})